@@ -1,268 +1,749 @@
 import json
 import os
+import math
+import time
+import argparse
 from datetime import datetime
-from collections import Counter, defaultdict
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from call_stats import PERCENTILES, ConversationStats, conversation_shapes
+from detection_rules import default_engine
+from intent_model import default_model, examples_fingerprint
+from near_duplicates import ReplyTable, cluster_responses, near_repeats
+from report_writers import SEVERITIES, create_writer, format_for, group_findings
+from transcript_index import (build_index, has_index, index_rows, load_rows, select,
+                              transcript_paths, unindexed)
+
+# Per-file findings cache kept next to the transcripts
+MANIFEST_NAME = ".analyzer_manifest.json"
+# Bump whenever detection logic changes so cached findings are recomputed;
+# edits to the rules or intent examples invalidate the cache through their fingerprints
+ANALYSIS_VERSION = f"10-{default_engine().fingerprint}-{examples_fingerprint()}"
+# Below this many changed files a process pool costs more than it saves
+PARALLEL_THRESHOLD = 8
+# Report order for voice_bot's span timings (see metrics.py); others follow alphabetically
+SPAN_ORDER = ["form_parse", "state_lookup", "issue_checks", "opening", "llm", "first_token",
+              "state_write", "transcript_write", "twiml_render", "total"]
+# Span timings are cached as log-spaced histogram buckets (this step in log1p(ms)),
+# so reported percentiles are within half a percent of the exact values
+LATENCY_STEP = 0.01
+# Agent text kept per call for cross-call response clustering, and clusters reported
+CLUSTER_TEXT_CHARS = 200
+MAX_CLUSTERS = 10
+MAX_OUTLIERS = 10
+# --watch: minimum seconds between report rewrites
+REPORT_INTERVAL = 10.0
+
+
+def analyze_transcript(t):
+    """Findings for one transcript - returns (bugs, real-time issues)"""
+    bugs = []
+    
+    messages = t.get('messages', [])
+    scenario = t.get('scenario', '')
+    call_sid = t['call_sid']
+
+    agent_msgs = [m['text'] for m in messages if m['speaker'] == 'Agent']
+
+    if not agent_msgs:
+        bugs.append({
+            'call_sid': call_sid,
+            'type': 'critical',
+            'issue': 'No agent response received',
+            'scenario': scenario
+        })
+        return bugs, []
+
+    # Keyword rules (greeting, closing) come from the shared rule engine;
+    # structural checks stay here. Intent acknowledgement is scored in batches
+    # by intent_findings
+    bugs.extend(default_engine().check_transcript(t))
+
+    for i in range(len(agent_msgs) - 1):
+        if agent_msgs[i] == agent_msgs[i+1]:
+            bugs.append({
+                'call_sid': call_sid,
+                'type': 'medium',
+                'issue': 'Agent repeated exact same response',
+                'example': agent_msgs[i][:200]
+            })
+
+    # STT noise keeps real loops from matching exactly
+    for i, _, similarity in near_repeats(agent_msgs):
+        bugs.append({
+            'call_sid': call_sid,
+            'type': 'medium',
+            'issue': 'Agent repeated a near-identical response',
+            'example': agent_msgs[i][:200],
+            'similarity': round(similarity, 2)
+        })
+
+    if len(messages) < 4:
+        bugs.append({
+            'call_sid': call_sid,
+            'type': 'medium',
+            'issue': 'Conversation ended prematurely',
+            'turns': len(messages) // 2
+        })
+
+    return bugs, t.get('issues', [])
+
+
+def intent_findings(transcripts):
+    """Missed-intent findings per transcript - every reply to the caller's request is scored in one batch"""
+    model = default_model()
+    replies, best = model.request_replies([t.get('messages', []) for t in transcripts])
+    answered = [i for i, reply in enumerate(replies) if reply is not None]
+    missed = model.missed_intents([transcripts[i].get('scenario', '') for i in answered], best[answered])
+    
+    findings = [[] for _ in transcripts]
+    for i, result in zip(answered, missed):
+        if result is None:
+            continue
+        intent, probability = result
+        spec = model.findings[intent]
+        t = transcripts[i]
+        findings[i] = [{
+            'call_sid': t['call_sid'],
+            'type': spec.get('severity', 'high'),
+            'issue': spec['issue'],
+            'scenario': t.get('scenario', ''),
+            'agent_response': replies[i][:200],
+            'intent_probability': probability
+        }]
+    return findings
+
+
+def intent_turns(transcripts):
+    """The turn the intent check scores for each call, as unlabeled rows for intent_model's labels file"""
+    model = default_model()
+    replies, _ = model.request_replies([t.get('messages', []) for t in transcripts])
+    answered = [(t, reply) for t, reply in zip(transcripts, replies) if reply is not None]
+    wanted = model.scenario_intents([t.get('scenario', '') for t, _ in answered])
+    # "intent" is the model's guess at what the caller wanted - correct it while labeling
+    return [{'call_sid': t['call_sid'], 'scenario': t.get('scenario', ''),
+             'intent': model.intents[w], 'reply': reply, 'acknowledged': None}
+            for (t, reply), w in zip(answered, wanted.tolist())]
+
+
+def agent_texts(t):
+    """Agent messages as kept for response clustering"""
+    return [m['text'][:CLUSTER_TEXT_CHARS] for m in t.get('messages', []) if m['speaker'] == 'Agent']
+
+
+def latency_buckets(timings):
+    """{endpoint: {span: {bucket: samples}}} for per-turn timing records, in one array pass"""
+    labels, label_of, values = {}, [], []
+    for record in timings:
+        endpoint = record.get('endpoint', '?')
+        for name, value in record.items():
+            if isinstance(value, (int, float)) and name != 'turn':
+                label_of.append(labels.setdefault((endpoint, name), len(labels)))
+                values.append(value)
+    if not values:
+        return {}
+    keys = np.rint(np.log1p(np.maximum(values, 0)) / LATENCY_STEP).astype(np.int64)
+    width = int(keys.max()) + 1
+    # One sort over (span, bucket) pairs counts every span's buckets at once
+    pairs, counts = np.unique(np.array(label_of, dtype=np.int64) * width + keys, return_counts=True)
+    names = list(labels)
+    buckets = {}
+    for pair, count in zip(pairs.tolist(), counts.tolist()):
+        endpoint, name = names[pair // width]
+        # String keys survive the JSON manifest unchanged
+        buckets.setdefault(endpoint, {}).setdefault(name, {})[str(pair % width)] = count
+    return buckets
+
+
+def merge_latency(into, buckets):
+    for endpoint, spans in buckets.items():
+        into_spans = into.setdefault(endpoint, {})
+        for name, counts in spans.items():
+            into_counts = into_spans.setdefault(name, {})
+            for key, count in counts.items():
+                into_counts[key] = into_counts.get(key, 0) + count
+    return into
+
+
+def latency_percentiles(buckets):
+    """Report rows (endpoint, span, samples, p50, p90, p99 in ms) from latency_buckets()"""
+    def order(key):
+        endpoint, name = key
+        rank = SPAN_ORDER.index(name) if name in SPAN_ORDER else len(SPAN_ORDER)
+        return endpoint, rank, name
+    
+    keys = [(endpoint, name) for endpoint, spans in buckets.items() for name in spans]
+    rows = []
+    for endpoint, name in sorted(keys, key=order):
+        counts = sorted((int(key), count) for key, count in buckets[endpoint][name].items())
+        samples = sum(count for _, count in counts)
+        values = []
+        for pct in PERCENTILES:
+            # Nearest rank, walked over the cumulative bucket counts
+            rank = max(1, -(-pct * samples // 100))
+            seen = 0
+            for key, count in counts:
+                seen += count
+                if seen >= rank:
+                    values.append(round(math.expm1(key * LATENCY_STEP), 1))
+                    break
+        rows.append([endpoint, name, samples] + values)
+    return rows
+
+
+def read_transcript_file(filepath, offset=0):
+    """Transcripts in one file - returns (transcripts, offset after the last complete record)
+
+    JSONL segments are append-only, so a caller that remembers the offset
+    can come back later and parse only the new lines
+    """
+    if not filepath.endswith('.jsonl'):
+        with open(filepath, 'r') as f:
+            try:
+                t = json.load(f)
+            except ValueError:
+                # Still being written (or torn) - it is read again once it changes
+                return [], 0
+        return [t], os.path.getsize(filepath)
+    
+    transcripts = []
+    with open(filepath, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            # A segment still being appended to may end in a partial line
+            if not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            if line.strip():
+                try:
+                    transcripts.append(json.loads(line))
+                except ValueError:
+                    pass
+    return transcripts, offset
+
+
+def analyze_batch(transcripts):
+    """Per-call records for a batch, plus the batch's reply table and latency buckets
+
+    Records keep findings and a few numbers per call; bulky inputs (agent text,
+    span timings) are kept once per batch, so they stay small in the manifest
+    """
+    replies = ReplyTable()
+    records = []
+    for t, missed, shape in zip(transcripts, intent_findings(transcripts),
+                                conversation_shapes(transcripts)):
+        bugs, issues = analyze_transcript(t)
+        bugs.extend(missed)
+        records.append({
+            'call_sid': t['call_sid'],
+            'end_time': t.get('end_time', ''),
+            'bugs': bugs,
+            'issues': issues,
+            'replies': replies.call_replies(agent_texts(t)),
+            'shape': shape
+        })
+    latency = latency_buckets(r for t in transcripts for r in t.get('timings', []))
+    return records, replies.texts, latency
+
+
+def analyze_file(filepath, offset=0):
+    """Process-pool worker: parse a file (from offset) and analyze each transcript"""
+    stat = os.stat(filepath)
+    transcripts, offset = read_transcript_file(filepath, offset)
+    records, replies, latency = analyze_batch(transcripts)
+    return filepath, stat.st_mtime, stat.st_size, offset, records, replies, latency
+
+
+def merge_latest(by_call, records):
+    """Fold records into by_call, keeping each call's latest copy - returns (added, replaced) pairs"""
+    changed = []
+    for r in records:
+        previous = by_call.get(r['call_sid'])
+        if previous is None or r.get('end_time', '') >= previous.get('end_time', ''):
+            by_call[r['call_sid']] = r
+            changed.append((r, previous))
+    return changed
+
+
+def latest_per_call(records):
+    """Older servers could save the same call twice - keep the latest copy"""
+    by_call = {}
+    merge_latest(by_call, records)
+    return list(by_call.values())
 
 
 class BugAnalyzer:
     """Analyzes transcripts to find bugs and quality issues"""
     
-    def __init__(self, transcripts_dir="transcripts"):
+    def __init__(self, transcripts_dir="transcripts", incremental=True, workers=None,
+                 scenario=None, since=None, call_sids=None):
         self.transcripts_dir = transcripts_dir
+        self.incremental = incremental
+        self.workers = workers
+        # Query filters - when set, only matching calls are loaded (via the index)
+        self.scenario = scenario
+        self.since = since
+        self.call_sids = call_sids
+        self.manifest_path = os.path.join(transcripts_dir, MANIFEST_NAME)
         self.transcripts = []
         self.all_issues = []
-        
-    def load_transcripts(self):
-        """Load all transcript JSON files"""
+        self.latency = {}
+        self.replies = []
+        self.reply_calls = []
+        self.conversations = []
+        self.calls_analyzed = 0
+
+    def transcript_files(self):
+        """Transcript files in the flat directory or its <date>/<scenario>/ shards"""
         if not os.path.exists(self.transcripts_dir):
             print(f"No transcripts found at {self.transcripts_dir}")
-            return
+            return []
+        return transcript_paths(self.transcripts_dir)
+
+    def filtered(self):
+        return bool(self.scenario or self.since or self.call_sids)
+
+    def load_selected(self):
+        """Load only the calls matching the query filters"""
+        if has_index(self.transcripts_dir):
+            rows = index_rows(self.transcripts_dir)
+            loaded = load_rows(self.transcripts_dir,
+                               select(rows, self.scenario, self.since, self.call_sids))
+            # Transcripts the index doesn't know about are scanned, so no call is left out
+            gaps = unindexed(self.transcripts_dir, rows)
+            if gaps:
+                print(f"{len(gaps)} transcript files not fully indexed - scanning them "
+                      f"(run with --reindex to index them)")
+                scanned = []
+                for filepath, offset in gaps:
+                    scanned.extend(read_transcript_file(filepath, offset)[0])
+                loaded.extend(self.matching(scanned))
+        else:
+            print("No call index - scanning every transcript (run with --reindex to build one)")
+            loaded = []
+            for filepath in self.transcript_files():
+                loaded.extend(read_transcript_file(filepath)[0])
+            loaded = self.matching(loaded)
         
-        files = [f for f in os.listdir(self.transcripts_dir) 
-                 if f.endswith('.json')]
+        self.transcripts.extend(latest_per_call(loaded))
+        self.calls_analyzed = len(self.transcripts)
+        print(f"Loaded {len(self.transcripts)} matching transcripts")
+
+    def matching(self, transcripts):
+        """Transcripts passing the query filters, checked the way index rows are"""
+        keep = {r['call_sid'] for r in select(
+            ({'call_sid': t['call_sid'], 'scenario': t.get('scenario', ''),
+              'start_time': t.get('start_time', '')} for t in transcripts),
+            self.scenario, self.since, self.call_sids)}
+        return [t for t in transcripts if t['call_sid'] in keep]
         
-        for filename in files:
-            filepath = os.path.join(self.transcripts_dir, filename)
-            with open(filepath, 'r') as f:
-                self.transcripts.append(json.load(f))
+    def load_transcripts(self):
+        """Load all transcripts - per-call JSON files and JSONL segments"""
+        loaded = []
+        for filepath in self.transcript_files():
+            loaded.extend(read_transcript_file(filepath)[0])
         
+        self.transcripts.extend(latest_per_call(loaded))
+        self.calls_analyzed = len(self.transcripts)
         print(f"Loaded {len(self.transcripts)} transcripts")
     
     def analyze_transcripts(self):
         """Run detailed analysis on all transcripts"""
-        bugs = []
-        
-        for t in self.transcripts:
-            messages = t.get('messages', [])
-            scenario = t.get('scenario', '')
-            call_sid = t['call_sid']
-            
-            agent_msgs = [m['text'] for m in messages if m['speaker'] == 'Agent']
-            patient_msgs = [m['text'] for m in messages if m['speaker'] == 'Patient']
-            
-            if not agent_msgs:
-                bugs.append({
-                    'call_sid': call_sid,
-                    'type': 'critical',
-                    'issue': 'No agent response received',
-                    'scenario': scenario
-                })
-                continue
-
-            first_agent = agent_msgs[0] if agent_msgs else ""
-            
-            if any(word in scenario.lower() for word in ['schedule', 'appointment', 'reschedule']):
-                if not any(word in first_agent.lower() for word in ['appointment', 'schedule']):
-                    bugs.append({
-                        'call_sid': call_sid,
-                        'type': 'high',
-                        'issue': 'Failed to acknowledge appointment request',
-                        'scenario': scenario,
-                        'agent_response': first_agent[:200]
-                    })
-            
-            if 'refill' in scenario.lower() or 'prescription' in scenario.lower():
-                if not any(word in first_agent.lower() for word in ['prescription', 'refill', 'medication']):
-                    bugs.append({
-                        'call_sid': call_sid,
-                        'type': 'high',
-                        'issue': 'Failed to acknowledge prescription refill request',
-                        'scenario': scenario,
-                        'agent_response': first_agent[:200]
-                    })
-
-            for i in range(len(agent_msgs) - 1):
-                if agent_msgs[i] == agent_msgs[i+1]:
-                    bugs.append({
-                        'call_sid': call_sid,
-                        'type': 'medium',
-                        'issue': 'Agent repeated exact same response',
-                        'example': agent_msgs[i][:200]
-                    })
-
-            if len(messages) < 4:
-                bugs.append({
-                    'call_sid': call_sid,
-                    'type': 'medium',
-                    'issue': 'Conversation ended prematurely',
-                    'turns': len(messages) // 2
-                })
-
-            if first_agent:
-                has_greeting = any(word in first_agent.lower() 
-                                 for word in ['hello', 'hi', 'good', 'thank'])
-                if not has_greeting:
-                    bugs.append({
-                        'call_sid': call_sid,
-                        'type': 'low',
-                        'issue': 'Missing proper greeting',
-                        'example': first_agent[:150]
-                    })
-
-            if messages:
-                last_msg = messages[-1]['text'].lower()
-                has_closing = any(word in last_msg 
-                                for word in ['goodbye', 'bye', 'thank you'])
-                if not has_closing:
-                    bugs.append({
-                        'call_sid': call_sid,
-                        'type': 'low',
-                        'issue': 'Missing proper closing phrase'
-                    })
-
-            self.all_issues.extend(t.get('issues', []))
-        
-        return bugs
-    
-    def generate_report(self, output_file="BUG_REPORT.md"):
-        """Generate comprehensive bug report"""
-        self.load_transcripts()
-        bugs = self.analyze_transcripts()
-        
-        critical = [b for b in bugs if b['type'] == 'critical']
-        high = [b for b in bugs if b['type'] == 'high']
-        medium = [b for b in bugs if b['type'] == 'medium']
-        low = [b for b in bugs if b['type'] == 'low']
-        
-        issue_counts = Counter(self.all_issues)
-        
-        report = f"""# Bug Report: Pretty Good AI Voice Agent Testing
+        records, replies, latency = analyze_batch(self.transcripts)
+        return self.collect({'': {'results': records, 'replies': replies, 'latency': latency}},
+                            records)
 
-**Date:** {datetime.now().strftime('%B %d, %Y at %I:%M %p')}  
-**Calls Analyzed:** {len(self.transcripts)}  
-**Total Issues Found:** {len(bugs) + len(self.all_issues)}
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get('version') != ANALYSIS_VERSION:
+            # Detection logic changed - cached findings are stale
+            return {}
+        return manifest.get('files', {})
 
-## Executive Summary
+    def save_manifest(self, files):
+        if not os.path.isdir(self.transcripts_dir):
+            # No transcripts yet - nothing to cache, and no directory to create
+            return
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': ANALYSIS_VERSION, 'files': files}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.manifest_path)
 
-This report documents bugs and quality issues discovered through automated testing of the Pretty Good AI voice agent. Each call simulated a realistic patient interaction to test the agent's ability to handle common medical office scenarios.
+    def file_jobs(self, entries, paths):
+        """(path, offset) jobs for files that are new or changed since their manifest entry
 
-### Severity Breakdown
-- **Critical:** {len(critical)} - System failures preventing basic functionality
-- **High:** {len(high)} - Major issues affecting user experience  
-- **Medium:** {len(medium)} - Noticeable problems that should be fixed
-- **Low:** {len(low)} - Minor quality improvements
+        Entries of vanished files, and of files that must be re-read from the
+        start, are dropped from `entries`
+        """
+        jobs = []
+        for filepath in paths:
+            try:
+                stat = os.stat(filepath)
+            except FileNotFoundError:
+                entries.pop(filepath, None)
+                continue
+            entry = entries.get(filepath)
+            if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+                continue
+            if entry and filepath.endswith('.jsonl') and stat.st_size > entry['size']:
+                # Segment was appended to - parse only the new tail
+                jobs.append((filepath, entry['offset']))
+            else:
+                entries.pop(filepath, None)
+                jobs.append((filepath, 0))
+        return jobs
 
----
+    def apply_results(self, entries, results):
+        """Record finished jobs in `entries` - returns the new per-call records"""
+        added = []
+        for filepath, mtime, size, offset, records, replies, latency in results:
+            entry = entries.get(filepath)
+            if entry:
+                # Appended tail - its replies join the file's table, its samples the buckets
+                table = ReplyTable(entry['replies'])
+                positions = table.add_all(replies)
+                for r in records:
+                    r['replies'] = [positions[i] for i in r['replies']]
+                replies = table.texts
+                latency = merge_latency(entry['latency'], latency)
+            entries[filepath] = {
+                'mtime': mtime,
+                'size': size,
+                'offset': offset,
+                'results': (entry['results'] if entry else []) + records,
+                'replies': replies,
+                'latency': latency
+            }
+            added.extend(records)
+        return added
 
-## Critical Issues
+    def collect(self, entries, records):
+        """Findings and report inputs from per-call records and their files' entries
 
-"""
+        `records` are the calls to report (the latest copy of each); span timings
+        are merged per file, so a call saved twice by an older server counts twice there
+        """
+        self.calls_analyzed = len(records)
+        keep = {id(r) for r in records}
+        table = ReplyTable()
+        self.all_issues, self.reply_calls, self.conversations, self.latency = [], [], [], {}
+        for entry in entries.values():
+            merge_latency(self.latency, entry['latency'])
+            positions = None
+            for r in entry['results']:
+                if id(r) not in keep:
+                    continue
+                if positions is None:
+                    positions = table.add_all(entry['replies'])
+                self.reply_calls.append([positions[i] for i in r['replies']])
+        self.replies = table.texts
         
-        if critical:
-            for i, bug in enumerate(critical, 1):
-                report += f"### {i}. {bug['issue']}\n\n"
-                report += f"**Call ID:** `{bug['call_sid']}`\n\n"
-                if 'scenario' in bug:
-                    report += f"**Scenario:** {bug['scenario']}\n\n"
-                report += "**Impact:** Agent completely failed to respond\n\n"
-                report += "---\n\n"
-        else:
-            report += "*No critical issues found.*\n\n---\n\n"
+        bugs = []
+        for r in records:
+            bugs.extend(r['bugs'])
+            self.all_issues.extend(r['issues'])
+            self.conversations.append(r['shape'])
+        return bugs
+
+    def analyze_incremental(self):
+        """Analyze only new or changed files; cached findings are reused for the rest"""
+        files = self.transcript_files()
+        present = set(files)
+        current = {path: entry for path, entry in self.load_manifest().items() if path in present}
+        jobs = self.file_jobs(current, files)
+        self.apply_results(current, self.run_jobs(jobs))
         
-        report += "## High Severity Issues\n\n"
-        report += "*These issues significantly impact the user experience and should be prioritized.*\n\n"
+        self.save_manifest(current)
+        print(f"Analyzed {len(jobs)} new or changed files, "
+              f"{len(current) - len(jobs)} unchanged from cache")
         
-        if high:
-            for i, bug in enumerate(high, 1):
-                report += f"### {i}. {bug['issue']}\n\n"
-                report += f"**Call ID:** `{bug['call_sid']}`\n\n"
-                if 'scenario' in bug:
-                    report += f"**Test Scenario:** {bug['scenario']}\n\n"
-                if 'agent_response' in bug:
-                    report += "**Agent's Response:**\n"
-                    report += f"> {bug['agent_response']}\n\n"
-                report += "**Why This Matters:** Agent failed to understand the core intent of the call\n\n"
-                report += "---\n\n"
-        else:
-            report += "*No high severity issues found.*\n\n---\n\n"
-        
-        report += "## Medium Severity Issues\n\n"
-        report += "*These issues detract from the experience but don't prevent core functionality.*\n\n"
+        records = latest_per_call(r for entry in current.values() for r in entry['results'])
+        print(f"Loaded {len(records)} transcripts")
+        return self.collect(current, records)
+
+    def run_jobs(self, jobs):
+        """Spread file parsing/analysis over a process pool (inline for small batches)"""
+        if len(jobs) < PARALLEL_THRESHOLD or self.workers == 1:
+            return [analyze_file(path, offset) for path, offset in jobs]
         
-        if medium:
-            for i, bug in enumerate(medium, 1):
-                report += f"### {i}. {bug['issue']}\n\n"
-                report += f"**Call ID:** `{bug['call_sid']}`\n\n"
-                if 'example' in bug:
-                    report += "**Example:**\n"
-                    report += f"> {bug['example']}\n\n"
-                if 'turns' in bug:
-                    report += f"**Conversation Length:** Only {bug['turns']} turns\n\n"
-                report += "---\n\n"
+        paths = [path for path, _ in jobs]
+        offsets = [offset for _, offset in jobs]
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(analyze_file, paths, offsets, chunksize=16))
+    
+    def generate_report(self, output_file="BUG_REPORT.md", report_format=None):
+        """Generate comprehensive bug report (markdown, JSON or HTML - see report_writers)"""
+        if self.filtered():
+            self.load_selected()
+            bugs = self.analyze_transcripts()
+        elif self.incremental:
+            bugs = self.analyze_incremental()
         else:
-            report += "*No medium severity issues found.*\n\n---\n\n"
+            self.load_transcripts()
+            bugs = self.analyze_transcripts()
         
-        report += "## Low Severity / Polish Issues\n\n"
-        report += "*Minor improvements that would enhance perceived quality.*\n\n"
+        self.write_report(bugs, output_file, report_format)
         
-        if low:
-            for i, bug in enumerate(low, 1):
-                report += f"### {i}. {bug['issue']}\n\n"
-                report += f"**Call ID:** `{bug['call_sid']}`\n\n"
-                if 'example' in bug:
-                    report += "**Example:**\n"
-                    report += f"> {bug['example']}\n\n"
-                report += "---\n\n"
-        else:
-            report += "*No low severity issues found.*\n\n---\n\n"
-        
-        report += "## Common Patterns\n\n"
-        report += "*Issues that appeared multiple times across different calls.*\n\n"
+        print(f"\n{'='*60}")
+        print(f"Bug report generated: {output_file}")
+        print(f"Total issues: {len(bugs) + len(self.all_issues)}")
+        print(f"{'='*60}\n")
+
+    def write_report(self, bugs, output_file, report_format=None):
+        """Write the report for `bugs` and the collected report inputs
+
+        The file is replaced in one step, so a reader never sees half a report
+        """
+        groups = group_findings(bugs)
+        counts = Counter(b['type'] for b in bugs)
+        issue_counts = Counter(self.all_issues)
+        fmt = format_for(output_file, report_format)
         
-        if issue_counts:
-            report += "| Issue Type | Occurrences |\n"
-            report += "|-----------|-------------|\n"
-            for issue, count in issue_counts.most_common():
-                report += f"| {issue} | {count} |\n"
-            report += "\n"
+        tmp_path = output_file + '.tmp'
+        with open(tmp_path, 'w') as f:
+            writer = create_writer(f, fmt)
+            writer.header(
+                "Bug Report: Pretty Good AI Voice Agent Testing",
+                {
+                    "Date": datetime.now().strftime('%B %d, %Y at %I:%M %p'),
+                    "Calls Analyzed": self.calls_analyzed,
+                    "Total Issues Found": len(bugs) + len(self.all_issues)
+                },
+                self.query_summary() + "This report documents bugs and quality issues discovered through automated testing of the Pretty Good AI voice agent. Each call simulated a realistic patient interaction to test the agent's ability to handle common medical office scenarios."
+            )
+            writer.severity_summary(counts, {
+                "critical": "System failures preventing basic functionality",
+                "high": "Major issues affecting user experience",
+                "medium": "Noticeable problems that should be fixed",
+                "low": "Minor quality improvements"
+            })
+            
+            # Repeated findings are folded into one entry per issue
+            writer.findings("critical", "Critical Issues", None,
+                            "**Impact:** Agent completely failed to respond",
+                            groups["critical"])
+            writer.findings("high", "High Severity Issues",
+                            "These issues significantly impact the user experience and should be prioritized.",
+                            "**Why This Matters:** Agent failed to understand the core intent of the call",
+                            groups["high"])
+            writer.findings("medium", "Medium Severity Issues",
+                            "These issues detract from the experience but don't prevent core functionality.",
+                            None, groups["medium"])
+            writer.findings("low", "Low Severity / Polish Issues",
+                            "Minor improvements that would enhance perceived quality.",
+                            None, groups["low"])
+            
+            writer.table("patterns", "Common Patterns",
+                         "Issues that appeared multiple times across different calls.",
+                         ["Issue Type", "Occurrences"], issue_counts.most_common(),
+                         "No recurring patterns detected.")
+            
+            writer.table("latency", "Turn Latency",
+                         "Per-request span timings recorded by the voice bot, in milliseconds.",
+                         ["Endpoint", "Span", "Samples"] + [f"p{p} (ms)" for p in PERCENTILES],
+                         latency_percentiles(self.latency),
+                         "No timing data in these transcripts.")
+            
+            stats = ConversationStats(self.conversations)
+            writer.table("responsiveness", "Agent Responsiveness",
+                         "Seconds from each patient message to the agent's next message "
+                         "(patient speech, agent thinking and agent speech).",
+                         ["Scenario", "Replies"] + [f"p{p} (s)" for p in PERCENTILES],
+                         stats.responsiveness_rows(),
+                         "No message timestamps in these transcripts.")
+            
+            writer.table("resolution", "Turns to Resolution",
+                         "How long each scenario's calls ran.",
+                         ["Scenario", "Calls", "Turns p50", "Turns p95", "Max Turns",
+                          "Duration p50 (s)", "Duration p95 (s)"],
+                         stats.resolution_rows(),
+                         "No calls analyzed.")
+            
+            writer.table("outliers", "Slowest Calls",
+                         "Calls whose slowest agent reply is far outside the usual range.",
+                         ["Call ID", "Scenario", "Slowest Reply (s)", "Median Reply (s)",
+                          "Turns", "Duration (s)"],
+                         stats.outlier_rows(MAX_OUTLIERS),
+                         "No outlier calls.")
+            
+            writer.table("response_clusters", "Most Repeated Agent Responses",
+                         "Near-identical agent replies clustered across all calls. Many occurrences "
+                         "per call point to a loop; a cluster spread over most calls is a canned reply.",
+                         ["Response", "Occurrences", "Calls", "Variants"],
+                         ([c.representative[:120], c.occurrences, c.calls, c.variants]
+                          for c in cluster_responses(self.replies, self.reply_calls, MAX_CLUSTERS)),
+                         "No repeated agent responses.")
+            
+            found = {g.issue.lower() for severity_groups in groups.values() for g in severity_groups}
+            recs = []
+            
+            if any('acknowledge' in issue for issue in found):
+                recs.append("**Improve Intent Recognition**: Agent needs better training on recognizing appointment and prescription requests in the opening statement")
+            
+            if any('repeated' in issue for issue in found):
+                recs.append("**Fix Response Loop**: Implement conversation state tracking to prevent repeating the same response")
+            
+            if any('greeting' in issue for issue in found):
+                recs.append("**Standardize Greetings**: Ensure all calls start with a polite, professional greeting")
+            
+            if any('closing' in issue for issue in found):
+                recs.append("**Add Closing Protocol**: Implement proper conversation endings with thank you and goodbye")
+            
+            if any('prematurely' in issue for issue in found):
+                recs.append("**Extend Conversations**: Agent should ask follow-up questions rather than ending calls abruptly")
+            
+            writer.items("recommendations", "Recommendations", recs,
+                         "Overall performance is good. Continue monitoring for edge cases.")
+            
+            writer.footer("Test Data", [
+                f"All {self.calls_analyzed} call transcripts are available in the `transcripts/` directory.",
+                "",
+                "Each transcript includes:",
+                "- Full conversation history",
+                "- Timing information (per-turn span timings)",
+                "- Real-time issue detection",
+                "- Call metadata"
+            ])
+        os.replace(tmp_path, output_file)
+
+    def export_intent_turns(self, output_file):
+        """Write the turns the intent check scores as JSONL, ready to be labeled by hand"""
+        if self.filtered():
+            self.load_selected()
         else:
-            report += "*No recurring patterns detected.*\n\n"
-        
-        report += "---\n\n"
-        report += "## Recommendations\n\n"
-        
-        recs = []
-        
-        if any('acknowledge' in b['issue'].lower() for b in bugs):
-            recs.append("**Improve Intent Recognition**: Agent needs better training on recognizing appointment and prescription requests in the opening statement")
-        
-        if any('repeated' in b['issue'].lower() for b in bugs):
-            recs.append("**Fix Response Loop**: Implement conversation state tracking to prevent repeating the same response")
-        
-        if any('greeting' in b['issue'].lower() for b in bugs):
-            recs.append("**Standardize Greetings**: Ensure all calls start with a polite, professional greeting")
-        
-        if any('closing' in b['issue'].lower() for b in bugs):
-            recs.append("**Add Closing Protocol**: Implement proper conversation endings with thank you and goodbye")
+            self.load_transcripts()
+        rows = intent_turns(self.transcripts)
+        with open(output_file, 'w') as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+        print(f"Wrote {len(rows)} turns to {output_file} - set \"acknowledged\" to true or false on each")
+
+    def query_summary(self):
+        parts = []
+        if self.scenario:
+            parts.append(f'scenario matching "{self.scenario}"')
+        if self.since:
+            parts.append(f"started since {self.since}")
+        if self.call_sids:
+            parts.append(f"call IDs {', '.join(self.call_sids)}")
+        return f"Filtered to calls with {' and '.join(parts)}. " if parts else ""
+
+    def watch(self, output_file="BUG_REPORT.md", report_format=None, interval=REPORT_INTERVAL):
+        """Analyze transcripts as they land; the report is rewritten at most every `interval` seconds
+
+        Findings live in memory per call, so a change only costs parsing the
+        files that changed (the new tail, for JSONL segments). Runs until Ctrl+C
+        """
+        from watchfiles import watch
         
-        if any('prematurely' in b['issue'].lower() for b in bugs):
-            recs.append("**Extend Conversations**: Agent should ask follow-up questions rather than ending calls abruptly")
+        os.makedirs(self.transcripts_dir, exist_ok=True)
+        root = os.path.abspath(self.transcripts_dir)
+        report_path = os.path.abspath(output_file)
         
-        if recs:
-            for j, rec in enumerate(recs, 1):
-                report += f"{j}. {rec}\n\n"
-        else:
-            report += "*Overall performance is good. Continue monitoring for edge cases.*\n\n"
+        def is_transcript(_, path):
+            parts = os.path.relpath(path, root).split(os.sep)
+            if any(part.startswith('.') for part in parts):
+                return False
+            # New shard directories too - files can land in them before they are watched
+            return os.path.isdir(path) or (parts[-1].endswith(('.json', '.jsonl'))
+                                           and os.path.abspath(path) != report_path)
         
-        report += "---\n\n"
-        report += "## Test Data\n\n"
-        report += f"All {len(self.transcripts)} call transcripts are available in the `transcripts/` directory.\n\n"
-        report += "Each transcript includes:\n"
-        report += "- Full conversation history\n"
-        report += "- Timing information\n"
-        report += "- Real-time issue detection\n"
-        report += "- Call metadata\n"
+        files = self.transcript_files()
+        present = set(files)
+        entries = ({path: entry for path, entry in self.load_manifest().items() if path in present}
+                   if self.incremental else {})
+        self.apply_results(entries, self.run_jobs(self.file_jobs(entries, files)))
+        by_call = {}
+        merge_latest(by_call, (r for entry in entries.values() for r in entry['results']))
+        counts = Counter(b['type'] for r in by_call.values() for b in r['bugs'])
+        print(f"Watching {self.transcripts_dir} - {len(by_call)} calls so far, "
+              f"report every {interval:g}s to {output_file}")
         
-        # Save report
-        with open(output_file, 'w') as f:
-            f.write(report)
+        dirty = True
+        last_write = float('-inf')
+        try:
+            for changes in watch(self.transcripts_dir, watch_filter=is_transcript,
+                                 rust_timeout=int(interval * 1000), yield_on_timeout=True):
+                # Same path form as transcript_files(), so manifest keys match
+                paths = set()
+                for _, path in changes:
+                    path = os.path.join(self.transcripts_dir, os.path.relpath(path, root))
+                    paths.update(transcript_paths(path) if os.path.isdir(path) else [path])
+                paths = sorted(paths)
+                if paths:
+                    added = self.apply_results(entries, self.run_jobs(self.file_jobs(entries, paths)))
+                    if any(not os.path.exists(p) for p in paths):
+                        # A file was removed - its calls go too
+                        by_call = {}
+                        merge_latest(by_call, (r for entry in entries.values() for r in entry['results']))
+                        counts = Counter(b['type'] for r in by_call.values() for b in r['bugs'])
+                        dirty = True
+                    else:
+                        for record, previous in merge_latest(by_call, added):
+                            counts.update(b['type'] for b in record['bugs'])
+                            if previous:
+                                counts.subtract(b['type'] for b in previous['bugs'])
+                    if added:
+                        print(f"[{datetime.now().strftime('%H:%M:%S')}] +{len(added)} calls "
+                              f"({len(by_call)} total) - " +
+                              ", ".join(f"{sev}: {counts[sev]}" for sev in SEVERITIES))
+                        dirty = True
+                
+                if dirty and time.monotonic() - last_write >= interval:
+                    self.write_report(self.collect(entries, list(by_call.values())), output_file,
+                                      report_format)
+                    self.save_manifest(entries)
+                    last_write = time.monotonic()
+                    dirty = False
+        except KeyboardInterrupt:
+            pass
         
-        print(f"\n{'='*60}")
-        print(f"Bug report generated: {output_file}")
-        print(f"Total issues: {len(bugs) + len(self.all_issues)}")
-        print(f"{'='*60}\n")
+        if dirty:
+            self.write_report(self.collect(entries, list(by_call.values())), output_file,
+                              report_format)
+            self.save_manifest(entries)
+        print(f"\nStopped watching - report at {output_file} ({len(by_call)} calls)")
 
 
 if __name__ == "__main__":
-    analyzer = BugAnalyzer()
-    analyzer.generate_report()
+    parser = argparse.ArgumentParser(description="Analyze call transcripts and write a bug report")
+    parser.add_argument("--transcripts", default="transcripts", help="transcripts directory")
+    parser.add_argument("--output", default="BUG_REPORT.md", help="report file")
+    parser.add_argument("--format", choices=["md", "json", "html"], default=None,
+                        help="report format (default: from the --output extension)")
+    parser.add_argument("--full", action="store_true",
+                        help="ignore the manifest cache and re-analyze everything")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="process pool size for new transcripts (default: CPU count)")
+    parser.add_argument("--scenario", help="only calls whose scenario contains this text")
+    parser.add_argument("--since", help="only calls started at or after this ISO date/time")
+    parser.add_argument("--call-sid", action="append", dest="call_sids",
+                        help="only this call (repeatable)")
+    parser.add_argument("--reindex", action="store_true",
+                        help="rebuild the call index from the transcript files first")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and analyze transcripts as they are written")
+    parser.add_argument("--interval", type=float, default=REPORT_INTERVAL,
+                        help="with --watch: minimum seconds between report rewrites")
+    parser.add_argument("--export-intent-turns", metavar="FILE",
+                        help="write the turns the intent check scores for labeling, instead of a report")
+    args = parser.parse_args()
+    if args.watch and (args.scenario or args.since or args.call_sids):
+        parser.error("--watch reports on every call; query filters are for one-off reports")
+    
+    if args.reindex:
+        print(f"Indexed {build_index(args.transcripts)} calls")
+    
+    analyzer = BugAnalyzer(args.transcripts, incremental=not args.full, workers=args.workers,
+                           scenario=args.scenario, since=args.since, call_sids=args.call_sids)
+    if args.export_intent_turns:
+        analyzer.export_intent_turns(args.export_intent_turns)
+    elif args.watch:
+        analyzer.watch(args.output, args.format, args.interval)
+    else:
+        analyzer.generate_report(args.output, args.format)
@@ -0,0 +1,182 @@
+"""
+Benchmark for BugAnalyzer
+Generates synthetic corpora (synth_transcripts.py), times each analyzer stage in a
+fresh process and checks the findings against the injected ground truth
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import resource
+import argparse
+import tempfile
+import contextlib
+import subprocess
+from collections import Counter
+from analyze_bugs import BugAnalyzer, MANIFEST_NAME
+from synth_transcripts import DEFAULT_MIX, generate_corpus, load_ground_truth, parse_mix
+
+# Run in this order against the same corpus; the warm pass reuses the cold pass's manifest
+STAGES = ["load", "analyze", "report", "incremental_cold", "incremental_warm"]
+# Mismatching calls listed in the output
+MAX_EXAMPLES = 5
+
+
+def peak_rss_mb():
+    """High-water RSS of this process and of any pool workers it waited for"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) / 1024, 1)  # Linux reports KB
+
+
+def check_findings(directory, bugs, issues):
+    """Compare analyzer output to the corpus ground truth - returns a summary dict"""
+    truth = load_ground_truth(directory)
+    found = {}
+    for bug in bugs:
+        found.setdefault(bug['call_sid'], []).append(bug['issue'])
+
+    wrong = []
+    for call_sid in set(found) | set(truth['bugs']):
+        expected = truth['bugs'].get(call_sid, [])
+        actual = sorted(found.get(call_sid, []))
+        if actual != expected:
+            wrong.append({'call_sid': call_sid, 'expected': expected, 'found': actual})
+
+    live_expected = Counter(truth['issues'])
+    live_found = Counter(issues)
+    return {
+        'calls_wrong': len(wrong),
+        'examples': wrong[:MAX_EXAMPLES],
+        'live_issues_ok': live_found == live_expected,
+        'live_issues_diff': dict((live_found - live_expected) + (live_expected - live_found))
+    }
+
+
+def run_stage(stage, directory, workers):
+    """One stage, timed - called in a fresh process so peak memory is this stage's own"""
+    baseline = peak_rss_mb()
+    report_path = os.path.join(tempfile.mkdtemp(prefix="bench_report_"), "BUG_REPORT.md")
+    result = {}
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if stage in ("load", "analyze"):
+            analyzer = BugAnalyzer(directory, incremental=False)
+            start = time.perf_counter()
+            analyzer.load_transcripts()
+            if stage == "analyze":
+                start = time.perf_counter()
+                bugs = analyzer.analyze_transcripts()
+                elapsed = time.perf_counter() - start
+                result['check'] = check_findings(directory, bugs, analyzer.all_issues)
+            else:
+                elapsed = time.perf_counter() - start
+        else:
+            if stage == "incremental_cold":
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(os.path.join(directory, MANIFEST_NAME))
+            analyzer = BugAnalyzer(directory, incremental=stage != "report", workers=workers)
+            start = time.perf_counter()
+            analyzer.generate_report(report_path)
+            elapsed = time.perf_counter() - start
+
+    shutil.rmtree(os.path.dirname(report_path), ignore_errors=True)
+    result.update({
+        'stage': stage,
+        'seconds': round(elapsed, 3),
+        'calls': analyzer.calls_analyzed,
+        'peak_rss_mb': peak_rss_mb(),
+        'baseline_rss_mb': baseline
+    })
+    return result
+
+
+def bench_corpus(directory, workers):
+    """Every stage against one corpus, each in its own interpreter"""
+    files = len(BugAnalyzer(directory).transcript_files())
+    results = []
+    for stage in STAGES:
+        command = [sys.executable, os.path.abspath(__file__), "--stage", stage, "--dir", directory]
+        if workers:
+            command += ["--workers", str(workers)]
+        out = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        result['files'] = files
+        result['files_per_sec'] = round(files / result['seconds'], 1) if result['seconds'] else None
+        result['calls_per_sec'] = round(result['calls'] / result['seconds']) if result['seconds'] else None
+        results.append(result)
+    return results
+
+
+def print_results(size, fmt, generate_seconds, results):
+    print(f"\n{'='*78}")
+    print(f"{size} calls ({fmt}) - generated in {generate_seconds:.1f}s")
+    print(f"{'='*78}")
+    print(f"{'Stage':<18} {'Wall (s)':>9} {'Files':>7} {'Files/s':>9} {'Calls/s':>9} {'Peak RSS (MB)':>14}")
+    for r in results:
+        print(f"{r['stage']:<18} {r['seconds']:>9.3f} {r['files']:>7} {r['files_per_sec']:>9} "
+              f"{r['calls_per_sec']:>9} {r['peak_rss_mb']:>14}")
+    for r in results:
+        check = r.get('check')
+        if check is None:
+            continue
+        if check['calls_wrong'] == 0 and check['live_issues_ok']:
+            print("Ground truth: all findings match")
+            continue
+        print(f"Ground truth MISMATCH: {check['calls_wrong']} calls wrong")
+        for example in check['examples']:
+            print(f"  {example['call_sid']}: expected {example['expected']}, found {example['found']}")
+        if not check['live_issues_ok']:
+            print(f"  live issues off by: {check['live_issues_diff']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BugAnalyzer on synthetic transcripts")
+    parser.add_argument("--calls", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="corpus sizes to benchmark")
+    parser.add_argument("--format", choices=["jsonl", "json"], default="jsonl",
+                        help="transcript layout (json = one file per call)")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help='bug rates, e.g. "repeat=0.1,no_closing=0.2" ("none" = no bugs)')
+    parser.add_argument("--workers", type=int, default=None, help="analyzer process pool size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="keep the generated corpora")
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--stage", choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        # Child process: one stage, result as the last line of stdout
+        print(json.dumps(run_stage(args.stage, args.dir, args.workers)))
+        return 0
+
+    all_results = []
+    failed = False
+    for size in args.calls:
+        directory = tempfile.mkdtemp(prefix=f"bench_{size}_")
+        start = time.perf_counter()
+        generate_corpus(directory, size, args.mix, args.format, args.seed)
+        generate_seconds = time.perf_counter() - start
+
+        results = bench_corpus(directory, args.workers)
+        print_results(size, args.format, generate_seconds, results)
+        failed |= any(r.get('check') and (r['check']['calls_wrong'] or not r['check']['live_issues_ok'])
+                      for r in results)
+        all_results.append({'calls': size, 'format': args.format, 'stages': results})
+
+        if args.keep:
+            print(f"Corpus kept at {directory}")
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(all_results, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Conversation statistics for analyze_bugs
+Reply gaps are computed per batch of calls from flat NumPy arrays of message
+timestamps; per-scenario percentiles and outliers are array operations over the
+gaps, durations and turn counts of the whole corpus
+"""
+
+from typing import List
+
+import numpy as np
+
+# Nearest-rank percentiles for every table in the report - analyze_bugs' latency
+# table uses these too, so the two sections agree
+PERCENTILES = (50, 90, 99)
+# A call is an outlier when its slowest agent reply is past Q3 + this many IQRs
+OUTLIER_IQR = 3.0
+ALL_SCENARIOS = "All scenarios"
+
+
+def reply_gaps(transcripts: List[dict]):
+    """Agent reply gaps across a batch of calls - returns (gaps, index of each gap's call)
+
+    A gap is the time from a patient message to the agent's next message, as
+    stamped by ConversationManager.add_message. Every call's timestamps go into
+    one flat array and are parsed in a single conversion
+    """
+    messages = [t.get('messages', []) for t in transcripts]
+    lengths = np.fromiter((len(m) for m in messages), dtype=np.int64, count=len(messages))
+    call_of_message = np.repeat(np.arange(len(messages)), lengths)
+    speakers = np.array([m['speaker'] == 'Agent' for ms in messages for m in ms], dtype=bool)
+    stamps = np.array([m.get('timestamp') or 'NaT' for ms in messages for m in ms],
+                      dtype='datetime64[ms]')
+    seconds = stamps.astype(np.float64) / 1000.0
+    seconds[np.isnat(stamps)] = np.nan
+
+    # Patient message followed by an agent message in the same call
+    reply = ((call_of_message[1:] == call_of_message[:-1])
+             & ~speakers[:-1] & speakers[1:])
+    gaps = seconds[1:] - seconds[:-1]
+    reply &= ~np.isnan(gaps)
+    return gaps[reply], call_of_message[1:][reply]
+
+
+def conversation_shapes(transcripts: List[dict]) -> List[dict]:
+    """What ConversationStats needs from each transcript - small enough for the manifest
+
+    Gaps are worked out here, once per batch, so a call is cached as a few
+    numbers rather than every message's speaker and timestamp
+    """
+    gaps, gap_calls = reply_gaps(transcripts)
+    # gap_calls is ascending, so each call's gaps are one contiguous run
+    counts = np.bincount(gap_calls, minlength=len(transcripts))
+    per_call = np.split(np.round(gaps, 3), np.cumsum(counts)[:-1])
+    return [{
+        'call_sid': t['call_sid'],
+        'scenario': t.get('scenario', ''),
+        'duration': t.get('duration', 0.0),
+        'turns': t.get('turns', len(t.get('messages', [])) // 2),
+        'gaps': call_gaps.tolist()
+    } for t, call_gaps in zip(transcripts, per_call)]
+
+
+def grouped_percentiles(groups: np.ndarray, values: np.ndarray, pcts=PERCENTILES):
+    """Per-group nearest-rank percentiles without a Python loop over groups
+
+    Returns (group ids, sample counts, [group x percentile] matrix)
+    """
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    ids, starts, counts = np.unique(groups, return_index=True, return_counts=True)
+    ranks = np.maximum(1, np.ceil(np.outer(counts, pcts) / 100).astype(np.int64))
+    return ids, counts, values[starts[:, None] + ranks - 1]
+
+
+class ConversationStats:
+    """Agent response gaps, turns-to-resolution and outlier calls across a corpus
+
+    Built from conversation_shapes() - a gap covers the patient's speech, the
+    agent's thinking time and the agent's own speech
+    """
+
+    def __init__(self, shapes: List[dict]):
+        self.scenarios = sorted({s['scenario'] for s in shapes})
+        scenario_index = {name: i for i, name in enumerate(self.scenarios)}
+        self.call_sids = [s['call_sid'] for s in shapes]
+        self.call_scenario = np.array([scenario_index[s['scenario']] for s in shapes], dtype=np.int64)
+        self.duration = np.array([s['duration'] for s in shapes], dtype=np.float64)
+        self.turns = np.array([s['turns'] for s in shapes], dtype=np.int64)
+
+        lengths = np.fromiter((len(s['gaps']) for s in shapes), dtype=np.int64, count=len(shapes))
+        self.gaps = np.fromiter((g for s in shapes for g in s['gaps']), dtype=np.float64,
+                                count=int(lengths.sum()))
+        self.gap_calls = np.repeat(np.arange(len(shapes)), lengths)
+
+    def responsiveness_rows(self) -> List[list]:
+        """[scenario, replies, p50, p95, p99] in seconds, all scenarios first"""
+        if not len(self.gaps):
+            return []
+        overall = np.percentile(self.gaps, PERCENTILES, method='inverted_cdf')
+        rows = [[ALL_SCENARIOS, len(self.gaps)] + [round(float(v), 2) for v in overall]]
+        ids, counts, table = grouped_percentiles(self.call_scenario[self.gap_calls], self.gaps)
+        for scenario, count, values in zip(ids, counts, table):
+            rows.append([self.scenarios[scenario], int(count)] + [round(float(v), 2) for v in values])
+        return rows
+
+    def resolution_rows(self) -> List[list]:
+        """[scenario, calls, turns p50, turns p95, max turns, duration p50, duration p95]"""
+        if not len(self.turns):
+            return []
+        ids, counts, turns = grouped_percentiles(self.call_scenario, self.turns, (50, 95))
+        _, _, durations = grouped_percentiles(self.call_scenario, self.duration, (50, 95))
+        most = np.zeros(len(self.scenarios), dtype=np.int64)
+        np.maximum.at(most, self.call_scenario, self.turns)
+        return [[self.scenarios[s], int(n), int(t[0]), int(t[1]), int(most[s]),
+                 round(float(d[0]), 1), round(float(d[1]), 1)]
+                for s, n, t, d in zip(ids, counts, turns, durations)]
+
+    def outlier_rows(self, limit: int = 10) -> List[list]:
+        """[call_sid, scenario, slowest reply, median reply, turns, duration] for the worst calls"""
+        if not len(self.gaps):
+            return []
+        q1, q3 = np.percentile(self.gaps, (25, 75))
+        fence = q3 + OUTLIER_IQR * (q3 - q1)
+
+        slowest = np.full(len(self.call_sids), -np.inf)
+        np.maximum.at(slowest, self.gap_calls, self.gaps)
+        worst = np.flatnonzero(slowest > fence)
+        worst = worst[np.argsort(-slowest[worst], kind='stable')][:limit]
+        if not len(worst):
+            return []
+
+        ids, _, medians = grouped_percentiles(self.gap_calls, self.gaps, (50,))
+        median_of = dict(zip(ids.tolist(), medians[:, 0].tolist()))
+        return [[self.call_sids[c], self.scenarios[self.call_scenario[c]],
+                 round(float(slowest[c]), 2), round(median_of[c], 2),
+                 int(self.turns[c]), round(float(self.duration[c]), 1)]
+                for c in worst.tolist()]
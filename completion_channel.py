@@ -0,0 +1,89 @@
+"""
+Local call-completion channel
+voice_bot publishes terminal call statuses from /status, run_tests listens for them
+"""
+
+import os
+import json
+import socket
+import asyncio
+from typing import Dict, Optional
+
+# UDP on localhost: fire-and-forget for the server, works from any uvicorn worker
+COMPLETION_CHANNEL = os.environ.get("COMPLETION_CHANNEL", "127.0.0.1:8766")
+
+
+def channel_address(channel: str = COMPLETION_CHANNEL):
+    host, _, port = channel.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def publish_completion(call_sid: str, status: str, channel: str = COMPLETION_CHANNEL):
+    """Announce a finished call - never raises, nobody may be listening"""
+    payload = json.dumps({"call_sid": call_sid, "status": status}).encode()
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.sendto(payload, channel_address(channel))
+    except OSError as e:
+        print(f"Completion channel unavailable: {e}")
+
+
+class _ListenerProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, listener: "CompletionListener"):
+        self.listener = listener
+
+    def datagram_received(self, data, addr):
+        try:
+            event = json.loads(data)
+            self.listener.on_completion(event["call_sid"], event["status"])
+        except (ValueError, KeyError, TypeError):
+            pass
+
+
+class CompletionListener:
+    """Collects completion events and lets callers await a specific call"""
+
+    def __init__(self, channel: str = COMPLETION_CHANNEL):
+        self.channel = channel
+        self.statuses: Dict[str, str] = {}
+        self.waiters: Dict[str, asyncio.Future] = {}
+        self.transport = None
+
+    async def start(self) -> bool:
+        """Bind the channel; returns False if it is unavailable (caller falls back to polling)"""
+        loop = asyncio.get_running_loop()
+        try:
+            self.transport, _ = await loop.create_datagram_endpoint(
+                lambda: _ListenerProtocol(self),
+                local_addr=channel_address(self.channel)
+            )
+        except OSError as e:
+            print(f"Could not listen on completion channel {self.channel}: {e}")
+            return False
+        return True
+
+    def on_completion(self, call_sid: str, status: str):
+        # Events can arrive before anyone waits on the call
+        self.statuses[call_sid] = status
+        waiter = self.waiters.pop(call_sid, None)
+        if waiter and not waiter.done():
+            waiter.set_result(status)
+
+    async def wait(self, call_sid: str, timeout: float) -> Optional[str]:
+        """Wait for the call's terminal status; None on timeout"""
+        if call_sid in self.statuses:
+            return self.statuses.pop(call_sid)
+
+        waiter = self.waiters.setdefault(call_sid, asyncio.get_running_loop().create_future())
+        try:
+            status = await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.statuses.pop(call_sid, None)
+        return status
+
+    def close(self):
+        if self.transport:
+            self.transport.close()
+            self.transport = None
@@ -0,0 +1,232 @@
+"""
+Shared detection-rule engine
+voice_bot's live per-turn checks and analyze_bugs' offline analysis run the same
+declarative rules (detection_rules.json, or the file named by DETECTION_RULES)
+
+Rule fields:
+  id, issue, severity         what is reported
+  stage                       "live", "offline" or "both"
+  speaker                     "Agent", "Patient" or "*"
+  position                    "any", "first" (speaker's first message) or "last" (last message of the call)
+  any / none                  keyword sets that must / must not appear (case-insensitive substrings)
+  regex                       pattern that must match the lowercased text
+  min_length                  minimum message length in characters
+  scenario_any                keywords, one of which must appear in the call's scenario
+  with_scenario, evidence,    extra fields copied into offline findings
+  evidence_chars
+"""
+
+import os
+import re
+import json
+import hashlib
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional
+
+RULES_PATH = os.environ.get(
+    "DETECTION_RULES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "detection_rules.json")
+)
+
+STAGES = {"live": ("live",), "offline": ("offline",), "both": ("live", "offline")}
+NO_HITS: FrozenSet[int] = frozenset()
+
+
+def trie_pattern(words: List[str]) -> str:
+    """Regex equivalent to an alternation of words, shaped like a trie (longest match wins)"""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Greedy optional: try the longer keyword before stopping here
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class Rule:
+    """One compiled rule - keyword sets are stored as term ids"""
+
+    __slots__ = ("order", "id", "issue", "severity", "stages", "speaker", "position",
+                 "any_terms", "none_terms", "scenario_terms", "regex_terms", "min_length",
+                 "with_scenario", "evidence", "evidence_chars")
+
+    def __init__(self, order: int, spec: dict, term_id):
+        self.order = order
+        self.id = spec["id"]
+        self.issue = spec["issue"]
+        self.severity = spec.get("severity", "medium")
+        self.stages = STAGES[spec.get("stage", "both")]
+        self.speaker = spec.get("speaker", "*")
+        self.position = spec.get("position", "any")
+        self.any_terms = frozenset(term_id(w) for w in spec.get("any", []))
+        self.none_terms = frozenset(term_id(w) for w in spec.get("none", []))
+        self.scenario_terms = frozenset(term_id(w) for w in spec.get("scenario_any", []))
+        self.regex_terms = frozenset([term_id(spec["regex"], regex=True)]) if spec.get("regex") else NO_HITS
+        self.min_length = spec.get("min_length", 0)
+        self.with_scenario = spec.get("with_scenario", False)
+        self.evidence = spec.get("evidence")
+        self.evidence_chars = spec.get("evidence_chars", 200)
+
+    def matches(self, length: int, hits: FrozenSet[int], scenario_hits: FrozenSet[int]) -> bool:
+        if length < self.min_length:
+            return False
+        if self.any_terms and not self.any_terms & hits:
+            return False
+        if self.none_terms & hits:
+            return False
+        if self.regex_terms and not self.regex_terms & hits:
+            return False
+        if self.scenario_terms and not self.scenario_terms & scenario_hits:
+            return False
+        return True
+
+    def finding(self, call_sid: str, scenario: str, text: str) -> dict:
+        """Offline bug record, same shape BugAnalyzer has always produced"""
+        bug = {'call_sid': call_sid, 'type': self.severity, 'issue': self.issue}
+        if self.with_scenario:
+            bug['scenario'] = scenario
+        if self.evidence:
+            bug[self.evidence] = text[:self.evidence_chars]
+        return bug
+
+
+class RuleEngine:
+    """Compiles every rule's keywords into one matcher; one scan per message"""
+
+    def __init__(self, specs: List[dict]):
+        self.literals: Dict[str, int] = {}
+        self.regexes: Dict[str, int] = {}
+        self.rules = [Rule(i, spec, self._term_id) for i, spec in enumerate(specs)]
+        self.fingerprint = hashlib.sha1(
+            json.dumps(specs, sort_keys=True).encode()
+        ).hexdigest()[:12]
+        self.uses_scenario = any(r.scenario_terms for r in self.rules)
+        self._compile()
+        self._index()
+
+    def _term_id(self, term: str, regex: bool = False) -> int:
+        table = self.regexes if regex else self.literals
+        key = term if regex else term.lower()
+        if key not in table:
+            table[key] = len(self.literals) + len(self.regexes)
+        return table[key]
+
+    def _compile(self):
+        # Literals: one trie-shaped lookahead tried at every offset, so the cost
+        # per offset depends on keyword length, not on how many keywords exist.
+        # It yields the longest keyword at each offset, which implies every
+        # keyword that is a prefix of it - overlapping matches are not lost.
+        literals = list(self.literals)
+        self.literal_re = re.compile(f"(?=({trie_pattern(literals)}))") if literals else None
+        self.implied = {
+            word: frozenset(self.literals[p] for p in literals if word.startswith(p))
+            for word in literals
+        }
+
+        # Regexes: a guard lookahead lets the C scanner skip offsets where
+        # nothing matches; at the offsets that remain every pattern is tried
+        self.regex_re = None
+        if self.regexes:
+            guard = "|".join(f"(?:{p})" for p in self.regexes)
+            groups = "".join(f"(?=(?P<r{i}>{p}))?" for p, i in self.regexes.items())
+            self.regex_re = re.compile(f"(?=(?:{guard})){groups}")
+
+    def _index(self):
+        # (stage, speaker, position) -> (rules always evaluated, term -> rules it can trigger)
+        self.buckets: Dict[tuple, tuple] = {}
+        for rule in self.rules:
+            for stage in rule.stages:
+                always, by_term = self.buckets.setdefault(
+                    (stage, rule.speaker, rule.position), ([], {})
+                )
+                if rule.any_terms:
+                    for term in rule.any_terms:
+                        by_term.setdefault(term, []).append(rule)
+                else:
+                    always.append(rule)
+
+    def scan(self, text: str) -> FrozenSet[int]:
+        """Ids of every keyword/regex term present in text"""
+        lower = text.lower()
+        hits = set()
+        if self.literal_re is not None:
+            for m in self.literal_re.finditer(lower):
+                hits |= self.implied[m.group(1)]
+        if self.regex_re is not None:
+            for m in self.regex_re.finditer(lower):
+                for name, value in m.groupdict().items():
+                    if value is not None:
+                        hits.add(int(name[1:]))
+        return frozenset(hits)
+
+    def _buckets_for(self, stage: str, speaker: str, first: bool, last: bool):
+        positions = ["any"]
+        if first:
+            positions.append("first")
+        if last:
+            positions.append("last")
+        for who in (speaker, "*"):
+            for position in positions:
+                bucket = self.buckets.get((stage, who, position))
+                if bucket:
+                    yield bucket
+
+    def check_message(self, text: str, speaker: str, stage: str, first: bool = False,
+                      last: bool = False, scenario_hits: FrozenSet[int] = NO_HITS) -> List[Rule]:
+        """Rules that fire for one message, in declaration order"""
+        buckets = list(self._buckets_for(stage, speaker, first, last))
+        if not buckets:
+            return []
+
+        hits = self.scan(text)
+        candidates = {}
+        for always, by_term in buckets:
+            for rule in always:
+                candidates[rule.order] = rule
+            for term in hits:
+                for rule in by_term.get(term, ()):
+                    candidates[rule.order] = rule
+
+        length = len(text)
+        return [rule for _, rule in sorted(candidates.items())
+                if rule.matches(length, hits, scenario_hits)]
+
+    def scenario_hits(self, scenario: str) -> FrozenSet[int]:
+        return self.scan(scenario) if self.uses_scenario else NO_HITS
+
+    def check_transcript(self, t: dict) -> List[dict]:
+        """Offline findings for a whole transcript"""
+        messages = t.get('messages', [])
+        scenario = t.get('scenario', '')
+        scenario_hits = self.scenario_hits(scenario)
+
+        bugs = []
+        seen = set()
+        for i, m in enumerate(messages):
+            speaker = m['speaker']
+            first = speaker not in seen
+            seen.add(speaker)
+            for rule in self.check_message(m['text'], speaker, "offline", first,
+                                           i == len(messages) - 1, scenario_hits):
+                bugs.append(rule.finding(t['call_sid'], scenario, m['text']))
+        return bugs
+
+
+def load_rules(path: Optional[str] = None) -> RuleEngine:
+    with open(path or RULES_PATH, 'r') as f:
+        return RuleEngine(json.load(f))
+
+
+@lru_cache(maxsize=None)
+def default_engine() -> RuleEngine:
+    """Engine for RULES_PATH, compiled once per process"""
+    return load_rules()
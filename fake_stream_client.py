@@ -0,0 +1,107 @@
+"""
+Fake Twilio ConversationRelay client for testing the streaming mode locally
+Plays a scripted agent against /media-stream and reports time-to-first-audio
+"""
+
+import sys
+import json
+import time
+import asyncio
+import websockets
+
+SERVER_URL = "ws://localhost:8000/media-stream"
+
+AGENT_SCRIPT = [
+    "Hi, this is the front desk at the orthopedic office. How can I help you today?",
+    "Sure, I can help with that. Can I get your name and date of birth?",
+    "Thanks. We have an opening on Monday at 10am, does that work?",
+    "Great, you're all set. Is there anything else I can help with?",
+    "You're welcome, have a great day. Goodbye."
+]
+
+# How long to wait for an "end" that follows a turn's last chunk
+END_GRACE = 0.5
+
+
+async def next_event(ws, timeout=None):
+    """Next server event, or None if nothing arrives within `timeout` seconds"""
+    try:
+        return json.loads(await asyncio.wait_for(ws.recv(), timeout))
+    except asyncio.TimeoutError:
+        return None
+
+
+async def check_hangup(ws):
+    """A prompt racing the hangup must not start another patient turn"""
+    await ws.send(json.dumps({"type": "prompt", "voicePrompt": "Hello?", "last": True}))
+    event = await next_event(ws, END_GRACE)
+    if event is not None:
+        print(f"  server kept talking after end: {event}")
+
+
+async def receive_patient_turn(ws, sent_at):
+    """Collect one streamed patient turn; returns (text, first_chunk_latency, ended)"""
+    chunks = []
+    first_chunk = None
+
+    while True:
+        event = json.loads(await ws.recv())
+        if event["type"] == "end":
+            return " ".join(chunks), first_chunk, True
+        if event["type"] != "text":
+            continue
+
+        if event["token"]:
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - sent_at
+            chunks.append(event["token"])
+        if event["last"]:
+            # A goodbye's last chunk is followed straight away by "end"
+            trailing = await next_event(ws, END_GRACE)
+            ended = trailing is not None and trailing["type"] == "end"
+            return " ".join(chunks), first_chunk, ended
+
+
+async def run_call(url=SERVER_URL, call_sid="CAfakestream0001"):
+    latencies = []
+
+    async with websockets.connect(url) as ws:
+        sent_at = time.perf_counter()
+        await ws.send(json.dumps({"type": "setup", "callSid": call_sid}))
+
+        for agent_line in AGENT_SCRIPT:
+            text, first_chunk, ended = await receive_patient_turn(ws, sent_at)
+            print(f"Patient: {text}")
+            if first_chunk is not None:
+                latencies.append(first_chunk)
+                print(f"  time to first audio: {first_chunk * 1000:.0f} ms")
+            if ended:
+                await check_hangup(ws)
+                break
+
+            # Incremental STT: a couple of partials, then the final result
+            words = agent_line.split()
+            for cut in (len(words) // 3, 2 * len(words) // 3):
+                await ws.send(json.dumps({
+                    "type": "prompt", "voicePrompt": " ".join(words[:cut]), "last": False
+                }))
+            print(f"Agent: {agent_line}")
+            sent_at = time.perf_counter()
+            await ws.send(json.dumps({"type": "prompt", "voicePrompt": agent_line, "last": True}))
+        else:
+            # The script's goodbye ends the call from the agent side
+            event = await next_event(ws, END_GRACE)
+            if event is not None and event["type"] == "end":
+                await check_hangup(ws)
+
+    if latencies:
+        latencies.sort()
+        print(f"\nTurns: {len(latencies)}")
+        print(f"Time to first audio: min {latencies[0] * 1000:.0f} ms, "
+              f"median {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+              f"max {latencies[-1] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    url = sys.argv[1] if len(sys.argv) > 1 else SERVER_URL
+    asyncio.run(run_call(url))
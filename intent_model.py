@@ -0,0 +1,359 @@
+"""
+Batched intent scorer for analyze_bugs
+A softmax classifier over hashed n-gram TF-IDF features checks that the agent's reply
+to the caller's request acknowledges what the caller asked for. It is trained on the
+labeled call scenarios (scenarios.py), seed examples (intent_examples.json, or the file
+named by INTENT_EXAMPLES) and agent turns from real transcripts labeled by hand
+(intent_labels.jsonl, or INTENT_LABELS). A held-out split of the labeled turns sets the
+decision threshold and measures precision and recall - run this module to print them.
+Whole batches of texts are vectorized and scored as NumPy arrays; the trained model is
+cached on disk
+"""
+
+import os
+import re
+import sys
+import json
+import zlib
+import hashlib
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scenarios import SCENARIO_INTENTS
+
+EXAMPLES_PATH = os.environ.get(
+    "INTENT_EXAMPLES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_examples.json")
+)
+# Agent turns from real calls, one JSON object per line (see analyze_bugs.py --export-intent-turns)
+LABELS_PATH = os.environ.get(
+    "INTENT_LABELS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_labels.jsonl")
+)
+# Trained weights, reused while the scenarios, examples, labels and MODEL_VERSION are unchanged
+CACHE_PATH = os.environ.get("INTENT_MODEL_CACHE", EXAMPLES_PATH + ".model.npz")
+# Bump whenever featurization or training changes
+MODEL_VERSION = 2
+# Hashed feature space; collisions at this size are negligible for short replies
+FEATURES = 1 << 18
+# Inside-word character n-gram width - catches "scheduling", "refilled", ...
+CHAR_GRAMS = 4
+# A reply acknowledges the caller's intent when one of its sentences gives that
+# intent at least this probability - greetings and follow-up questions in the
+# same reply don't dilute the acknowledgement. Calibrated on the held-out labeled
+# turns when there are any; this is only the fallback
+MIN_PROBABILITY = 0.3
+# Labeled calls (by call ID hash) kept out of training to calibrate and evaluate
+HOLDOUT_PERCENT = 30
+# A scenario the model can't place this confidently is treated as "other"
+MIN_SCENARIO_PROBABILITY = 0.5
+# Agent turns that are only a greeting are skipped, at most this many per call
+MAX_GREETINGS = 2
+# Full-batch gradient descent; the training set is small, so this takes well under a second
+EPOCHS = 300
+LEARNING_RATE = 2.0
+L2 = 1e-3
+OTHER = "other"
+GREETING = "greeting"
+
+WORD = re.compile(r"[a-z0-9']+")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def features(text: str) -> List[int]:
+    """Hashed word unigrams, bigrams and inside-word character n-grams"""
+    words = WORD.findall(text.lower())
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        grams.extend(padded[i:i + CHAR_GRAMS] for i in range(len(padded) - CHAR_GRAMS + 1))
+    return [zlib.crc32(g.encode()) % FEATURES for g in grams]
+
+
+def term_counts(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sparse term counts for a batch - (row, column, count) triplets, one per distinct term"""
+    hashed = [features(t) for t in texts]
+    lengths = np.fromiter((len(h) for h in hashed), dtype=np.int64, count=len(hashed))
+    rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+    cols = np.fromiter((c for h in hashed for c in h), dtype=np.int64, count=int(lengths.sum()))
+    keys, counts = np.unique(rows * FEATURES + cols, return_counts=True)
+    return keys // FEATURES, keys % FEATURES, counts
+
+
+def tfidf(texts: Sequence[str], idf: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """L2-normalized sublinear TF-IDF rows in coordinate form"""
+    rows, cols, counts = term_counts(texts)
+    values = (1.0 + np.log(counts)) * idf[cols]
+    norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=len(texts)))
+    values /= np.where(norms > 0, norms, 1.0)[rows]
+    return rows, cols, values
+
+
+def examples_fingerprint(path: Optional[str] = None, labels_path: Optional[str] = None) -> str:
+    """Training data identity - the examples file, the labeled turns and the labeled scenarios"""
+    with open(path or EXAMPLES_PATH, 'rb') as f:
+        raw = f.read()
+    try:
+        with open(labels_path or LABELS_PATH, 'rb') as f:
+            raw += b"|" + f.read()
+    except FileNotFoundError:
+        pass
+    scenarios = json.dumps(SCENARIO_INTENTS, sort_keys=True)
+    return hashlib.sha1(raw + f"|{scenarios}|{MODEL_VERSION}|{FEATURES}".encode()).hexdigest()[:12]
+
+
+def read_labels(path: Optional[str] = None) -> List[dict]:
+    """Labeled turns - {"call_sid", "scenario", "intent", "reply", "acknowledged"}; unlabeled rows are skipped"""
+    try:
+        with open(path or LABELS_PATH, 'r') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+    return [r for r in rows if isinstance(r.get("acknowledged"), bool)]
+
+
+def held_out(call_sid: str) -> bool:
+    """Whether a labeled call belongs to the held-out split - stable as labels are added"""
+    return zlib.crc32(call_sid.encode()) % 100 < HOLDOUT_PERCENT
+
+
+def split_sentences(replies: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+    """Every reply's sentences, flattened, and the index of the reply each came from"""
+    sentences, owners = [], []
+    for i, reply in enumerate(replies):
+        for sentence in filter(None, SENTENCE_END.split(reply.strip())):
+            sentences.append(sentence)
+            owners.append(i)
+    return sentences, np.array(owners, dtype=np.int64)
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class IntentModel:
+    """Multinomial logistic regression from TF-IDF rows to intents"""
+
+    def __init__(self, intents: List[str], idf: np.ndarray, weights: np.ndarray,
+                 bias: np.ndarray, findings: Dict[str, dict], fingerprint: str,
+                 threshold: float = MIN_PROBABILITY, evaluation: Optional[dict] = None):
+        self.intents = intents
+        self.index = {name: i for i, name in enumerate(intents)}
+        self.idf = idf
+        self.weights = weights
+        self.bias = bias
+        self.findings = findings
+        self.fingerprint = fingerprint
+        self.threshold = threshold
+        # Held-out precision/recall of the missed-intent check (None without labeled turns)
+        self.evaluation = evaluation
+
+    @classmethod
+    def train(cls, spec: dict, fingerprint: str, labels: Sequence[dict] = ()) -> "IntentModel":
+        # voice_bot's scenarios, then extra caller requests (refills: no scenario asks for one yet)
+        labeled = list(SCENARIO_INTENTS.items()) + list(spec.get("scenarios", {}).items())
+        labeled += [(r["text"], r["intent"]) for r in spec.get("responses", [])]
+        # Real turns: an acknowledging reply is an example of the caller's intent, any other is not
+        train_rows = [r for r in labels if not held_out(r["call_sid"])]
+        labeled += [(r["scenario"], r["intent"]) for r in train_rows]
+        labeled += [(r["reply"], r["intent"] if r["acknowledged"] else OTHER) for r in train_rows]
+        intents = sorted({label for _, label in labeled} | set(spec["intents"]) | {OTHER})
+        texts = [text for text, _ in labeled]
+        targets = np.eye(len(intents), dtype=np.float32)[[intents.index(label) for _, label in labeled]]
+
+        _, cols, _ = term_counts(texts)
+        df = np.bincount(cols, minlength=FEATURES)
+        idf = (np.log((1.0 + len(texts)) / (1.0 + df)) + 1.0).astype(np.float32)
+
+        rows, cols, values = tfidf(texts, idf)
+        model = cls(intents, idf, np.zeros((FEATURES, len(intents)), dtype=np.float32),
+                    np.zeros(len(intents), dtype=np.float32), spec["intents"], fingerprint)
+        for _ in range(EPOCHS):
+            error = (softmax(model.logits(rows, cols, values, len(texts))) - targets) / len(texts)
+            gradient = L2 * model.weights
+            np.add.at(gradient, cols, values[:, None] * error[rows])
+            model.weights -= LEARNING_RATE * gradient
+            model.bias -= LEARNING_RATE * error.sum(axis=0)
+
+        test_rows = [r for r in labels if held_out(r["call_sid"])]
+        if test_rows:
+            model.calibrate(test_rows)
+        return model
+
+    def calibrate(self, rows: Sequence[dict]):
+        """Pick the threshold with the best F1 on labeled turns, and record precision/recall there"""
+        wanted, picked = self.scores([r["scenario"] for r in rows],
+                                     self.reply_scores([r["reply"] for r in rows])[0])
+        checked = np.isin(wanted, [self.index[name] for name in self.findings if name in self.index])
+        truth = np.array([r["intent"] in self.findings and not r["acknowledged"] for r in rows])
+
+        def counts(threshold):
+            flagged = checked & (picked < threshold)
+            return int((flagged & truth).sum()), int(flagged.sum())
+
+        best = (-1.0, self.threshold)
+        if truth.any():
+            # Candidate cut points: just above each observed probability
+            for threshold in np.unique(picked).tolist():
+                hits, flagged = counts(threshold + 1e-6)
+                f1 = 2 * hits / (flagged + truth.sum())
+                if f1 > best[0]:
+                    best = (f1, round(threshold + 1e-6, 6))
+        self.threshold = best[1]
+        hits, flagged = counts(self.threshold)
+        self.evaluation = {
+            "calls": len(rows),
+            "missed": int(truth.sum()),
+            "flagged": flagged,
+            "threshold": self.threshold,
+            "precision": round(hits / flagged, 3) if flagged else None,
+            "recall": round(hits / int(truth.sum()), 3) if truth.any() else None,
+        }
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp.npz"
+        # Only weight rows for features seen in training are non-zero
+        used = np.flatnonzero(self.weights.any(axis=1))
+        np.savez_compressed(tmp_path, fingerprint=self.fingerprint, intents=np.array(self.intents),
+                            idf=self.idf, used=used, weights=self.weights[used], bias=self.bias,
+                            findings=json.dumps(self.findings), threshold=self.threshold,
+                            evaluation=json.dumps(self.evaluation))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, fingerprint: str) -> Optional["IntentModel"]:
+        try:
+            with np.load(path) as data:
+                if str(data["fingerprint"]) != fingerprint:
+                    return None
+                intents = [str(name) for name in data["intents"]]
+                weights = np.zeros((FEATURES, len(intents)), dtype=np.float32)
+                weights[data["used"]] = data["weights"]
+                return cls(intents, data["idf"], weights, data["bias"],
+                           json.loads(str(data["findings"])), fingerprint,
+                           float(data["threshold"]), json.loads(str(data["evaluation"])))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def logits(self, rows: np.ndarray, cols: np.ndarray, values: np.ndarray, count: int) -> np.ndarray:
+        logits = np.tile(self.bias, (count, 1))
+        np.add.at(logits, rows, values[:, None] * self.weights[cols])
+        return logits
+
+    def probabilities(self, texts: Sequence[str]) -> np.ndarray:
+        """[text x intent] probabilities for a whole batch"""
+        if not texts:
+            return np.zeros((0, len(self.intents)), dtype=np.float32)
+        return softmax(self.logits(*tfidf(texts, self.idf), len(texts)))
+
+    def classify(self, texts: Sequence[str]) -> List[str]:
+        return [self.intents[i] for i in self.probabilities(texts).argmax(axis=1)]
+
+    def reply_scores(self, replies: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """[reply x intent] best probability over each reply's sentences, and
+        [reply] whether every sentence is a greeting - one batch for both"""
+        sentences, owners = split_sentences(replies)
+        best = np.zeros((len(replies), len(self.intents)), dtype=np.float32)
+        substantive = np.zeros(len(replies), dtype=bool)
+        if sentences:
+            probabilities = self.probabilities(sentences)
+            np.maximum.at(best, owners, probabilities)
+            top = probabilities.argmax(axis=1)
+            np.logical_or.at(substantive, owners, top != self.index.get(GREETING, -1))
+        return best, ~substantive
+
+    def request_replies(self, calls: Sequence[Sequence[dict]]) -> Tuple[List[Optional[str]], np.ndarray]:
+        """Per call, the agent's reply to the caller's request and its reply_scores row
+
+        That is the first agent message after the caller's first line that is more than
+        a greeting; None (and a zero row) when the agent never gets past greeting
+        """
+        candidates = []
+        for messages in calls:
+            start = next((i + 1 for i, m in enumerate(messages) if m['speaker'] == 'Patient'), len(messages))
+            agent = [m['text'] for m in messages[start:] if m['speaker'] == 'Agent']
+            candidates.append(agent[:MAX_GREETINGS + 1])
+
+        replies: List[Optional[str]] = [None] * len(calls)
+        best = np.zeros((len(calls), len(self.intents)), dtype=np.float32)
+        pending = list(range(len(calls)))
+        for turn in range(MAX_GREETINGS + 1):
+            # Usually one round: only calls whose candidate was a bare greeting go again
+            pending = [i for i in pending if turn < len(candidates[i])]
+            if not pending:
+                break
+            scores, greeting = self.reply_scores([candidates[i][turn] for i in pending])
+            answered = ~greeting
+            for i, row in zip(np.array(pending)[answered].tolist(), scores[answered]):
+                replies[i] = candidates[i][turn]
+                best[i] = row
+            pending = np.array(pending)[greeting].tolist()
+        return replies, best
+
+    def scenario_intents(self, scenarios: Sequence[str]) -> np.ndarray:
+        """Intent index per scenario; one the model can't place confidently counts as "other"
+
+        Distinct scenarios are classified once
+        """
+        distinct = sorted(set(scenarios))
+        probabilities = self.probabilities(distinct)
+        top = probabilities.argmax(axis=1)
+        top[probabilities.max(axis=1) < MIN_SCENARIO_PROBABILITY] = self.index[OTHER]
+        lookup = dict(zip(distinct, top.tolist()))
+        return np.array([lookup[s] for s in scenarios], dtype=np.int64)
+
+    def scores(self, scenarios: Sequence[str], best: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Per call: the scenario's intent index and the reply's probability for it"""
+        wanted = self.scenario_intents(scenarios)
+        return wanted, best[np.arange(len(scenarios)), wanted]
+
+    def missed_intents(self, scenarios: Sequence[str], best: np.ndarray) -> List[Optional[Tuple[str, float]]]:
+        """Per call: (intent, reply probability) when the reply ignores the scenario's intent, else None
+
+        best: the replies' reply_scores rows, as returned by request_replies
+        """
+        wanted, picked = self.scores(scenarios, best)
+        return [(self.intents[w], round(p, 3))
+                if self.intents[w] in self.findings and p < self.threshold else None
+                for w, p in zip(wanted.tolist(), picked.tolist())]
+
+
+def load_model(path: Optional[str] = None, cache_path: Optional[str] = None,
+               labels_path: Optional[str] = None) -> IntentModel:
+    """Cached model when the examples and labels are unchanged, otherwise train and cache it"""
+    path = path or EXAMPLES_PATH
+    cache_path = cache_path or (CACHE_PATH if path == EXAMPLES_PATH else path + ".model.npz")
+    fingerprint = examples_fingerprint(path, labels_path)
+    model = IntentModel.load(cache_path, fingerprint)
+    if model is None:
+        with open(path, 'r') as f:
+            model = IntentModel.train(json.load(f), fingerprint, read_labels(labels_path))
+        try:
+            model.save(cache_path)
+        except OSError:
+            pass  # Read-only checkout - train again next time
+    return model
+
+
+@lru_cache(maxsize=None)
+def default_model() -> IntentModel:
+    """Model for EXAMPLES_PATH, loaded once per process"""
+    return load_model()
+
+
+if __name__ == "__main__":
+    # Held-out quality of the missed-intent check, for the current examples and labels
+    model = load_model(labels_path=sys.argv[1] if len(sys.argv) > 1 else None)
+    evaluation = model.evaluation
+    if not evaluation:
+        print(f"No labeled turns at {sys.argv[1] if len(sys.argv) > 1 else LABELS_PATH} - "
+              f"using the default threshold {model.threshold}")
+        print("Export turns with: python analyze_bugs.py --export-intent-turns intent_labels.jsonl")
+    else:
+        print(f"Held-out calls: {evaluation['calls']} ({evaluation['missed']} labeled as missed)")
+        print(f"Calibrated threshold: {evaluation['threshold']}")
+        print(f"Missed-intent precision: {evaluation['precision']}, recall: {evaluation['recall']} "
+              f"({evaluation['flagged']} flagged)")
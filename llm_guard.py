@@ -0,0 +1,183 @@
+"""
+Shared guard around Claude requests for voice_bot
+Rate limiting (requests/sec + tokens/min), jittered retries bounded by a deadline,
+and a circuit breaker so a sick provider turns into fallback replies, not dead calls
+"""
+
+import time
+import random
+import asyncio
+from typing import Awaitable, Callable, Optional
+import anthropic
+
+# Status codes worth retrying: rate limited, server errors, overloaded
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 4.0
+
+
+class LLMUnavailable(Exception):
+    """No reply from Claude in time - the caller should fall back"""
+
+
+class TokenBucket:
+    """Refills `rate` units per second up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 = now)"""
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        # A request bigger than the bucket would never fit - let it drain the bucket
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; one probe after `cooldown` seconds"""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def failure(self) -> bool:
+        """Record a failure; True if this opened the breaker"""
+        self.failures += 1
+        was_open = self.opened_at is not None
+        if self.probing or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+            self.probing = False
+            return not was_open
+        return False
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers["retry-after"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (anthropic.APIConnectionError, anthropic.APITimeoutError)):
+        return True
+    return isinstance(error, anthropic.APIStatusError) and error.status_code in RETRYABLE_STATUS
+
+
+class LLMGuard:
+    """One per process, shared by every live call"""
+
+    def __init__(self, max_rps: float, max_tokens_per_min: float,
+                 breaker_failures: int = 5, breaker_cooldown: float = 30.0):
+        self.requests = TokenBucket(max_rps, max(max_rps, 1.0))
+        self.tokens = TokenBucket(max_tokens_per_min / 60, max_tokens_per_min)
+        self.breaker = CircuitBreaker(breaker_failures, breaker_cooldown)
+        self.lock = asyncio.Lock()
+        self.stats = {
+            "requests": 0, "retries": 0, "rate_limited": 0, "failures": 0,
+            "short_circuited": 0, "breaker_opened": 0, "throttled": 0, "fallbacks": 0
+        }
+
+    async def admit(self, tokens: int, deadline: float):
+        """Wait for the limiter; raises LLMUnavailable if the breaker is open or time runs out"""
+        if not self.breaker.allow():
+            self.stats["short_circuited"] += 1
+            raise LLMUnavailable(f"circuit {self.breaker.state}")
+        # One waiter at a time keeps the buckets FIFO-fair between calls
+        async with self.lock:
+            while True:
+                wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                if wait == 0:
+                    break
+                if time.monotonic() + wait > deadline:
+                    self.stats["throttled"] += 1
+                    self.breaker.probing = False
+                    raise LLMUnavailable("rate limit would miss the deadline")
+                await asyncio.sleep(wait)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+
+    def backoff(self, attempt: int, error: Exception, deadline: float) -> Optional[float]:
+        """Jittered delay before the next attempt, or None to give up"""
+        if not is_retryable(error):
+            return None
+        delay = retry_after(error) or random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+        return delay if time.monotonic() + delay < deadline else None
+
+    def record_failure(self, error: Exception):
+        if isinstance(error, anthropic.RateLimitError):
+            # Our own limits are off, not the provider being down
+            self.stats["rate_limited"] += 1
+            self.breaker.probing = False
+            return
+        self.stats["failures"] += 1
+        if not is_retryable(error):
+            # A bad request says nothing about provider health
+            self.breaker.probing = False
+            return
+        if self.breaker.failure():
+            self.stats["breaker_opened"] += 1
+            print(f"LLM circuit opened after {self.breaker.failures} failures: {error!r}")
+
+    def record_success(self):
+        if self.breaker.state != "closed":
+            print("LLM circuit closed")
+        self.breaker.success()
+
+    async def call(self, request: Callable[[], Awaitable], tokens: int, deadline: float):
+        """Run request() under the limiter, retrying transient errors until the deadline"""
+        attempt = 0
+        while True:
+            await self.admit(tokens, deadline)
+            self.stats["requests"] += 1
+            try:
+                result = await request()
+            except asyncio.CancelledError:
+                self.breaker.probing = False
+                raise
+            except anthropic.APIError as e:
+                self.record_failure(e)
+                delay = self.backoff(attempt, e, deadline)
+                if delay is None:
+                    raise LLMUnavailable(repr(e)) from e
+                self.stats["retries"] += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self.record_success()
+            return result
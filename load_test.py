@@ -0,0 +1,255 @@
+"""
+Offline load test for voice_bot
+Replays Twilio's webhook form posts (/voice, /handle-speech, /pickup, /status)
+against the app in-process, with a stub LLM standing in for Claude - no phone
+calls, Twilio account or API key needed, so it runs on any Linux box or in CI
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import importlib
+import tracemalloc
+import contextlib
+from urllib.parse import urlsplit
+import httpx
+import anthropic
+from fake_stream_client import AGENT_SCRIPT
+
+# Stub patient lines - none of them end the call, so --turns is honored
+PATIENT_LINES = [
+    "Hi, I'd like to make an appointment for my knee, it's been hurting since I went running.",
+    "Sure, it's Jamie Rivera, date of birth March 3rd, 1988.",
+    "Monday at 10 works for me. Do I need to bring anything?",
+    "Okay, and do you take Blue Cross insurance?",
+    "Got it. Should I arrive early to fill out paperwork?",
+]
+
+PICKUP_RE = re.compile(r"<Redirect[^>]*>([^<]*/pickup[^<]*)</Redirect>")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    rank = max(1, -(-pct * len(sorted_values) // 100))
+    return sorted_values[rank - 1]
+
+
+def parse_latency(spec):
+    """Latency sampler from "fixed:S", "uniform:LO,HI" or "lognormal:MEDIAN,SIGMA" (seconds)"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed" and len(values) == 1:
+        return lambda: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2:
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1])
+    raise argparse.ArgumentTypeError(f"Bad latency spec: {spec}")
+
+
+class StubLLM:
+    """Answers Messages API requests after a sampled delay"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(self.latency())
+        self.requests += 1
+        return httpx.Response(200, json={
+            "id": f"msg_stub_{self.requests}",
+            "type": "message",
+            "role": "assistant",
+            "model": "stub",
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "content": [{"type": "text", "text": random.choice(PATIENT_LINES)}],
+            "usage": {"input_tokens": len(request.content) // 4, "output_tokens": 20}
+        })
+
+    def client(self) -> anthropic.AsyncAnthropic:
+        return anthropic.AsyncAnthropic(
+            api_key="stub",
+            max_retries=0,
+            http_client=httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+        )
+
+
+def agent_lines(turns, hang_up=True):
+    """`turns` agent replies from the fake client's script, ending on its goodbye if hanging up"""
+    middle = AGENT_SCRIPT[:-1]
+    if not hang_up:
+        return [middle[i % len(middle)] for i in range(turns)]
+    return [middle[i % len(middle)] for i in range(turns - 1)] + [AGENT_SCRIPT[-1]]
+
+
+async def post(client, path, data):
+    response = await client.post(path, data=data)
+    response.raise_for_status()
+    return response.text
+
+
+async def run_call(client, call_sid, turns, agent_delay, latencies, hang_up=True):
+    """One simulated call - records each agent->patient turn's latency"""
+    twiml = await post(client, "/voice", {"CallSid": call_sid, "CallStatus": "in-progress"})
+
+    for line in agent_lines(turns, hang_up):
+        if "<Gather" not in twiml:
+            break
+        # The agent talks; Twilio streams partial STT results meanwhile
+        if "partialResultCallback" in twiml:
+            words = line.split()
+            for n in (len(words) // 2, len(words)):
+                await post(client, "/partial-speech", {"CallSid": call_sid,
+                                                       "UnstableSpeechResult": " ".join(words[:n])})
+                await asyncio.sleep(agent_delay / 2)
+        else:
+            await asyncio.sleep(agent_delay)
+
+        start = time.perf_counter()
+        twiml = await post(client, "/handle-speech", {"CallSid": call_sid, "SpeechResult": line})
+        # Like Twilio, play the filler and follow the redirect until a real reply
+        while True:
+            pickup = PICKUP_RE.search(twiml)
+            if not pickup:
+                break
+            url = urlsplit(pickup.group(1))
+            twiml = await post(client, f"{url.path}?{url.query}", {"CallSid": call_sid})
+        latencies.append(time.perf_counter() - start)
+
+    if hang_up:
+        await post(client, "/status", {"CallSid": call_sid, "CallStatus": "completed"})
+
+
+async def run_load(voice_bot, args, stub):
+    transport = httpx.ASGITransport(app=voice_bot.app)
+    latencies = []
+    failures = []
+
+    async with voice_bot.lifespan(voice_bot.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://voicebot",
+                                     timeout=None) as client:
+            semaphore = asyncio.Semaphore(args.concurrency)
+            peak_live = 0
+
+            async def one(i):
+                nonlocal peak_live
+                async with semaphore:
+                    try:
+                        await run_call(client, f"CALOAD{i:08d}", args.turns, args.agent_delay, latencies)
+                    except httpx.HTTPError as e:
+                        failures.append(repr(e))
+                    peak_live = max(peak_live, len(voice_bot.conversations))
+
+            start = time.perf_counter()
+            await asyncio.gather(*[one(i) for i in range(args.calls)])
+            elapsed = time.perf_counter() - start
+
+            per_call = await measure_call_memory(client, voice_bot, args) if args.memory_calls else None
+
+    return {
+        "calls": args.calls,
+        "concurrency": args.concurrency,
+        "failed_calls": len(failures),
+        "wall_seconds": round(elapsed, 3),
+        "calls_per_sec": round(args.calls / elapsed, 2),
+        "turns": len(latencies),
+        "turns_per_sec": round(len(latencies) / elapsed, 2),
+        "turn_latency_ms": {
+            f"p{p}": round(percentile(sorted(latencies), p) * 1000, 1) if latencies else None
+            for p in (50, 95, 99)
+        },
+        "peak_live_calls": peak_live,
+        "bytes_per_live_call": per_call,
+        "llm_requests": stub.requests,
+        "llm_guard": dict(voice_bot.llm_guard.stats),
+        "errors": failures[:5]
+    }
+
+
+async def measure_call_memory(client, voice_bot, args):
+    """Python heap held per live call - hold N mid-conversation calls open and diff"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sids = [f"CAMEM{i:08d}" for i in range(args.memory_calls)]
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def hold(sid):
+        async with semaphore:
+            await run_call(client, sid, 3, 0, [], hang_up=False)
+
+    await asyncio.gather(*[hold(sid) for sid in sids])
+    live = sum(1 for sid in sids if voice_bot.conversations.get(sid) is not None)
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    for sid in sids:
+        await post(client, "/status", {"CallSid": sid, "CallStatus": "completed"})
+    return held // live if live else None
+
+
+def print_results(results):
+    print(f"\n{'='*60}")
+    print("Load test complete")
+    print(f"{'='*60}")
+    print(f"Calls: {results['calls']} ({results['failed_calls']} failed), "
+          f"concurrency {results['concurrency']}")
+    print(f"Wall time: {results['wall_seconds']:.1f}s - "
+          f"{results['calls_per_sec']} calls/s, {results['turns_per_sec']} turns/s")
+    latency = results['turn_latency_ms']
+    print(f"Turn latency: p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms")
+    print(f"Peak live calls: {results['peak_live_calls']}")
+    if results['bytes_per_live_call'] is not None:
+        print(f"Memory per live call: {results['bytes_per_live_call'] / 1024:.1f} KB")
+    print(f"Stub LLM requests: {results['llm_requests']}")
+    for error in results['errors']:
+        print(f"  error: {error}")
+    print(f"{'='*60}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test: fake Twilio + stub LLM against voice_bot")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=5, help="agent turns per call (last one says goodbye)")
+    parser.add_argument("--llm-latency", type=parse_latency, default="lognormal:0.8,0.4",
+                        help='stub LLM delay: "fixed:S", "uniform:LO,HI" or "lognormal:MEDIAN,SIGMA" (seconds)')
+    parser.add_argument("--agent-delay", type=float, default=0.0,
+                        help="seconds the fake agent spends talking before each final SpeechResult")
+    parser.add_argument("--memory-calls", type=int, default=100,
+                        help="calls held open to measure memory per live call (0 skips)")
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the server's per-turn logging")
+    args = parser.parse_args()
+
+    # Transcripts, pools and caches land in a scratch dir, not the repo
+    workdir = tempfile.mkdtemp(prefix="voicebot_load_")
+    os.chdir(workdir)
+    os.environ.setdefault("MAX_LIVE_CALLS", str(max(args.concurrency, args.memory_calls) * 2))
+    os.environ.setdefault("COMPLETION_CHANNEL", "127.0.0.1:9")  # discard port
+
+    stub = StubLLM(args.llm_latency)
+    voice_bot = importlib.import_module("voice_bot")
+    voice_bot.create_llm_client = stub.client
+
+    # The server prints every turn - thousands of lines under load
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else open(os.devnull, 'w')):
+        results = asyncio.run(run_load(voice_bot, args, stub))
+    print_results(results)
+    print(f"Scratch output: {workdir}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 1 if results['failed_calls'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,6 +9,8 @@ TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN")
 TWILIO_PHONE_NUMBER = os.environ.get("TWILIO_PHONE_NUMBER")
 PUBLIC_URL = os.environ.get("PUBLIC_URL")
 TARGET_NUMBER = os.environ.get("TARGET_NUMBER")
+CONVERSATION_MODE = os.environ.get("CONVERSATION_MODE", "gather")
+VOICE_WEBHOOK = "/voice-stream" if CONVERSATION_MODE == "stream" else "/voice"
 
 
 def make_call():
@@ -24,13 +26,13 @@ def make_call():
     
     print(f"\nMaking call to {TARGET_NUMBER}")
     print(f"From: {TWILIO_PHONE_NUMBER}")
-    print(f"Webhook: {PUBLIC_URL}/voice\n")
+    print(f"Webhook: {PUBLIC_URL}{VOICE_WEBHOOK}\n")
     
     try:
         call = client.calls.create(
             to=TARGET_NUMBER,
             from_=TWILIO_PHONE_NUMBER,
-            url=f'{PUBLIC_URL}/voice',
+            url=f'{PUBLIC_URL}{VOICE_WEBHOOK}',
             status_callback=f'{PUBLIC_URL}/status',
             status_callback_event=['initiated', 'ringing', 'answered', 'completed'],
             method='POST'
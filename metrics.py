@@ -0,0 +1,120 @@
+"""
+Hot-path timing for voice_bot
+Each webhook gets a SpanTimer; span() records into it and into process-wide
+histograms that /metrics renders in Prometheus text format
+"""
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, Tuple
+
+# Histogram bucket upper bounds, seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Timer of the webhook being served - tasks it spawns inherit it
+current_timer: ContextVar[Optional["SpanTimer"]] = ContextVar("current_timer", default=None)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+# (metric, endpoint, span) -> Histogram
+histograms: Dict[Tuple[str, str, str], Histogram] = {}
+
+
+def observe(metric: str, endpoint: str, span: str, seconds: float):
+    key = (metric, endpoint, span)
+    hist = histograms.get(key)
+    if hist is None:
+        hist = histograms[key] = Histogram()
+    hist.observe(seconds)
+
+
+class SpanTimer:
+    """Span durations (ms) for one webhook request, kept as a per-turn transcript record"""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.start = time.perf_counter()
+        self.record: Dict[str, object] = {"endpoint": endpoint}
+        # Conversation the record is saved with (set by the app, if any)
+        self.call = None
+
+    def add(self, name: str, seconds: float):
+        self.record[name] = round(self.record.get(name, 0) + seconds * 1000, 2)
+        observe("span", self.endpoint, name, seconds)
+
+    def finish(self):
+        seconds = time.perf_counter() - self.start
+        self.record["total"] = round(seconds * 1000, 2)
+        observe("request", self.endpoint, "", seconds)
+
+
+@contextmanager
+def span(name: str):
+    """Time a block against the current webhook's timer (no-op outside a webhook)"""
+    timer = current_timer.get()
+    if timer is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - start)
+
+
+def mark(name: str, since: float):
+    """Record time elapsed since a perf_counter() reading as a span (e.g. time to first token)"""
+    timer = current_timer.get()
+    if timer is not None:
+        timer.add(name, time.perf_counter() - since)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def render_prometheus(samples: Iterable[Tuple[str, str, str, float]] = ()) -> str:
+    """Prometheus text exposition: the histograms plus (name, type, help, value) samples"""
+    lines = [
+        "# HELP voicebot_span_seconds Time spent in one stage of a webhook",
+        "# TYPE voicebot_span_seconds histogram",
+    ]
+    request_lines = [
+        "# HELP voicebot_request_seconds Total webhook handling time",
+        "# TYPE voicebot_request_seconds histogram",
+    ]
+    for (metric, endpoint, name), hist in sorted(histograms.items()):
+        if metric == "span":
+            out, base = lines, 'voicebot_span_seconds'
+            labels = f'endpoint="{_label(endpoint)}",span="{_label(name)}"'
+        else:
+            out, base = request_lines, 'voicebot_request_seconds'
+            labels = f'endpoint="{_label(endpoint)}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS, hist.counts):
+            cumulative += count
+            out.append(f'{base}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        out.append(f'{base}_bucket{{{labels},le="+Inf"}} {hist.count}')
+        out.append(f'{base}_sum{{{labels}}} {hist.sum:.6f}')
+        out.append(f'{base}_count{{{labels}}} {hist.count}')
+    lines.extend(request_lines)
+    for name, kind, help_text, value in samples:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,213 @@
+"""
+Near-duplicate agent responses for analyze_bugs
+Character shingles catch loops that STT noise keeps from matching exactly; MinHash
+signatures and an LSH index cluster the agent's stock replies across the whole corpus
+"""
+
+import re
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Shingle width in characters, over lowercased alphanumeric text
+SHINGLE_CHARS = 5
+# Shorter responses ("Okay.", "Sure.") repeat legitimately and are skipped
+MIN_CHARS = 20
+# Jaccard similarity at which two responses count as the same reply
+SIMILARITY = 0.7
+# Earlier agent messages each response is compared with inside a call
+REPEAT_WINDOW = 4
+# MinHash slots and LSH banding (BANDS * ROWS == SIGNATURE_SIZE); at 12x4 a pair
+# at SIMILARITY becomes a candidate ~96% of the time, one at 0.3 ~10%
+SIGNATURE_SIZE = 48
+BANDS = 12
+ROWS = SIGNATURE_SIZE // BANDS
+
+NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, punctuation and spacing folded away - what STT noise usually changes"""
+    return NON_WORD.sub(" ", text.lower()).strip()
+
+
+def shingles(normalized: str) -> set:
+    if len(normalized) <= SHINGLE_CHARS:
+        return {normalized}
+    return {normalized[i:i + SHINGLE_CHARS] for i in range(len(normalized) - SHINGLE_CHARS + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    common = len(a & b)
+    return common / (len(a) + len(b) - common)
+
+
+def signature(normalized: str) -> Tuple[int, ...]:
+    """One-permutation MinHash: each shingle is hashed once into one of the slots
+
+    Empty slots borrow from the next filled one (offset by the distance), so short
+    texts still get comparable full-length signatures
+    """
+    slots: List[Optional[int]] = [None] * SIGNATURE_SIZE
+    for shingle in shingles(normalized):
+        h = zlib.crc32(shingle.encode())
+        slot, value = h % SIGNATURE_SIZE, h // SIGNATURE_SIZE
+        if slots[slot] is None or value < slots[slot]:
+            slots[slot] = value
+    filled = [i for i, v in enumerate(slots) if v is not None]
+    if len(filled) < SIGNATURE_SIZE:
+        for i in range(SIGNATURE_SIZE):
+            if slots[i] is None:
+                distance = next(d for d in range(1, SIGNATURE_SIZE)
+                                if slots[(i + d) % SIGNATURE_SIZE] is not None)
+                slots[i] = slots[(i + distance) % SIGNATURE_SIZE] + (distance << 32)
+    return tuple(slots)
+
+
+def estimated_similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    return sum(x == y for x, y in zip(a, b)) / SIGNATURE_SIZE
+
+
+def near_repeats(texts: List[str]) -> List[Tuple[int, int, float]]:
+    """(index, earlier index, similarity) for each response that echoes a recent one
+
+    Exact back-to-back repeats are left out - analyze_transcript reports those on
+    their own. Each response is reported at most once, against its closest match
+    """
+    prepared = [shingles(n) if len(n) >= MIN_CHARS else None for n in map(normalize, texts)]
+    repeats = []
+    for i, current in enumerate(prepared):
+        if current is None or (i and texts[i] == texts[i - 1]):
+            continue
+        best = None
+        for j in range(max(0, i - REPEAT_WINDOW), i):
+            if prepared[j] is None:
+                continue
+            similarity = jaccard(current, prepared[j])
+            if similarity >= SIMILARITY and (best is None or similarity > best[2]):
+                best = (i, j, similarity)
+        if best:
+            repeats.append(best)
+    return repeats
+
+
+class ResponseCluster:
+    """Agent responses that are near-duplicates of one another"""
+
+    __slots__ = ("representative", "occurrences", "calls", "variants")
+
+    def __init__(self, representative: str, occurrences: int, calls: int, variants: int):
+        self.representative = representative
+        self.occurrences = occurrences
+        self.calls = calls
+        self.variants = variants
+
+
+class _UnionFind:
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+
+class ReplyTable:
+    """Distinct agent replies, each stored once - calls refer to them by position
+
+    A canned reply said in thousands of calls costs one string, so per-call
+    reply lists stay small enough to cache
+    """
+
+    def __init__(self, texts: Iterable[str] = ()):
+        self.texts: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.add_all(texts)
+
+    def add(self, text: str) -> int:
+        i = self.ids.get(text)
+        if i is None:
+            i = self.ids[text] = len(self.texts)
+            self.texts.append(text)
+        return i
+
+    def add_all(self, texts: Iterable[str]) -> List[int]:
+        return [self.add(text) for text in texts]
+
+    def call_replies(self, texts: Iterable[str]) -> List[int]:
+        """One call's replies as positions - short ones that can't cluster are left out"""
+        return [self.add(text) for text in texts if len(normalize(text)) >= MIN_CHARS]
+
+
+def cluster_responses(texts: List[str], calls: Iterable[List[int]], limit: int = 10,
+                      min_occurrences: int = 2) -> List[ResponseCluster]:
+    """Biggest clusters of near-identical agent responses across calls, largest first
+
+    `texts` is a ReplyTable's texts and `calls` holds each call's replies as
+    positions in it. Texts that normalize the same collapse first, so a canned
+    reply costs one signature however often it was said; the LSH index then only
+    compares texts that share a band, keeping the pass roughly linear
+    """
+    ids: Dict[str, int] = {}
+    group_of = [ids.setdefault(normalize(text), len(ids)) for text in texts]
+    said = [0] * len(texts)
+    per_call: List[set] = []
+    for replies in calls:
+        for i in replies:
+            said[i] += 1
+        per_call.append({group_of[i] for i in replies})
+
+    originals: List[Dict[str, int]] = [{} for _ in ids]
+    occurrences = [0] * len(ids)
+    for i, text in enumerate(texts):
+        if said[i]:
+            originals[group_of[i]][text] = said[i]
+            occurrences[group_of[i]] += said[i]
+
+    signatures = [signature(normalized) for normalized in ids]
+    groups = _UnionFind(len(signatures))
+    for band in range(BANDS):
+        # Texts sharing this band's rows; each is joined to the first bucket member it
+        # resembles, or starts a new anchor - buckets rarely hold dissimilar texts
+        buckets: Dict[tuple, List[int]] = {}
+        start = band * ROWS
+        for i, sig in enumerate(signatures):
+            anchors = buckets.setdefault(sig[start:start + ROWS], [])
+            for anchor in anchors:
+                if estimated_similarity(sig, signatures[anchor]) >= SIMILARITY:
+                    groups.union(i, anchor)
+                    break
+            else:
+                anchors.append(i)
+
+    totals: Dict[int, List[int]] = {}
+    for i in range(len(signatures)):
+        root = groups.find(i)
+        entry = totals.setdefault(root, [0, 0, 0])
+        entry[0] += occurrences[i]
+        entry[2] += len(originals[i])
+    for seen in per_call:
+        for root in {groups.find(i) for i in seen}:
+            totals[root][1] += 1
+
+    best = sorted((root for root, (count, _, _) in totals.items() if count >= min_occurrences),
+                  key=lambda root: -totals[root][0])[:limit]
+    clusters = []
+    for root in best:
+        count, call_count, variants = totals[root]
+        members = [i for i in range(len(signatures)) if groups.find(i) == root]
+        text_counts = {}
+        for i in members:
+            text_counts.update(originals[i])
+        representative = max(text_counts, key=text_counts.get)
+        clusters.append(ResponseCluster(representative, count, call_count, variants))
+    return clusters
@@ -0,0 +1,146 @@
+"""
+Warm pool of pre-generated opening lines for voice_bot
+/voice takes a ready line instead of waiting on Claude; the pool refills in the background
+"""
+
+import os
+import json
+import fcntl
+import random
+import asyncio
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+# Parallel Claude requests while filling, so startup doesn't burst the API
+FILL_CONCURRENCY = 4
+
+
+class OpeningPool:
+    """Per-scenario opening lines, persisted to a JSON file across restarts
+
+    `version` identifies whatever the lines were generated from (persona, model);
+    a file written under another version is discarded, as are lines for
+    scenarios no longer in the list. With several workers only the one that
+    claim()s the pool generates and saves; the others reload its file
+    """
+
+    def __init__(self, path: str, size: int, generate: Callable[[str], Awaitable[str]],
+                 version: str = ""):
+        self.path = path
+        self.size = size
+        self.generate = generate
+        self.version = version
+        self.lines: Dict[str, List[str]] = {}
+        self.scenarios: List[str] = []
+        self.filling = set()
+        self.tasks = set()
+        self.owner = False
+        self.lock_file = None
+        self.loaded_mtime = 0.0
+
+    def load(self, scenarios: Iterable[str]):
+        self.scenarios = list(scenarios)
+        try:
+            with open(self.path, 'r') as f:
+                self.loaded_mtime = os.fstat(f.fileno()).st_mtime
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = {}
+        if saved.get("version") != self.version:
+            saved = {}
+        stored = saved.get("lines", {})
+        self.lines = {s: stored.get(s, [])[:self.size] for s in self.scenarios}
+        ready = sum(len(lines) for lines in self.lines.values())
+        print(f"Opening pool: {ready} lines loaded for {len(self.scenarios)} scenarios")
+
+    def claim(self) -> bool:
+        """Become the one process that fills this pool; the lock is held until close() or exit"""
+        lock_file = open(self.path + '.lock', 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        self.owner = True
+        return True
+
+    def refresh(self):
+        """Reload the file if the filling worker has saved since we last read it"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime > self.loaded_mtime:
+            self.load(self.scenarios)
+
+    def save(self, lines: Optional[Dict[str, List[str]]] = None):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({"version": self.version, "lines": lines or self.lines}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def take(self, scenario: str) -> Optional[str]:
+        """A ready opening line (None if the scenario's pool is empty); schedules a top-up"""
+        lines = self.lines.get(scenario)
+        line = lines.pop(random.randrange(len(lines))) if lines else None
+        if scenario not in self.lines:
+            return line
+        if self.owner:
+            self.schedule(scenario)
+        elif not lines:
+            self.refresh()
+        return line
+
+    def schedule(self, scenario: str):
+        if scenario in self.filling or len(self.lines[scenario]) >= self.size:
+            return
+        self._spawn(self.fill([scenario]))
+
+    def schedule_all(self):
+        """Fill every scenario in the background (startup)"""
+        self._spawn(self.fill())
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def fill(self, scenarios: Optional[Iterable[str]] = None):
+        """Top every (or the given) scenario up to `size` lines, then persist"""
+        todo = [s for s in (scenarios or self.scenarios)
+                if s not in self.filling and len(self.lines[s]) < self.size]
+        if not todo:
+            return
+        self.filling.update(todo)
+        semaphore = asyncio.Semaphore(FILL_CONCURRENCY)
+
+        async def one(scenario):
+            async with semaphore:
+                return scenario, await self.generate(scenario)
+
+        try:
+            jobs = [one(s) for s in todo for _ in range(self.size - len(self.lines[s]))]
+            for result in await asyncio.gather(*jobs, return_exceptions=True):
+                if isinstance(result, Exception):
+                    print(f"Opening line generation failed: {result}")
+                    continue
+                scenario, line = result
+                if line and len(self.lines[scenario]) < self.size:
+                    self.lines[scenario].append(line)
+        finally:
+            self.filling.difference_update(todo)
+
+        try:
+            # Snapshot on the loop; the thread never sees lists being popped
+            snapshot = {s: list(lines) for s, lines in self.lines.items()}
+            await asyncio.to_thread(self.save, snapshot)
+        except OSError as e:
+            print(f"Opening pool save failed: {e}")
+
+    def close(self):
+        for task in self.tasks:
+            task.cancel()
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+            self.owner = False
@@ -0,0 +1,317 @@
+"""
+Streaming report writers for BugAnalyzer
+Each section is written straight to the output file as it is produced - markdown, JSON or paged HTML
+"""
+
+import json
+import html
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+# Distinct example quotes / call IDs shown per finding group (JSON keeps every call ID)
+MAX_EXAMPLES = 3
+MAX_CALL_IDS = 10
+# Finding groups per HTML page
+HTML_PAGE_SIZE = 25
+
+SEVERITIES = ["critical", "high", "medium", "low"]
+
+
+class FindingGroup:
+    """All findings with the same severity and issue, folded into one entry"""
+
+    __slots__ = ("severity", "issue", "count", "call_sids", "examples", "scenarios", "turns")
+
+    def __init__(self, severity: str, issue: str):
+        self.severity = severity
+        self.issue = issue
+        self.count = 0
+        self.call_sids: List[str] = []
+        self.examples: List[str] = []
+        self.scenarios: Counter = Counter()
+        self.turns: Counter = Counter()
+
+    def add(self, bug: dict):
+        self.count += 1
+        self.call_sids.append(bug['call_sid'])
+        example = bug.get('agent_response') or bug.get('example')
+        if example and len(self.examples) < MAX_EXAMPLES and example not in self.examples:
+            self.examples.append(example)
+        if 'scenario' in bug:
+            self.scenarios[bug['scenario']] += 1
+        if 'turns' in bug:
+            self.turns[bug['turns']] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "severity": self.severity,
+            "issue": self.issue,
+            "count": self.count,
+            "call_sids": self.call_sids,
+            "examples": self.examples,
+            "scenarios": dict(self.scenarios.most_common()),
+            "turns": {str(k): v for k, v in sorted(self.turns.items())}
+        }
+
+
+def group_findings(bugs: Iterable[dict]) -> Dict[str, List[FindingGroup]]:
+    """severity -> groups, most frequent first"""
+    groups: Dict[tuple, FindingGroup] = {}
+    for bug in bugs:
+        key = (bug['type'], bug['issue'])
+        if key not in groups:
+            groups[key] = FindingGroup(*key)
+        groups[key].add(bug)
+
+    by_severity: Dict[str, List[FindingGroup]] = {s: [] for s in SEVERITIES}
+    for group in groups.values():
+        by_severity.setdefault(group.severity, []).append(group)
+    for severity_groups in by_severity.values():
+        severity_groups.sort(key=lambda g: -g.count)
+    return by_severity
+
+
+class ReportWriter(ABC):
+    """Section-at-a-time report output; subclasses decide the format"""
+
+    def __init__(self, f):
+        self.f = f
+
+    @abstractmethod
+    def header(self, title: str, meta: Dict[str, object], summary: str):
+        ...
+
+    @abstractmethod
+    def severity_summary(self, counts: Dict[str, int], descriptions: Dict[str, str]):
+        ...
+
+    @abstractmethod
+    def findings(self, key: str, title: str, intro: Optional[str], note: Optional[str],
+                 groups: List[FindingGroup]):
+        ...
+
+    @abstractmethod
+    def table(self, key: str, title: str, intro: Optional[str], headers: List[str],
+              rows: Iterable[list], empty: str):
+        ...
+
+    @abstractmethod
+    def items(self, key: str, title: str, items: List[str], empty: str):
+        ...
+
+    @abstractmethod
+    def footer(self, title: str, lines: List[str]):
+        ...
+
+
+class MarkdownWriter(ReportWriter):
+
+    def header(self, title, meta, summary):
+        self.f.write(f"# {title}\n\n")
+        for label, value in meta.items():
+            self.f.write(f"**{label}:** {value}  \n")
+        self.f.write(f"\n## Executive Summary\n\n{summary}\n\n")
+
+    def severity_summary(self, counts, descriptions):
+        self.f.write("### Severity Breakdown\n")
+        for severity, description in descriptions.items():
+            self.f.write(f"- **{severity.title()}:** {counts.get(severity, 0)} - {description}\n")
+        self.f.write("\n---\n\n")
+
+    def findings(self, key, title, intro, note, groups):
+        self.f.write(f"## {title}\n\n")
+        if intro:
+            self.f.write(f"*{intro}*\n\n")
+        if not groups:
+            self.f.write(f"*No {key} issues found.*\n\n---\n\n")
+            return
+
+        for i, group in enumerate(groups, 1):
+            calls = "call" if group.count == 1 else "calls"
+            self.f.write(f"### {i}. {group.issue} ({group.count} {calls})\n\n")
+            shown = ", ".join(f"`{sid}`" for sid in group.call_sids[:MAX_CALL_IDS])
+            more = group.count - MAX_CALL_IDS
+            self.f.write(f"**Call IDs:** {shown}{f' and {more} more' if more > 0 else ''}\n\n")
+            if group.scenarios:
+                self.f.write("**Scenarios:** " + "; ".join(
+                    f"{s} ({n})" for s, n in group.scenarios.most_common(MAX_EXAMPLES)) + "\n\n")
+            for example in group.examples:
+                self.f.write(f"> {example}\n\n")
+            if group.turns:
+                self.f.write("**Conversation Length:** " + ", ".join(
+                    f"{n}x {turns} turns" for turns, n in sorted(group.turns.items())) + "\n\n")
+            if note:
+                self.f.write(f"{note}\n\n")
+            self.f.write("---\n\n")
+
+    def table(self, key, title, intro, headers, rows, empty):
+        self.f.write(f"## {title}\n\n")
+        if intro:
+            self.f.write(f"*{intro}*\n\n")
+        wrote_header = False
+        for row in rows:
+            if not wrote_header:
+                self.f.write("| " + " | ".join(headers) + " |\n")
+                self.f.write("|" + "|".join("-" * (len(h) + 2) for h in headers) + "|\n")
+                wrote_header = True
+            self.f.write("| " + " | ".join(str(c) for c in row) + " |\n")
+        self.f.write("\n" if wrote_header else f"*{empty}*\n\n")
+        self.f.write("---\n\n")
+
+    def items(self, key, title, items, empty):
+        self.f.write(f"## {title}\n\n")
+        if items:
+            for j, item in enumerate(items, 1):
+                self.f.write(f"{j}. {item}\n\n")
+        else:
+            self.f.write(f"*{empty}*\n\n")
+        self.f.write("---\n\n")
+
+    def footer(self, title, lines):
+        self.f.write(f"## {title}\n\n")
+        self.f.write("\n".join(lines) + "\n")
+
+
+class JsonWriter(ReportWriter):
+    """One JSON document; sections are appended to the "sections" array as they come"""
+
+    def __init__(self, f):
+        super().__init__(f)
+        self.first_section = True
+
+    def _section(self, data: dict):
+        self.f.write("\n" if self.first_section else ",\n")
+        self.first_section = False
+        json.dump(data, self.f)
+
+    def header(self, title, meta, summary):
+        self.f.write('{"title": ' + json.dumps(title))
+        self.f.write(', "meta": ' + json.dumps({k.lower().replace(" ", "_"): v for k, v in meta.items()}))
+        self.f.write(', "sections": [')
+
+    def severity_summary(self, counts, descriptions):
+        self._section({"key": "severity", "type": "counts",
+                       "counts": {s: counts.get(s, 0) for s in descriptions}})
+
+    def findings(self, key, title, intro, note, groups):
+        # Stream group by group - the findings list never exists as one string
+        self.f.write("\n" if self.first_section else ",\n")
+        self.first_section = False
+        self.f.write(f'{{"key": {json.dumps(key)}, "type": "findings", "title": {json.dumps(title)}, "groups": [')
+        for i, group in enumerate(groups):
+            self.f.write(("" if i == 0 else ",") + "\n  " + json.dumps(group.to_dict()))
+        self.f.write("]}")
+
+    def table(self, key, title, intro, headers, rows, empty):
+        self._section({"key": key, "type": "table", "title": title,
+                       "headers": headers, "rows": [list(r) for r in rows]})
+
+    def items(self, key, title, items, empty):
+        self._section({"key": key, "type": "items", "title": title, "items": items})
+
+    def footer(self, title, lines):
+        self.f.write("\n]}\n")
+
+
+class HtmlWriter(ReportWriter):
+    """Self-contained HTML; long finding lists are split into CSS-paged blocks"""
+
+    STYLE = (
+        "body{font-family:sans-serif;max-width:60em;margin:auto;padding:1em}"
+        "table{border-collapse:collapse}td,th{border:1px solid #ccc;padding:.3em .6em}"
+        "blockquote{color:#555;border-left:3px solid #ccc;margin-left:0;padding-left:1em}"
+        ".pages>.page{display:none}.pages>.page:first-of-type,.pages>.page:target{display:block}"
+        ".pages:has(.page:target)>.page:first-of-type:not(:target){display:none}"
+        ".pager a{margin-right:.5em}"
+    )
+
+    def header(self, title, meta, summary):
+        e = html.escape
+        self.f.write(f"<!DOCTYPE html>\n<html><head><meta charset='utf-8'><title>{e(title)}</title>"
+                     f"<style>{self.STYLE}</style></head><body>\n<h1>{e(title)}</h1>\n<p>")
+        self.f.write("<br>".join(f"<b>{e(k)}:</b> {e(str(v))}" for k, v in meta.items()))
+        self.f.write(f"</p>\n<h2>Executive Summary</h2>\n<p>{e(summary)}</p>\n")
+
+    def severity_summary(self, counts, descriptions):
+        self.f.write("<h3>Severity Breakdown</h3>\n<ul>")
+        for severity, description in descriptions.items():
+            self.f.write(f"<li><b>{severity.title()}:</b> {counts.get(severity, 0)} - "
+                         f"{html.escape(description)}</li>")
+        self.f.write("</ul>\n")
+
+    def findings(self, key, title, intro, note, groups):
+        e = html.escape
+        self.f.write(f"<h2 id='{key}'>{e(title)}</h2>\n")
+        if intro:
+            self.f.write(f"<p><i>{e(intro)}</i></p>\n")
+        if not groups:
+            self.f.write(f"<p><i>No {key} issues found.</i></p>\n")
+            return
+
+        pages = (len(groups) + HTML_PAGE_SIZE - 1) // HTML_PAGE_SIZE
+        if pages > 1:
+            self.f.write("<p class='pager'>Page: " + "".join(
+                f"<a href='#{key}-p{p + 1}'>{p + 1}</a>" for p in range(pages)) + "</p>\n")
+        self.f.write("<div class='pages'>\n")
+        for start in range(0, len(groups), HTML_PAGE_SIZE):
+            self.f.write(f"<div class='page' id='{key}-p{start // HTML_PAGE_SIZE + 1}'>\n")
+            for i, group in enumerate(groups[start:start + HTML_PAGE_SIZE], start + 1):
+                self.f.write(f"<h3>{i}. {e(group.issue)} ({group.count})</h3>\n")
+                self.f.write("<p><b>Call IDs:</b> " + ", ".join(
+                    f"<code>{e(sid)}</code>" for sid in group.call_sids[:MAX_CALL_IDS]))
+                if group.count > MAX_CALL_IDS:
+                    self.f.write(f" and {group.count - MAX_CALL_IDS} more")
+                self.f.write("</p>\n")
+                if group.scenarios:
+                    self.f.write("<p><b>Scenarios:</b> " + "; ".join(
+                        f"{e(s)} ({n})" for s, n in group.scenarios.most_common(MAX_EXAMPLES)) + "</p>\n")
+                for example in group.examples:
+                    self.f.write(f"<blockquote>{e(example)}</blockquote>\n")
+                if note:
+                    self.f.write(f"<p>{e(note.replace('**', ''))}</p>\n")
+            self.f.write("</div>\n")
+        self.f.write("</div>\n")
+
+    def table(self, key, title, intro, headers, rows, empty):
+        e = html.escape
+        self.f.write(f"<h2 id='{key}'>{e(title)}</h2>\n")
+        if intro:
+            self.f.write(f"<p><i>{e(intro)}</i></p>\n")
+        wrote_header = False
+        for row in rows:
+            if not wrote_header:
+                self.f.write("<table><tr>" + "".join(f"<th>{e(h)}</th>" for h in headers) + "</tr>\n")
+                wrote_header = True
+            self.f.write("<tr>" + "".join(f"<td>{e(str(c))}</td>" for c in row) + "</tr>\n")
+        self.f.write("</table>\n" if wrote_header else f"<p><i>{e(empty)}</i></p>\n")
+
+    def items(self, key, title, items, empty):
+        self.f.write(f"<h2 id='{key}'>{html.escape(title)}</h2>\n")
+        if items:
+            self.f.write("<ol>" + "".join(
+                f"<li>{html.escape(item.replace('**', ''))}</li>" for item in items) + "</ol>\n")
+        else:
+            self.f.write(f"<p><i>{html.escape(empty)}</i></p>\n")
+
+    def footer(self, title, lines):
+        self.f.write(f"<h2>{html.escape(title)}</h2>\n<p>")
+        self.f.write("<br>".join(html.escape(line.lstrip("- ").replace("`", "")) for line in lines))
+        self.f.write("</p>\n</body></html>\n")
+
+
+WRITERS = {"md": MarkdownWriter, "json": JsonWriter, "html": HtmlWriter}
+
+
+def format_for(output_file: str, fmt: Optional[str] = None) -> str:
+    """Explicit format, else guessed from the file extension (markdown by default)"""
+    if fmt:
+        if fmt not in WRITERS:
+            raise ValueError(f"Unknown report format: {fmt}")
+        return fmt
+    ext = output_file.rsplit(".", 1)[-1].lower()
+    return {"json": "json", "html": "html", "htm": "html"}.get(ext, "md")
+
+
+def create_writer(f, fmt: str) -> ReportWriter:
+    return WRITERS[fmt](f)
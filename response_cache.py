@@ -0,0 +1,108 @@
+"""
+Conversation-prefix response cache for voice_bot
+Calls that reach an identical point in a scenario reuse an earlier patient reply
+instead of asking Claude; an in-memory LRU sits in front of a shared SQLite file
+"""
+
+import json
+import time
+import random
+import sqlite3
+import hashlib
+from collections import OrderedDict
+from typing import List, Optional
+
+# Prune the disk store to its cap once every this many inserts
+PRUNE_EVERY = 500
+
+
+def prefix_key(namespace: str, scenario: str, turns: List[str]) -> str:
+    """Cache key for a scenario plus the (already normalized) conversation so far"""
+    raw = "\x1f".join([namespace, scenario] + turns)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class ResponseCache:
+    """Up to `variants` replies per prefix; a prefix serves from cache once it has them all
+
+    Filling every variant before the first hit keeps cached calls as varied as
+    live ones - each hit samples one of the stored replies at random
+    """
+
+    def __init__(self, path: str, max_entries: int, variants: int, max_disk_entries: int):
+        self.max_entries = max_entries
+        self.variants = variants
+        self.max_disk_entries = max_disk_entries
+        self.memory: "OrderedDict[str, List[str]]" = OrderedDict()
+        self.inserts = 0
+        self.stats = {"hits": 0, "misses": 0, "disk_hits": 0, "stored": 0}
+        self.db = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, replies TEXT NOT NULL, used REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_used ON responses (used)")
+
+    def _load(self, key: str) -> List[str]:
+        replies = self.memory.get(key)
+        if replies is not None:
+            self.memory.move_to_end(key)
+            return replies
+        row = self.db.execute("SELECT replies FROM responses WHERE key = ?", (key,)).fetchone()
+        replies = json.loads(row[0]) if row else []
+        if row:
+            self.stats["disk_hits"] += 1
+        self._remember(key, replies)
+        return replies
+
+    def _remember(self, key: str, replies: List[str]):
+        self.memory[key] = replies
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def ready(self, key: str) -> bool:
+        """True if get(key) would hit"""
+        return len(self._load(key)) >= self.variants
+
+    def get(self, key: str) -> Optional[str]:
+        replies = self._load(key)
+        if len(replies) < self.variants:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return random.choice(replies)
+
+    def add(self, key: str, reply: str):
+        replies = self._load(key)
+        # Duplicates are kept - sampling then follows how often Claude said each
+        if len(replies) >= self.variants:
+            return
+        replies = replies + [reply]
+        self._remember(key, replies)
+        self.db.execute(
+            "INSERT INTO responses (key, replies, used) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET replies = excluded.replies, used = excluded.used",
+            (key, json.dumps(replies), time.time())
+        )
+        self.stats["stored"] += 1
+        self.inserts += 1
+        if self.inserts % PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        self.db.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY used DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+
+    def summary(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self.memory),
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0
+        }
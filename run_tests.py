@@ -1,8 +1,10 @@
 import os
-import sys
 import time
+import asyncio
+import argparse
 from dotenv import load_dotenv
 from twilio.rest import Client
+from completion_channel import CompletionListener
 
 load_dotenv()
 
@@ -11,103 +13,204 @@ TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN")
 TWILIO_PHONE_NUMBER = os.environ.get("TWILIO_PHONE_NUMBER")
 PUBLIC_URL = os.environ.get("PUBLIC_URL")
 TARGET_NUMBER = os.environ.get("TARGET_NUMBER")
+CONVERSATION_MODE = os.environ.get("CONVERSATION_MODE", "gather")
+VOICE_WEBHOOK = "/voice-stream" if CONVERSATION_MODE == "stream" else "/voice"
 
+TERMINAL_STATUSES = ["completed", "failed", "busy", "no-answer", "canceled"]
+# Seconds to wait for a completion event before falling back to one API poll
+EVENT_FALLBACK_AFTER = float(os.environ.get("EVENT_FALLBACK_AFTER", "60"))
 
-def wait_for_call_completion(client, call_sid, timeout=300):
+
+class CallRateLimiter:
+    """Spaces out new calls so at most `rate` calls start per second"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_start = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            if self.next_start > now:
+                await asyncio.sleep(self.next_start - now)
+                now = self.next_start
+            self.next_start = now + self.interval
+
+
+async def poll_call_status(client, call_sid):
+    # Twilio's client is blocking - keep it off the event loop
+    call = await asyncio.to_thread(client.calls(call_sid).fetch)
+    return call.status
+
+
+async def wait_for_call_completion(client, call_sid, listener=None, timeout=300):
     """
-    Poll Twilio API until call completes
-    Returns True if completed successfully, False if timeout
+    Wait until call completes
+    Uses completion events from voice_bot's /status webhook when a listener is
+    running; the Twilio API is only polled as a fallback
+    Returns the final status, or "timeout"
     """
     start = time.time()
     print(f"Waiting for call {call_sid} to complete...")
-    
+
     while time.time() - start < timeout:
-        call = client.calls(call_sid).fetch()
-        status = call.status
-        
-        if status in ["completed", "failed", "busy", "no-answer", "canceled"]:
-            print(f"Call ended with status: {status}")
-            return status == "completed"
+        remaining = timeout - (time.time() - start)
+
+        if listener is not None:
+            status = await listener.wait(call_sid, min(EVENT_FALLBACK_AFTER, remaining))
+            if status is None:
+                # No event yet - the webhook may have been lost, check once
+                status = await poll_call_status(client, call_sid)
+        else:
+            status = await poll_call_status(client, call_sid)
 
-        time.sleep(5)
-    
-    print("Call timeout - moving on")
-    return False
+        if status in TERMINAL_STATUSES:
+            print(f"Call {call_sid} ended with status: {status}")
+            return status
 
+        if listener is None:
+            await asyncio.sleep(5)
 
-def make_test_call(client, call_number, total_calls):
+    print(f"Call {call_sid} timeout - moving on")
+    return "timeout"
+
+
+async def make_test_call(client, call_number, total_calls, listener=None):
     """Make a single test call and wait for it to complete"""
-    
+
     print(f"\n{'='*60}")
     print(f"Call {call_number}/{total_calls}")
     print(f"{'='*60}")
-    
+
+    result = {
+        "call_number": call_number,
+        "call_sid": None,
+        "status": "error",
+        "success": False,
+        "duration": 0.0
+    }
+    started = time.time()
+
     try:
-        call = client.calls.create(
+        call = await asyncio.to_thread(
+            client.calls.create,
             to=TARGET_NUMBER,
             from_=TWILIO_PHONE_NUMBER,
-            url=f'{PUBLIC_URL}/voice',
+            url=f'{PUBLIC_URL}{VOICE_WEBHOOK}',
             status_callback=f'{PUBLIC_URL}/status',
             status_callback_event=['completed'],
             method='POST'
         )
-        
+
         print(f"Call initiated: {call.sid}")
-        
-        success = wait_for_call_completion(client, call.sid)
-        
-        if success:
+        result["call_sid"] = call.sid
+
+        status = await wait_for_call_completion(client, call.sid, listener)
+        result["status"] = status
+        result["success"] = status == "completed"
+
+        if result["success"]:
             print(f"✓ Call {call_number} completed successfully")
         else:
             print(f"✗ Call {call_number} ended unexpectedly")
-        
-        return call.sid, success
-        
+
     except Exception as e:
-        print(f"✗ Error making call: {e}")
-        return None, False
+        print(f"✗ Error making call {call_number}: {e}")
+
+    result["duration"] = time.time() - started
+    return result
+
+
+async def run_calls(client, num_calls, concurrency, rate, gap):
+    """Keep `concurrency` calls in flight; a finished call's slot is refilled immediately"""
+    queue = asyncio.Queue()
+    for i in range(num_calls):
+        queue.put_nowait(i + 1)
+
+    limiter = CallRateLimiter(rate)
+    results = []
+
+    listener = CompletionListener()
+    if not await listener.start():
+        listener = None
 
+    async def worker():
+        while True:
+            try:
+                call_number = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await limiter.wait()
+            results.append(await make_test_call(client, call_number, num_calls, listener))
 
-def run_tests(num_calls=10):
-    """Run test suite - waits for each call to finish"""
-    
-    if not all([TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, 
+            if gap and not queue.empty():
+                print(f"\nWaiting {gap:g} seconds before next call...\n")
+                await asyncio.sleep(gap)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, num_calls))))
+    finally:
+        if listener:
+            listener.close()
+    return sorted(results, key=lambda r: r["call_number"])
+
+
+def print_summary(results, num_calls, elapsed):
+    successful = sum(1 for r in results if r["success"])
+
+    print(f"\n{'='*60}")
+    print(f"Test suite complete")
+    print(f"{'='*60}")
+    print(f"{'#':>4}  {'Call SID':<36}  {'Status':<10}  {'Time':>7}")
+    for r in results:
+        print(f"{r['call_number']:>4}  {r['call_sid'] or '-':<36}  "
+              f"{r['status']:<10}  {r['duration']:>6.0f}s")
+    print(f"{'-'*60}")
+    print(f"Successful calls: {successful}/{num_calls}")
+    print(f"Wall time: {elapsed:.0f}s")
+    print(f"{'='*60}\n")
+
+
+def run_tests(num_calls=10, concurrency=1, rate=1.0, gap=None):
+    """Run test suite - keeps up to `concurrency` calls in flight"""
+
+    if not all([TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN,
                 TWILIO_PHONE_NUMBER, PUBLIC_URL, TARGET_NUMBER]):
         print("ERROR: Missing environment variables!")
         print("Check your .env file")
         return
-    
+
+    # Sequential runs keep the original 10 second buffer between calls
+    if gap is None:
+        gap = 10 if concurrency == 1 else 0
+
     client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-    
+
     print(f"\n{'='*60}")
     print(f"Starting test suite: {num_calls} calls")
     print(f"Target: {TARGET_NUMBER}")
+    print(f"Concurrency: {concurrency}, max {rate:g} new calls/sec")
     print(f"{'='*60}\n")
-    
-    results = []
-    successful = 0
-    
-    for i in range(num_calls):
-        call_sid, success = make_test_call(client, i+1, num_calls)
-        
-        if call_sid:
-            results.append(call_sid)
-            if success:
-                successful += 1
-        
-        if i < num_calls - 1:
-            print("\nWaiting 10 seconds before next call...\n")
-            time.sleep(10)
-    
-    print(f"\n{'='*60}")
-    print(f"Test suite complete")
-    print(f"Successful calls: {successful}/{num_calls}")
-    print(f"{'='*60}\n")
-    
-    return results
+
+    started = time.time()
+    results = asyncio.run(run_calls(client, num_calls, concurrency, rate, gap))
+    print_summary(results, num_calls, time.time() - started)
+
+    return [r["call_sid"] for r in results if r["call_sid"]]
 
 
 if __name__ == "__main__":
-    num_calls = int(sys.argv[1]) if len(sys.argv) > 1 else 10
-    
-    run_tests(num_calls)
+    parser = argparse.ArgumentParser(description="Run automated test calls")
+    parser.add_argument("num_calls", nargs="?", type=int, default=10,
+                        help="number of calls to place (default 10)")
+    parser.add_argument("--concurrency", type=int,
+                        default=int(os.environ.get("TEST_CONCURRENCY", "1")),
+                        help="calls in flight at once (default 1 = sequential)")
+    parser.add_argument("--rate", type=float, default=1.0,
+                        help="max new calls started per second (default 1)")
+    parser.add_argument("--gap", type=float, default=None,
+                        help="seconds to wait before reusing a slot (default 10 when sequential)")
+    args = parser.parse_args()
+
+    run_tests(args.num_calls, args.concurrency, args.rate, args.gap)
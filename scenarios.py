@@ -0,0 +1,31 @@
+"""
+Patient scenarios for test calls
+The one list voice_bot plays, the intent model trains on and the synthetic
+transcript generator draws from; kept free of app imports so the offline tools
+can load it without FastAPI
+"""
+
+# Scenario -> what the caller asks the agent to act on. "other" scenarios have
+# nothing the analyzer checks acknowledgement for. voice_bot picks by position,
+# so append new scenarios rather than reordering
+SCENARIO_INTENTS = {
+    # Orthopedics-specific scenarios (priority)
+    "Schedule an appointment for knee pain that started after running": "appointment",
+    "Request a follow-up appointment after recent knee surgery": "appointment",
+    "Ask about treatment options for shoulder pain": "other",
+    "Schedule an appointment for back pain that's been ongoing for weeks": "appointment",
+    "Request an MRI or X-ray appointment for hip pain": "appointment",
+    "Ask if they treat sports injuries and torn ACL": "other",
+    "Reschedule a post-surgery follow-up appointment": "appointment",
+    "Ask about physical therapy referrals for ankle sprain": "other",
+    "Schedule a consultation for arthritis in hands": "appointment",
+    "Ask about office hours and if they accept workers' compensation": "other",
+    # General medical office scenarios
+    "Cancel an upcoming appointment": "appointment",
+    "Ask about office location and parking": "other",
+    "Request medical records from previous visit": "other",
+    "Ask if they accept Medicare or specific insurance": "other",
+    "Schedule an urgent same-day appointment for injury": "appointment"
+}
+
+SCENARIOS = list(SCENARIO_INTENTS)
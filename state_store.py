@@ -0,0 +1,124 @@
+"""
+Conversation state backends for voice_bot
+memory = in-process dict (single worker), sqlite = shared file in WAL mode (any number of workers)
+"""
+
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+
+class ConversationStore(ABC):
+    """Where live ConversationManager objects are kept between webhooks"""
+
+    @abstractmethod
+    def get(self, call_sid: str):
+        ...
+
+    @abstractmethod
+    def put(self, conv, create: bool = True):
+        """Save conv; with create=False only an existing call is updated, so a
+        turn finishing after /status cleaned up doesn't resurrect the call"""
+
+    @abstractmethod
+    def delete(self, call_sid: str) -> bool:
+        """Remove the call; True only for the caller that actually removed it"""
+
+    @abstractmethod
+    def stale(self, cutoff: float) -> List:
+        """Calls with no activity since `cutoff` (epoch seconds)"""
+
+    def __contains__(self, call_sid: str) -> bool:
+        return self.get(call_sid) is not None
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+
+class MemoryStore(ConversationStore):
+    """Default backend - objects stay in this process, put() is nearly free"""
+
+    def __init__(self):
+        self.conversations: Dict[str, object] = {}
+
+    def get(self, call_sid: str):
+        return self.conversations.get(call_sid)
+
+    def put(self, conv, create: bool = True):
+        if create or conv.call_sid in self.conversations:
+            self.conversations[conv.call_sid] = conv
+
+    def delete(self, call_sid: str) -> bool:
+        return self.conversations.pop(call_sid, None) is not None
+
+    def stale(self, cutoff: float) -> List:
+        return [c for c in self.conversations.values() if c.last_active < cutoff]
+
+    def __contains__(self, call_sid: str) -> bool:
+        return call_sid in self.conversations
+
+    def __len__(self) -> int:
+        return len(self.conversations)
+
+
+class SqliteStore(ConversationStore):
+    """Multi-process backend - every uvicorn worker opens the same WAL database"""
+
+    def __init__(self, path: str, factory: Callable[[dict], object]):
+        self.factory = factory
+        self.db = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "call_sid TEXT PRIMARY KEY, state TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_updated ON conversations (updated)")
+
+    def get(self, call_sid: str):
+        row = self.db.execute(
+            "SELECT state FROM conversations WHERE call_sid = ?", (call_sid,)
+        ).fetchone()
+        return self.factory(json.loads(row[0])) if row else None
+
+    def put(self, conv, create: bool = True):
+        state = json.dumps(conv.to_state(), separators=(",", ":"))
+        if create:
+            self.db.execute(
+                "INSERT INTO conversations (call_sid, state, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(call_sid) DO UPDATE SET state = excluded.state, updated = excluded.updated",
+                (conv.call_sid, state, conv.last_active)
+            )
+        else:
+            self.db.execute(
+                "UPDATE conversations SET state = ?, updated = ? WHERE call_sid = ?",
+                (state, conv.last_active, conv.call_sid)
+            )
+
+    def delete(self, call_sid: str) -> bool:
+        cursor = self.db.execute("DELETE FROM conversations WHERE call_sid = ?", (call_sid,))
+        return cursor.rowcount > 0
+
+    def stale(self, cutoff: float) -> List:
+        rows = self.db.execute(
+            "SELECT state FROM conversations WHERE updated < ?", (cutoff,)
+        ).fetchall()
+        return [self.factory(json.loads(row[0])) for row in rows]
+
+    def __contains__(self, call_sid: str) -> bool:
+        return self.db.execute(
+            "SELECT 1 FROM conversations WHERE call_sid = ?", (call_sid,)
+        ).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+
+def create_store(backend: str, path: Optional[str], factory: Callable[[dict], object]) -> ConversationStore:
+    if backend == "memory":
+        return MemoryStore()
+    if backend == "sqlite":
+        return SqliteStore(path or "conversations.db", factory)
+    raise ValueError(f"Unknown STATE_BACKEND: {backend}")
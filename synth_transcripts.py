@@ -0,0 +1,299 @@
+"""
+Synthetic transcripts for analyzer benchmarks
+Writes calls in voice_bot's save_transcript schema with a chosen mix of injected
+bugs, plus the findings analyze_bugs should report for them (the ground truth)
+"""
+
+import os
+import json
+import random
+import argparse
+from datetime import datetime, timedelta
+from collections import Counter
+from detection_rules import default_engine
+from scenarios import SCENARIO_INTENTS
+from transcript_sink import SEGMENT_MAX_BYTES
+
+# Written next to the transcripts; the leading dot keeps the analyzer from reading it
+GROUND_TRUTH_NAME = ".ground_truth.json"
+
+# voice_bot's scenarios by intent, plus a refill call so both intents get exercised
+EXTRA_SCENARIOS = {"refill": ["Request a prescription refill for anti-inflammatory medication"]}
+SCENARIOS = {
+    intent: [s for s, label in SCENARIO_INTENTS.items() if label == intent] + EXTRA_SCENARIOS.get(intent, [])
+    for intent in ("appointment", "refill", "other")
+}
+ALL_SCENARIOS = [(intent, s) for intent, scenarios in SCENARIOS.items() for s in scenarios]
+
+# Injectable bugs -> the issue analyze_bugs reports for them (None: depends on the call)
+BUGS = {
+    "no_agent": "No agent response received",
+    "premature": "Conversation ended prematurely",
+    "missed_intent": None,
+    "no_greeting": "Missing proper greeting",
+    "repeat": "Agent repeated exact same response",
+    "near_repeat": "Agent repeated a near-identical response",
+    "no_closing": "Missing proper closing phrase",
+    "uncertain": "Agent expressed uncertainty",
+    "verbose": "Response too verbose",
+}
+MISSED_INTENT = {
+    "appointment": "Failed to acknowledge appointment request",
+    "refill": "Failed to acknowledge prescription refill request",
+}
+# Fraction of calls each bug is injected into
+DEFAULT_MIX = {
+    "no_agent": 0.01, "premature": 0.03, "missed_intent": 0.05, "no_greeting": 0.05,
+    "repeat": 0.04, "near_repeat": 0.04, "no_closing": 0.05, "uncertain": 0.03, "verbose": 0.02,
+}
+# Bugs that need the middle of a normal-length call
+NEEDS_FULL_CALL = {"repeat", "near_repeat", "no_closing", "uncertain", "verbose"}
+
+PATIENT_OPENINGS = {
+    "appointment": "Hi, I need to {scenario}.",
+    "refill": "Hi, I'm calling to {scenario}.",
+    "other": "Hi, I wanted to {scenario}.",
+}
+# Agent text steers clear of every live rule's keywords unless a bug asks for them
+GREETING = "Hello, thanks for calling."
+NO_GREETING = "You've reached the front desk."
+# Paraphrases on purpose - the intent model has to recognize more than keywords
+ACKNOWLEDGE = {
+    "appointment": ["I can schedule that appointment for you.", "Let's get you booked in.",
+                    "We can find a time for you to come in."],
+    "refill": ["I can help with that prescription refill.",
+               "I'll send that renewal over to your pharmacy.", "Let me get that medication renewed."],
+    "other": ["I can help with that."],
+}
+ASK_DETAILS = "Can I get your name and date of birth?"
+AGENT_LINES = [
+    "Thanks. What's the best phone number to reach you?",
+    "Got it. We have an opening next week in the morning, would that work?",
+    "Okay, I've noted that. Do you have insurance you'd like to use?",
+    "Perfect. Are you a new or returning patient?",
+    "Understood. Can you describe the symptoms a bit more?",
+    "All right, I've updated your file with that information.",
+    "Let me check that for you. One moment please.",
+    "Great, you're all set. Anything else I can help with?",
+]
+UNCERTAIN_LINE = "Hmm, I'm not sure about that, let me look into it."
+VERBOSE_LINE = ("Okay, so to walk you through everything: our main office is open weekdays "
+                "from eight to five, the east clinic is open on weekends, parking is in the "
+                "garage behind the building and is validated at the front desk, new patients "
+                "should arrive twenty minutes early to complete their intake forms, and please "
+                "bring a photo ID, your insurance card and a list of any medications you take. "
+                "We'll also text you a reminder the day before your visit with these details.")
+CLOSING = "You're welcome. Thank you for calling, goodbye!"
+NO_CLOSING = "Okay, we'll see you then."
+PATIENT_LINES = [
+    "Sure, it's Jamie Rivera, March 3rd, 1988.",
+    "It's 555-0142.",
+    "Yes, that works for me.",
+    "I have Blue Cross through my employer.",
+    "I'm a returning patient.",
+    "It's a dull ache that gets worse in the evening.",
+    "Okay, thanks.",
+]
+PATIENT_GOODBYE = "Great, thanks so much."
+PATIENT_HANGS_UP = "Sorry, I have to go. Bye."
+
+SPANS = {"form_parse": 0.4, "state_lookup": 0.1, "issue_checks": 0.2,
+         "llm": 900.0, "state_write": 0.3, "twiml_render": 0.2}
+
+
+def parse_mix(text):
+    """"repeat=0.1,no_closing=0.2" -> rates on top of DEFAULT_MIX ("none" clears the defaults)"""
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        if part == "none":
+            mix = {name: 0.0 for name in BUGS}
+            continue
+        name, _, rate = part.partition("=")
+        if name not in BUGS:
+            raise argparse.ArgumentTypeError(f"Unknown bug {name!r} (choose from {', '.join(BUGS)})")
+        mix[name] = float(rate)
+    return mix
+
+
+def pick_bugs(rng, mix):
+    """Bugs injected into one call, minus combinations the call shape can't hold"""
+    bugs = {name for name, rate in mix.items() if rng.random() < rate}
+    if "no_agent" in bugs:
+        return {"no_agent"}
+    if "premature" in bugs:
+        bugs -= NEEDS_FULL_CALL
+    return bugs
+
+
+def stt_noise(rng, line):
+    """The same line as speech-to-text might hear it a second time"""
+    words = line.lower().replace(",", "").replace(".", "").replace("?", "").split()
+    words.insert(rng.randrange(len(words) + 1), "uh")
+    return " ".join(words)
+
+
+def timing_record(rng, endpoint, turn_spans):
+    record = {"endpoint": endpoint}
+    for name in turn_spans:
+        record[name] = round(rng.lognormvariate(0, 0.5) * SPANS[name], 2)
+    record["total"] = round(sum(v for k, v in record.items() if k != "endpoint") * 1.02, 2)
+    return record
+
+
+def make_call(rng, start, bugs):
+    """One transcript plus the findings expected for it - (transcript, bugs, live issues)"""
+    if "missed_intent" in bugs:
+        # Only appointment and refill calls have an intent to miss
+        intent = "appointment" if rng.random() < 0.8 else "refill"
+        scenario = rng.choice(SCENARIOS[intent])
+    else:
+        intent, scenario = rng.choice(ALL_SCENARIOS)
+    call_sid = "CA" + "%032x" % rng.getrandbits(128)
+    expected = []
+    expected_live = []
+
+    opening = PATIENT_OPENINGS[intent].format(scenario=scenario[0].lower() + scenario[1:])
+    texts = [("Patient", opening)]
+    if "no_agent" in bugs:
+        expected.append(BUGS["no_agent"])
+    else:
+        first = [NO_GREETING if "no_greeting" in bugs else GREETING]
+        first.append(rng.choice(ACKNOWLEDGE["other" if "missed_intent" in bugs else intent]))
+        first.append(ASK_DETAILS)
+        texts.append(("Agent", " ".join(first)))
+        if "no_greeting" in bugs:
+            expected.append(BUGS["no_greeting"])
+        if "missed_intent" in bugs:
+            expected.append(MISSED_INTENT[intent])
+
+        if "premature" in bugs:
+            texts.append(("Patient", PATIENT_HANGS_UP))
+            expected.append(BUGS["premature"])
+        else:
+            # Distinct lines, so the only back-to-back repeat is an injected one
+            middle = rng.sample(AGENT_LINES, rng.randint(2, 6))
+            if "uncertain" in bugs:
+                middle.insert(rng.randrange(len(middle) + 1), UNCERTAIN_LINE)
+            if "verbose" in bugs:
+                middle.insert(rng.randrange(len(middle) + 1), VERBOSE_LINE)
+            if "near_repeat" in bugs:
+                # A stock line again a turn or two later, not word for word
+                i = rng.choice([j for j, line in enumerate(middle) if line in AGENT_LINES])
+                middle.insert(i + rng.randint(1, 2), stt_noise(rng, middle[i]))
+                expected.append(BUGS["near_repeat"])
+            if "repeat" in bugs:
+                i = rng.randrange(len(middle))
+                middle.insert(i, middle[i])
+                expected.append(BUGS["repeat"])
+            # A repeated line can carry a live issue twice
+            expected_live.extend(BUGS["uncertain"] for line in middle if line == UNCERTAIN_LINE)
+            expected_live.extend(BUGS["verbose"] for line in middle if line == VERBOSE_LINE)
+            for line in middle:
+                texts.append(("Patient", rng.choice(PATIENT_LINES)))
+                texts.append(("Agent", line))
+            texts.append(("Patient", PATIENT_GOODBYE))
+            texts.append(("Agent", NO_CLOSING if "no_closing" in bugs else CLOSING))
+            if "no_closing" in bugs:
+                expected.append(BUGS["no_closing"])
+
+    # Live issues, exactly as voice_bot's check_for_issues records them
+    engine = default_engine()
+    scenario_hits = engine.scenario_hits(scenario)
+    issues = []
+    messages = []
+    clock = start
+    agent_turns = 0
+    for speaker, text in texts:
+        clock += timedelta(seconds=rng.uniform(2, 9))
+        messages.append({"speaker": speaker, "text": text, "timestamp": clock.isoformat()})
+        if speaker == "Agent":
+            agent_turns += 1
+            fired = engine.check_message(text, "Agent", "live", first=agent_turns == 1,
+                                         scenario_hits=scenario_hits)
+            issues.extend(rule.issue for rule in fired)
+
+    timings = [timing_record(rng, "/voice", ["form_parse", "state_write", "twiml_render"])]
+    timings += [timing_record(rng, "/handle-speech", list(SPANS)) for _ in range(agent_turns)]
+    transcript = {
+        "call_sid": call_sid,
+        "scenario": scenario,
+        "start_time": start.isoformat(),
+        "end_time": clock.isoformat(),
+        "duration": (clock - start).total_seconds(),
+        "turns": len(messages) // 2,
+        "status": "completed",
+        "messages": messages,
+        "issues": issues,
+        "llm_usage": [
+            {"turn": turn, "input_tokens": 300 + 60 * turn, "output_tokens": rng.randint(12, 40)}
+            for turn in range(1, agent_turns + 1)
+        ],
+        "fallback_turns": [],
+        "timings": timings
+    }
+    return transcript, expected, expected_live
+
+
+def generate_corpus(directory, calls, mix=None, fmt="jsonl", seed=0):
+    """Write `calls` transcripts (JSONL segments or per-call JSON files) and their ground truth
+
+    Returns the ground truth: {"bugs": {call_sid: [issue, ...]}, "issues": {issue: count}}
+    where "bugs" holds analyze_transcript's findings and "issues" the live ones
+    """
+    rng = random.Random(seed)
+    mix = DEFAULT_MIX if mix is None else mix
+    os.makedirs(directory, exist_ok=True)
+    base = datetime(2026, 1, 5, 9, 0)
+    expected_bugs = {}
+    live = Counter()
+    segment = None
+    segments = 0
+
+    try:
+        for i in range(calls):
+            start = base + timedelta(seconds=i * 37)
+            transcript, expected, expected_live = make_call(rng, start, pick_bugs(rng, mix))
+            if expected:
+                expected_bugs[transcript["call_sid"]] = sorted(expected)
+            live.update(expected_live)
+
+            stamp = start.strftime('%Y%m%d_%H%M%S')
+            if fmt == "json":
+                path = os.path.join(directory, f"call_{transcript['call_sid']}_{stamp}.json")
+                with open(path, 'w') as f:
+                    json.dump(transcript, f, indent=2)
+                continue
+            if segment is None or segment.tell() >= SEGMENT_MAX_BYTES:
+                if segment:
+                    segment.close()
+                segments += 1
+                segment = open(os.path.join(directory, f"segment_{stamp}_{segments}.jsonl"), 'w')
+            segment.write(json.dumps(transcript, separators=(",", ":")) + "\n")
+    finally:
+        if segment:
+            segment.close()
+
+    truth = {"bugs": expected_bugs, "issues": dict(live)}
+    with open(os.path.join(directory, GROUND_TRUTH_NAME), 'w') as f:
+        json.dump(truth, f, separators=(",", ":"))
+    return truth
+
+
+def load_ground_truth(directory):
+    with open(os.path.join(directory, GROUND_TRUTH_NAME), 'r') as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic transcripts with injected bugs")
+    parser.add_argument("directory", help="output directory (e.g. synthetic_transcripts)")
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help='bug rates, e.g. "repeat=0.1,no_closing=0.2" ("none" = no bugs)')
+    parser.add_argument("--format", choices=["jsonl", "json"], default="jsonl")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    truth = generate_corpus(args.directory, args.calls, args.mix, args.format, args.seed)
+    print(f"Wrote {args.calls} transcripts to {args.directory} "
+          f"({len(truth['bugs'])} with injected bugs)")
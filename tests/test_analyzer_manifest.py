@@ -0,0 +1,84 @@
+"""Incremental analysis: manifest reuse, and invalidation when ANALYSIS_VERSION changes"""
+
+import json
+import os
+
+import pytest
+
+import analyze_bugs
+from analyze_bugs import MANIFEST_NAME, BugAnalyzer
+from synth_transcripts import generate_corpus
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    directory = str(tmp_path / "transcripts")
+    generate_corpus(directory, 40, seed=3)
+    return directory
+
+
+@pytest.fixture
+def analyzed(monkeypatch):
+    """Paths analyze_file is called on, across every run in the test"""
+    paths = []
+    analyze_file = analyze_bugs.analyze_file
+
+    def counting(filepath, offset=0):
+        paths.append(filepath)
+        return analyze_file(filepath, offset)
+
+    monkeypatch.setattr(analyze_bugs, "analyze_file", counting)
+    return paths
+
+
+def run(directory, tmp_path):
+    BugAnalyzer(directory, workers=1).generate_report(str(tmp_path / "BUG_REPORT.md"))
+    with open(os.path.join(directory, MANIFEST_NAME)) as f:
+        return json.load(f)
+
+
+def test_unchanged_files_come_from_the_manifest(corpus, tmp_path, analyzed):
+    manifest = run(corpus, tmp_path)
+    assert manifest["version"] == analyze_bugs.ANALYSIS_VERSION
+    first = len(analyzed)
+    assert first == len(manifest["files"]) > 0
+    run(corpus, tmp_path)
+    assert len(analyzed) == first
+
+
+def test_version_change_discards_cached_findings(corpus, tmp_path, analyzed, monkeypatch):
+    run(corpus, tmp_path)
+    first = len(analyzed)
+    monkeypatch.setattr(analyze_bugs, "ANALYSIS_VERSION", "changed-rules")
+    manifest = run(corpus, tmp_path)
+    assert sorted(analyzed[first:]) == sorted(analyzed[:first])
+    assert manifest["version"] == "changed-rules"
+
+
+def test_stale_manifest_gives_the_same_report_as_a_full_run(corpus, tmp_path, monkeypatch):
+    run(corpus, tmp_path)
+    manifest_path = os.path.join(corpus, MANIFEST_NAME)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    # Cached findings from "older detection logic" must not leak into the report
+    for entry in manifest["files"].values():
+        for record in entry["results"]:
+            record["bugs"] = [{"call_sid": record["call_sid"], "type": "critical", "issue": "Stale finding"}]
+    manifest["version"] = "old"
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+
+    run(corpus, tmp_path)
+    with open(tmp_path / "BUG_REPORT.md") as f:
+        report = f.read()
+    assert "Stale finding" not in report
+
+
+def test_changed_file_is_the_only_one_reanalyzed(corpus, tmp_path, analyzed):
+    manifest = run(corpus, tmp_path)
+    first = len(analyzed)
+    path = sorted(manifest["files"])[0]
+    with open(path, "a") as f:
+        f.write(json.dumps({"call_sid": "CAappended", "scenario": "x", "messages": []}) + "\n")
+    run(corpus, tmp_path)
+    assert analyzed[first:] == [path]
@@ -0,0 +1,109 @@
+"""RuleEngine with the shipped rules gives the same findings as the original hard-coded checks"""
+
+import itertools
+
+import pytest
+
+from detection_rules import RuleEngine, default_engine
+
+
+def baseline_live_issues(agent_text, turn_count):
+    """ConversationManager.check_for_issues before the rule engine"""
+    issues = []
+    if len(agent_text) > 400:
+        issues.append("Response too verbose")
+    uncertainty_words = ["i don't know", "not sure", "i can't", "unable to"]
+    if any(phrase in agent_text.lower() for phrase in uncertainty_words):
+        issues.append("Agent expressed uncertainty")
+    if turn_count == 1:
+        specific_details = ["2pm", "3pm", "monday", "tuesday", "dr.", "doctor"]
+        if any(detail in agent_text.lower() for detail in specific_details):
+            issues.append("May be hallucinating specific details")
+    return issues
+
+
+def baseline_offline_issues(messages):
+    """Greeting and closing checks from analyze_transcript before the rule engine"""
+    issues = []
+    agent_msgs = [m['text'] for m in messages if m['speaker'] == 'Agent']
+    first_agent = agent_msgs[0] if agent_msgs else None
+    if first_agent:
+        if not any(word in first_agent.lower() for word in ['hello', 'hi', 'good', 'thank']):
+            issues.append('Missing proper greeting')
+    if messages:
+        last_msg = messages[-1]['text'].lower()
+        if not any(word in last_msg for word in ['goodbye', 'bye', 'thank you']):
+            issues.append('Missing proper closing phrase')
+    return issues
+
+
+AGENT_LINES = [
+    "",
+    "Hello, thanks for calling.",
+    "Hi! How can I help?",
+    "Good morning, orthopedic office.",
+    "You've reached the front desk.",
+    "I'm not sure, let me check.",
+    "I DON'T KNOW the answer to that.",
+    "We are unable to see you today.",
+    "I can't book that online.",
+    "Dr. Smith has an opening Monday at 2pm.",
+    "The doctor is in on tuesday.",
+    "We have 3PM free.",
+    "Thank you for calling, goodbye!",
+    "Okay, bye.",
+    "Thank you.",
+    "See you then.",
+    "Chicago is nice this time of year.",  # "hi" inside a word still counts, as before
+    "x" * 400,
+    "x" * 401,
+    "I'm not sure. " * 40,
+]
+
+
+@pytest.mark.parametrize("text", AGENT_LINES)
+@pytest.mark.parametrize("turn", [1, 2])
+def test_live_rules_match_baseline(text, turn):
+    fired = default_engine().check_message(text, "Agent", "live", first=turn == 1)
+    assert sorted(rule.issue for rule in fired) == sorted(baseline_live_issues(text, turn))
+
+
+@pytest.mark.parametrize("first,last", list(itertools.product(AGENT_LINES, AGENT_LINES)))
+def test_offline_rules_match_baseline(first, last):
+    messages = [
+        {"speaker": "Patient", "text": "Hi, I need an appointment."},
+        {"speaker": "Agent", "text": first},
+        {"speaker": "Patient", "text": "Thanks."},
+        {"speaker": "Agent", "text": last},
+    ]
+    t = {"call_sid": "CA1", "scenario": "Schedule an appointment", "messages": messages}
+    issues = [bug["issue"] for bug in default_engine().check_transcript(t)]
+    assert sorted(issues) == sorted(baseline_offline_issues(messages))
+
+
+def test_closing_checks_last_message_of_either_speaker():
+    messages = [
+        {"speaker": "Agent", "text": "Hello, thank you for calling."},
+        {"speaker": "Patient", "text": "Okay, bye."},
+    ]
+    t = {"call_sid": "CA1", "scenario": "", "messages": messages}
+    assert default_engine().check_transcript(t) == []
+
+
+def test_findings_keep_evidence_and_severity():
+    t = {"call_sid": "CA1", "scenario": "", "messages": [
+        {"speaker": "Agent", "text": "Front desk. " + "x" * 200},
+        {"speaker": "Patient", "text": "Goodbye."},
+    ]}
+    [bug] = default_engine().check_transcript(t)
+    assert bug == {"call_sid": "CA1", "type": "low", "issue": "Missing proper greeting",
+                   "example": ("Front desk. " + "x" * 200)[:150]}
+
+
+def test_overlapping_keywords_all_match():
+    # "bye" is a prefix of "byebye" - the longest match must still imply the shorter one
+    engine = RuleEngine([
+        {"id": "a", "any": ["bye"], "issue": "a"},
+        {"id": "b", "any": ["byebye"], "issue": "b"},
+    ])
+    assert [r.issue for r in engine.check_message("ok byebye", "Agent", "live")] == ["a", "b"]
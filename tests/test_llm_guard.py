@@ -0,0 +1,101 @@
+"""TokenBucket and CircuitBreaker state transitions, on a fake clock"""
+
+import pytest
+
+import llm_guard
+from llm_guard import CircuitBreaker, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(llm_guard.time, "monotonic", fake)
+    return fake
+
+
+def test_bucket_starts_full_and_drains(clock):
+    bucket = TokenBucket(rate=2.0, capacity=4.0)
+    assert bucket.wait_time(4) == 0.0
+    bucket.take(4)
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+
+
+def test_bucket_refills_at_rate_up_to_capacity(clock):
+    bucket = TokenBucket(rate=2.0, capacity=4.0)
+    bucket.take(4)
+    clock.now += 1.0
+    assert bucket.wait_time(2) == 0.0
+    assert bucket.wait_time(3) == pytest.approx(0.5)
+    clock.now += 60.0
+    bucket.wait_time(0)
+    assert bucket.level == 4.0
+
+
+def test_bucket_oversized_request_drains_instead_of_waiting_forever(clock):
+    bucket = TokenBucket(rate=1.0, capacity=10.0)
+    assert bucket.wait_time(50) == 0.0
+    bucket.take(50)
+    assert bucket.level == 0.0
+    assert bucket.wait_time(50) == pytest.approx(10.0)
+
+
+def test_breaker_opens_after_threshold_failures(clock):
+    breaker = CircuitBreaker(threshold=3, cooldown=30.0)
+    assert not breaker.failure()
+    assert not breaker.failure()
+    assert breaker.state == "closed" and breaker.allow()
+    assert breaker.failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_breaker_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(threshold=2, cooldown=30.0)
+    breaker.failure()
+    breaker.success()
+    assert not breaker.failure()
+    assert breaker.state == "closed"
+
+
+def test_breaker_half_open_allows_a_single_probe(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=30.0)
+    breaker.failure()
+    clock.now += 29.9
+    assert breaker.state == "open"
+    clock.now += 0.1
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_breaker_probe_success_closes(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=30.0)
+    breaker.failure()
+    clock.now += 30.0
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_breaker_probe_failure_reopens_for_another_cooldown(clock):
+    breaker = CircuitBreaker(threshold=5, cooldown=30.0)
+    for _ in range(5):
+        breaker.failure()
+    clock.now += 30.0
+    assert breaker.allow()
+    # Already open before the probe, so this doesn't count as opening it again
+    assert not breaker.failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    clock.now += 30.0
+    assert breaker.state == "half-open"
+    assert breaker.allow()
@@ -0,0 +1,104 @@
+"""Call index queries: select() filters and unindexed() gap detection"""
+
+import json
+import os
+
+from transcript_index import append_rows, index_row, index_rows, load_rows, select, unindexed
+
+ROWS = [
+    {"call_sid": "CA1", "scenario": "Schedule an appointment for knee pain", "start_time": "2026-01-05T09:00:00"},
+    {"call_sid": "CA2", "scenario": "Ask about office hours", "start_time": "2026-01-06T10:30:00"},
+    {"call_sid": "CA3", "scenario": "Reschedule a KNEE follow-up", "start_time": "2026-01-07T08:15:00"},
+]
+
+
+def sids(rows):
+    return [row["call_sid"] for row in rows]
+
+
+def test_select_without_filters_keeps_everything():
+    assert sids(select(ROWS)) == ["CA1", "CA2", "CA3"]
+
+
+def test_select_scenario_is_case_insensitive_substring():
+    assert sids(select(ROWS, scenario="knee")) == ["CA1", "CA3"]
+    assert sids(select(ROWS, scenario="Office")) == ["CA2"]
+
+
+def test_select_since_accepts_dates_and_datetimes():
+    assert sids(select(ROWS, since="2026-01-06")) == ["CA2", "CA3"]
+    assert sids(select(ROWS, since="2026-01-06T10:31")) == ["CA3"]
+
+
+def test_select_call_sids_are_exact():
+    assert sids(select(ROWS, call_sids=["CA2", "CA9"])) == ["CA2"]
+    assert sids(select(ROWS, call_sids=["CA"])) == []
+
+
+def test_select_filters_combine():
+    assert sids(select(ROWS, scenario="knee", since="2026-01-06", call_sids=["CA1", "CA3"])) == ["CA3"]
+
+
+def write_segment(path, transcripts):
+    """Append transcripts as JSONL; returns the (offset, length) of each line"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    spans = []
+    with open(path, "ab") as f:
+        for t in transcripts:
+            line = (json.dumps(t) + "\n").encode()
+            spans.append((f.tell(), len(line)))
+            f.write(line)
+    return spans
+
+
+def call(sid, scenario="Ask about office hours"):
+    return {"call_sid": sid, "scenario": scenario, "start_time": "2026-01-05T09:00:00"}
+
+
+def index_segment(directory, path, transcripts):
+    spans = write_segment(path, transcripts)
+    append_rows(directory, [index_row(directory, t, path, offset, length)
+                            for t, (offset, length) in zip(transcripts, spans)])
+
+
+def test_unindexed_empty_when_index_covers_everything(tmp_path):
+    directory = str(tmp_path)
+    index_segment(directory, os.path.join(directory, "2026-01-05", "hours", "segment_1.jsonl"),
+                  [call("CA1"), call("CA2")])
+    assert unindexed(directory, index_rows(directory)) == []
+
+
+def test_unindexed_reports_files_missing_from_the_index(tmp_path):
+    directory = str(tmp_path)
+    index_segment(directory, os.path.join(directory, "segment_1.jsonl"), [call("CA1")])
+    old_segment = os.path.join(directory, "segment_0.jsonl")
+    write_segment(old_segment, [call("CA0")])
+    old_json = os.path.join(directory, "call_CA9_20260101_000000.json")
+    with open(old_json, "w") as f:
+        json.dump(call("CA9"), f)
+    assert sorted(unindexed(directory, index_rows(directory))) == [(old_json, 0), (old_segment, 0)]
+
+
+def test_unindexed_resumes_segments_after_the_last_indexed_row(tmp_path):
+    directory = str(tmp_path)
+    path = os.path.join(directory, "segment_1.jsonl")
+    index_segment(directory, path, [call("CA1"), call("CA2")])
+    covered = os.path.getsize(path)
+    write_segment(path, [call("CA3")])
+    assert unindexed(directory, index_rows(directory)) == [(path, covered)]
+
+
+def test_unindexed_ignores_dot_files(tmp_path):
+    directory = str(tmp_path)
+    index_segment(directory, os.path.join(directory, "segment_1.jsonl"), [call("CA1")])
+    with open(os.path.join(directory, ".analyzer_manifest.json"), "w") as f:
+        f.write("{}")
+    assert unindexed(directory, index_rows(directory)) == []
+
+
+def test_selected_rows_load_only_their_transcripts(tmp_path):
+    directory = str(tmp_path)
+    path = os.path.join(directory, "segment_1.jsonl")
+    index_segment(directory, path, [call("CA1", "Knee pain"), call("CA2"), call("CA3", "knee brace")])
+    loaded = load_rows(directory, select(index_rows(directory), scenario="knee"))
+    assert sids(loaded) == ["CA1", "CA3"]
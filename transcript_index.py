@@ -0,0 +1,191 @@
+"""
+Sharded transcript layout and call index
+Transcripts are grouped into <date>/<scenario>/ directories, and every write appends
+one compact row (call_sid, scenario, start time, duration, turns, issue count and
+where the transcript lives) to an index, so queries read only the calls they need
+"""
+
+import os
+import re
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Append-only index next to the transcripts; the leading dot keeps the analyzer from reading it
+INDEX_NAME = ".index.jsonl"
+# Scenario directory names are cut to this many characters
+SLUG_CHARS = 60
+
+
+def scenario_slug(scenario: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "-", scenario.lower()).strip("-")[:SLUG_CHARS].rstrip("-")
+    return slug or "unknown"
+
+
+def shard_dir(directory: str, data: dict) -> str:
+    """<directory>/<YYYY-MM-DD>/<scenario-slug> for one transcript"""
+    try:
+        day = datetime.fromisoformat(data.get("start_time", "")).strftime("%Y-%m-%d")
+    except ValueError:
+        day = datetime.now().strftime("%Y-%m-%d")
+    return os.path.join(directory, day, scenario_slug(data.get("scenario", "")))
+
+
+def index_row(directory: str, data: dict, path: str, offset: int, length: int) -> dict:
+    """Index entry for a transcript stored at path[offset:offset + length]"""
+    return {
+        "call_sid": data["call_sid"],
+        "scenario": data.get("scenario", ""),
+        "start_time": data.get("start_time", ""),
+        "duration": data.get("duration", 0),
+        "turns": data.get("turns", 0),
+        "issues": len(data.get("issues", [])),
+        "status": data.get("status", ""),
+        "path": os.path.relpath(path, directory),
+        "offset": offset,
+        "length": length
+    }
+
+
+def append_rows(directory: str, rows: List[dict]):
+    """Append index rows in one O_APPEND write, so concurrent workers never interleave them"""
+    if not rows:
+        return
+    payload = "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows).encode()
+    fd = os.open(os.path.join(directory, INDEX_NAME), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, payload)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def has_index(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, INDEX_NAME))
+
+
+def index_rows(directory: str) -> List[dict]:
+    """Every index row in write order - a call indexed twice appears twice"""
+    rows = []
+    try:
+        with open(os.path.join(directory, INDEX_NAME), "rb") as f:
+            for line in f:
+                # A row still being appended may end in a partial line
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        return []
+    return rows
+
+
+def read_index(directory: str) -> List[dict]:
+    """Index rows, one per call (a call indexed twice keeps its last row)"""
+    return list({row["call_sid"]: row for row in index_rows(directory)}.values())
+
+
+def unindexed(directory: str, rows: Iterable[dict]) -> List[Tuple[str, int]]:
+    """(path, offset) for transcript data the index rows don't cover
+
+    Files from before the index existed are missing from it entirely, and a
+    segment can hold records past its last indexed row (older versions, or a
+    batch whose rows are still being appended)
+    """
+    covered: Dict[str, int] = {}
+    for row in rows:
+        covered[row["path"]] = max(covered.get(row["path"], 0), row["offset"] + row["length"])
+    gaps = []
+    for path in transcript_paths(directory):
+        end = covered.get(os.path.relpath(path, directory))
+        if end is None:
+            gaps.append((path, 0))
+        elif path.endswith(".jsonl") and os.path.getsize(path) > end:
+            gaps.append((path, end))
+    return gaps
+
+
+def select(rows: Iterable[dict], scenario: Optional[str] = None, since: Optional[str] = None,
+           call_sids: Optional[Iterable[str]] = None) -> List[dict]:
+    """Rows matching every given filter
+
+    scenario: case-insensitive substring; since: ISO date or datetime, compared
+    with start_time; call_sids: exact IDs
+    """
+    wanted = set(call_sids) if call_sids else None
+    needle = scenario.lower() if scenario else None
+    return [row for row in rows
+            if (wanted is None or row["call_sid"] in wanted)
+            and (needle is None or needle in row["scenario"].lower())
+            and (since is None or row["start_time"] >= since)]
+
+
+def load_rows(directory: str, rows: Iterable[dict]) -> List[dict]:
+    """Transcripts for index rows - each file is opened once and read only at the rows' offsets"""
+    by_path = defaultdict(list)
+    for row in rows:
+        by_path[row["path"]].append(row)
+
+    transcripts = []
+    for path, path_rows in sorted(by_path.items()):
+        try:
+            with open(os.path.join(directory, path), "rb") as f:
+                for row in sorted(path_rows, key=lambda r: r["offset"]):
+                    f.seek(row["offset"])
+                    try:
+                        transcripts.append(json.loads(f.read(row["length"])))
+                    except ValueError:
+                        pass
+        except FileNotFoundError:
+            print(f"Indexed file missing: {path}")
+    return transcripts
+
+
+def transcript_paths(directory: str) -> List[str]:
+    """Every transcript file under directory, flat or sharded (dot-files and dot-dirs skipped)"""
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        paths.extend(os.path.join(root, f) for f in sorted(files)
+                     if not f.startswith(".") and (f.endswith(".json") or f.endswith(".jsonl")))
+    return paths
+
+
+def build_index(directory: str) -> int:
+    """Rewrite the index from the transcript files themselves - returns the rows written
+
+    For directories written before the index existed, or after files were moved
+    """
+    rows = []
+    for path in transcript_paths(directory):
+        if not path.endswith(".jsonl"):
+            try:
+                with open(path, "r") as f:
+                    data = json.load(f)
+            except ValueError:
+                continue
+            rows.append(index_row(directory, data, path, 0, os.path.getsize(path)))
+            continue
+        offset = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    data = None
+                if data:
+                    rows.append(index_row(directory, data, path, offset, len(line)))
+                offset += len(line)
+
+    index_path = os.path.join(directory, INDEX_NAME)
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        for row in rows:
+            f.write(json.dumps(row, separators=(",", ":")) + "\n")
+    os.replace(tmp_path, index_path)
+    return len(rows)
@@ -0,0 +1,159 @@
+"""
+Background transcript writer for voice_bot
+Keeps disk I/O off the event loop and writes each call exactly once; every write
+is also recorded in the call index (see transcript_index.py)
+"""
+
+import os
+import json
+import queue
+import threading
+from datetime import datetime
+from collections import OrderedDict
+from typing import Dict, Optional
+from transcript_index import append_rows, index_row, shard_dir
+
+# Rotate a JSONL segment once it grows past this many bytes
+SEGMENT_MAX_BYTES = int(os.environ.get("TRANSCRIPT_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+# Max transcripts written between fsyncs
+BATCH_SIZE = 64
+# Recently submitted call_sids remembered for de-duplication
+RECENT_CALLS = 10000
+# Sharded layout: open segment files kept per process (least recently used are closed)
+MAX_OPEN_SEGMENTS = 32
+
+_STOP = object()
+
+
+def close_segment(segment):
+    segment.flush()
+    os.fsync(segment.fileno())
+    segment.close()
+
+
+class TranscriptSink:
+    """Queue + writer thread
+
+    format="jsonl": append-only segments (one transcript per line, one fsync per batch)
+    format="json":  the original pretty-printed call_<sid>_<timestamp>.json per call
+    layout="sharded": files go under <date>/<scenario>/; layout="flat": all in directory
+    """
+
+    def __init__(self, directory: str, format: str = "jsonl", layout: str = "sharded"):
+        if format not in ("jsonl", "json"):
+            raise ValueError(f"Unknown TRANSCRIPT_FORMAT: {format}")
+        if layout not in ("sharded", "flat"):
+            raise ValueError(f"Unknown TRANSCRIPT_LAYOUT: {layout}")
+        self.directory = directory
+        self.format = format
+        self.layout = layout
+        self.queue: "queue.Queue" = queue.Queue()
+        self.submitted: "OrderedDict[str, None]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        # Shard directory -> open segment, least recently used first
+        self.segments: "OrderedDict[str, object]" = OrderedDict()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="transcript-sink", daemon=True)
+                self.thread.start()
+
+    def submit(self, data: dict) -> bool:
+        """Queue a transcript; a call_sid that was already submitted is ignored"""
+        with self.lock:
+            if data["call_sid"] in self.submitted:
+                return False
+            self.submitted[data["call_sid"]] = None
+            if len(self.submitted) > RECENT_CALLS:
+                self.submitted.popitem(last=False)
+        self.start()
+        self.queue.put(data)
+        return True
+
+    def close(self):
+        """Flush everything queued and stop the writer"""
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+        self.thread = None
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if _STOP in batch:
+                stopping = True
+                batch = [item for item in batch if item is not _STOP]
+            if not batch:
+                continue
+
+            try:
+                if self.format == "jsonl":
+                    rows = self._append_segments(batch)
+                else:
+                    rows = [self._write_file(data) for data in batch]
+                # Index rows follow the data, so a row never points at unwritten bytes
+                append_rows(self.directory, rows)
+            except OSError as e:
+                print(f"Transcript write failed: {e}")
+
+        for segment in self.segments.values():
+            segment.close()
+        self.segments.clear()
+
+    def _target_dir(self, data: dict) -> str:
+        if self.layout == "flat":
+            return self.directory
+        target = shard_dir(self.directory, data)
+        os.makedirs(target, exist_ok=True)
+        return target
+
+    def _segment_for(self, target: str):
+        segment = self.segments.get(target)
+        if segment is not None and segment.tell() < SEGMENT_MAX_BYTES:
+            self.segments.move_to_end(target)
+            return segment
+        if segment is not None:
+            close_segment(segment)
+            del self.segments[target]
+        elif len(self.segments) >= MAX_OPEN_SEGMENTS:
+            close_segment(self.segments.popitem(last=False)[1])
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        # One segment per shard per process - workers never interleave lines
+        segment = open(f"{target}/segment_{stamp}_{os.getpid()}.jsonl", "ab")
+        self.segments[target] = segment
+        return segment
+
+    def _append_segments(self, batch):
+        rows = []
+        touched: Dict[str, object] = {}
+        for data in batch:
+            segment = self._segment_for(self._target_dir(data))
+            line = (json.dumps(data, separators=(",", ":")) + "\n").encode()
+            rows.append(index_row(self.directory, data, segment.name, segment.tell(), len(line)))
+            segment.write(line)
+            touched[segment.name] = segment
+        for segment in touched.values():
+            # Segments rotated or evicted mid-batch were synced on close
+            if not segment.closed:
+                segment.flush()
+                os.fsync(segment.fileno())
+
+        for data, row in zip(batch, rows):
+            print(f"Saved transcript: {data['call_sid']} -> {row['path']}")
+        return rows
+
+    def _write_file(self, data):
+        filename = f"{self._target_dir(data)}/call_{data['call_sid']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        with open(filename, 'w') as f:
+            json.dump(data, f, indent=2)
+        print(f"Saved transcript: {filename}")
+        return index_row(self.directory, data, filename, 0, os.path.getsize(filename))
@@ -4,21 +4,33 @@ Simulates patient calling medical office - finds bugs and tests quality
 """
 
 import os
-import json
+import re
 import time
+import hashlib
+import asyncio
+import functools
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict, List
-from fastapi import FastAPI, Request
-from fastapi.responses import Response
+from typing import AsyncIterator, Dict, List, Optional
+import httpx
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, Response
 from twilio.rest import Client
-from twilio.twiml.voice_response import VoiceResponse, Gather
+from twilio.twiml.voice_response import VoiceResponse, Gather, Connect
 import anthropic
 from dotenv import load_dotenv
+from completion_channel import publish_completion
+from state_store import create_store
+from transcript_sink import TranscriptSink
+from detection_rules import default_engine
+from opening_pool import OpeningPool
+from llm_guard import LLMGuard, LLMUnavailable
+from response_cache import ResponseCache, prefix_key
+from metrics import SpanTimer, current_timer, mark, render_prometheus, span
+from scenarios import SCENARIOS
 
 load_dotenv()
 
-app = FastAPI()
-
 # Config
 TWILIO_ACCOUNT_SID = os.environ.get("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN")
@@ -26,11 +38,275 @@ TWILIO_PHONE_NUMBER = os.environ.get("TWILIO_PHONE_NUMBER")
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
 PUBLIC_URL = os.environ.get("PUBLIC_URL", "https://your-ngrok-url.ngrok-free.app")
 TARGET_NUMBER = os.environ.get("TARGET_NUMBER")
+# "gather" = Gather/Say round-trips, "stream" = ConversationRelay websocket
+CONVERSATION_MODE = os.environ.get("CONVERSATION_MODE", "gather")
+# "memory" (single worker) or "sqlite" (shared by all uvicorn workers)
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "memory")
+STATE_DB_PATH = os.environ.get("STATE_DB_PATH", "conversations.db")
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", "1"))
+# Calls idle longer than this (no /status ever arrived) are flushed as abandoned
+CALL_IDLE_TTL = float(os.environ.get("CALL_IDLE_TTL", "600"))
+MAX_LIVE_CALLS = int(os.environ.get("MAX_LIVE_CALLS", "200"))
+REAPER_INTERVAL = float(os.environ.get("REAPER_INTERVAL", "30"))
+# "jsonl" = append-only segments, "json" = one pretty-printed file per call
+TRANSCRIPT_FORMAT = os.environ.get("TRANSCRIPT_FORMAT", "jsonl")
+# "sharded" = transcripts/<date>/<scenario>/..., "flat" = everything in transcripts/
+TRANSCRIPT_LAYOUT = os.environ.get("TRANSCRIPT_LAYOUT", "sharded")
+LLM_MODEL = "claude-sonnet-4-20250514"
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "100"))
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "30"))
+# Hang up after this many patient turns
+MAX_TURNS = int(os.environ.get("MAX_TURNS", "8"))
+# Estimated prompt tokens per patient turn; older turns past this are folded
+# into a rolling summary, while the newest CONTEXT_KEEP_TURNS stay verbatim
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_KEEP_TURNS = int(os.environ.get("CONTEXT_KEEP_TURNS", "6"))
+# Pre-generated opening lines kept ready per scenario (0 disables the pool)
+OPENING_POOL_SIZE = int(os.environ.get("OPENING_POOL_SIZE", "5"))
+OPENING_POOL_PATH = os.environ.get("OPENING_POOL_PATH", "opening_pool.json")
+# Start the patient's reply from Gather partial results before the agent finishes;
+# a partial must hold still for SPECULATION_DELAY seconds before Claude is called
+SPECULATIVE_REPLIES = os.environ.get("SPECULATIVE_REPLIES", "1") == "1"
+SPECULATION_DELAY = float(os.environ.get("SPECULATION_DELAY", "0.3"))
+SPECULATION_MIN_CHARS = 10
+# Longest /handle-speech waits for Claude before playing filler audio and
+# redirecting to /pickup, and how many fillers before giving up on the turn
+TURN_DEADLINE = float(os.environ.get("TURN_DEADLINE_MS", "3000")) / 1000
+MAX_PICKUP_ATTEMPTS = int(os.environ.get("MAX_PICKUP_ATTEMPTS", "5"))
+# Everything a turn may spend on Claude, retries included, before a fallback reply
+TURN_BUDGET = TURN_DEADLINE * (MAX_PICKUP_ATTEMPTS + 1)
+# Provider limits for the whole server - split evenly between uvicorn workers
+LLM_MAX_RPS = float(os.environ.get("LLM_MAX_RPS", "50"))
+LLM_MAX_TOKENS_PER_MIN = float(os.environ.get("LLM_MAX_TOKENS_PER_MIN", "400000"))
+# Consecutive provider failures that open the circuit, and how long it stays open
+LLM_BREAKER_FAILURES = int(os.environ.get("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN = float(os.environ.get("LLM_BREAKER_COOLDOWN", "30"))
+# Reuse patient replies across calls that reach an identical conversation prefix
+RESPONSE_CACHE = os.environ.get("RESPONSE_CACHE", "0") == "1"
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH", "response_cache.db")
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "5000"))
+RESPONSE_CACHE_VARIANTS = int(os.environ.get("RESPONSE_CACHE_VARIANTS", "3"))
+RESPONSE_CACHE_DISK_ENTRIES = int(os.environ.get("RESPONSE_CACHE_DISK_ENTRIES", "100000"))
+# Rough chars-per-token ratio for English, good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+# Shared async Claude client - created once at startup so every call
+# reuses the same keep-alive connection pool
+llm_client: Optional[anthropic.AsyncAnthropic] = None
+llm_guard = LLMGuard(
+    LLM_MAX_RPS / WEB_WORKERS,
+    LLM_MAX_TOKENS_PER_MIN / WEB_WORKERS,
+    LLM_BREAKER_FAILURES,
+    LLM_BREAKER_COOLDOWN
+)
+# Summaries running between turns (call_sids in flight, plus their tasks)
+summarizing = set()
+background_tasks = set()
+# In-flight speculative replies per call (this process only - tasks can't be shared)
+speculations: Dict[str, "Speculation"] = {}
+speculation_stats = {"used": 0, "discarded": 0}
+# Replies that missed the turn deadline, waiting for /pickup: call_sid -> (conv, task)
+pending_replies: Dict[str, tuple] = {}
+
+
+def create_llm_client() -> anthropic.AsyncAnthropic:
+    """Build a pooled async Claude client"""
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            keepalive_expiry=60
+        ),
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=5.0)
+    )
+    # Retries are llm_guard's job - it knows the turn deadline
+    return anthropic.AsyncAnthropic(api_key=ANTHROPIC_API_KEY, http_client=http_client, max_retries=0)
+
+
+def get_llm_client() -> anthropic.AsyncAnthropic:
+    """Return the shared client, creating it lazily outside the app lifespan"""
+    global llm_client
+    if llm_client is None:
+        llm_client = create_llm_client()
+    return llm_client
+
+
+def request_tokens(request: dict) -> int:
+    """Tokens a request counts against the per-minute limit (prompt estimate + max output)"""
+    chars = len(str(request["system"])) + sum(len(str(m["content"])) for m in request["messages"])
+    return chars // CHARS_PER_TOKEN + request["max_tokens"]
+
+
+async def create_message(request: dict, deadline: Optional[float] = None):
+    """Every Claude request goes through the shared limiter, retries and breaker"""
+    return await llm_guard.call(
+        lambda: get_llm_client().messages.create(**request),
+        request_tokens(request),
+        deadline or time.monotonic() + TURN_BUDGET
+    )
+
+
+def finish_call(conv: "ConversationManager", status: str = "completed") -> bool:
+    """Remove a call from live state and write its transcript exactly once"""
+    # Only whoever's delete succeeds (handler, /status, reaper, any worker) writes it
+    with span("state_write"):
+        if not conversations.delete(conv.call_sid):
+            return False
+    conv.cancel_speculation()
+    pending = pending_replies.pop(conv.call_sid, None)
+    if pending is not None:
+        pending[1].cancel()
+    if conv.messages:
+        with span("transcript_write"):
+            conv.save_transcript(status)
+    return True
+
+
+def evict_call(conv: "ConversationManager") -> bool:
+    """Drop an abandoned call, flushing its transcript first"""
+    if not finish_call(conv, status="abandoned"):
+        return False
+    print(f"Evicted abandoned call: {conv.call_sid}")
+    return True
+
+
+def reap_conversations():
+    """Evict calls idle longer than CALL_IDLE_TTL - active calls are never cut off"""
+    for conv in conversations.stale(time.time() - CALL_IDLE_TTL):
+        evict_call(conv)
+    
+    # A call that ended on another worker leaves its speculation behind here
+    for call_sid in [sid for sid in speculations if sid not in conversations]:
+        speculations.pop(call_sid).task.cancel()
+
+
+async def reaper_loop():
+    while True:
+        await asyncio.sleep(REAPER_INTERVAL)
+        try:
+            reap_conversations()
+        except Exception as e:
+            print(f"Reaper error: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global llm_client
+    llm_client = create_llm_client()
+    reaper = asyncio.create_task(reaper_loop())
+    if OPENING_POOL_SIZE > 0:
+        opening_pool.load(SCENARIOS)
+        # With WEB_WORKERS > 1 one worker fills and saves the pool, the others reload its file
+        if opening_pool.claim():
+            opening_pool.schedule_all()
+    yield
+    reaper.cancel()
+    opening_pool.close()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.to_thread(transcript_sink.close)
+    await llm_client.close()
+    llm_client = None
+
+
+app = FastAPI(lifespan=lifespan)
 
-# Store active conversations
-conversations: Dict[str, Dict] = {}
 transcripts_dir = "transcripts"
 os.makedirs(transcripts_dir, exist_ok=True)
+transcript_sink = TranscriptSink(transcripts_dir, TRANSCRIPT_FORMAT, TRANSCRIPT_LAYOUT)
+
+
+class Message:
+    """One conversation line - slotted, with an epoch timestamp instead of an ISO string"""
+
+    __slots__ = ("speaker", "text", "timestamp")
+
+    def __init__(self, speaker: str, text: str, timestamp: Optional[float] = None):
+        self.speaker = speaker
+        self.text = text
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    def to_dict(self) -> dict:
+        """Transcript form"""
+        return {
+            "speaker": self.speaker,
+            "text": self.text,
+            "timestamp": datetime.fromtimestamp(self.timestamp).isoformat()
+        }
+
+
+# Static per-scenario preamble - sent as the system prompt
+PATIENT_PERSONA = """You are a patient calling a medical office about: {scenario}
+
+You are on a phone call, so speak the way a real caller would: plain, short, natural sentences with no lists, formatting or stage directions. Reply to what the office just said in 1-2 sentences. Stay consistent with anything you have already told them, and make up plausible personal details (name, date of birth, symptoms) when asked. When your request is handled or the conversation is clearly over, say "Thanks, goodbye."
+"""
+
+# The patient speaks first, so the conversation opens with the office picking up
+CALL_CONNECTED = "(The office picks up the phone.)"
+
+# Played while a slow reply is still generating
+FILLERS = ["Hmm, one sec.", "Sorry, let me think.", "Uh, just a moment."]
+
+# Said when Claude is unavailable - keeps the call alive until it recovers
+FALLBACK_REPLIES = [
+    "Sorry, you cut out for a second. Could you say that again?",
+    "Sorry, I missed that. What was that?",
+    "Sorry, could you repeat that?"
+]
+
+# Transcript speaker -> Claude role (Claude plays the patient)
+ROLES = {"Patient": "assistant", "Agent": "user"}
+
+# Identifies what generated replies came from - pooled and cached replies are
+# only reused under the same model and persona
+PROMPT_VERSION = hashlib.sha1(f"{LLM_MODEL}\n{PATIENT_PERSONA}\n{CALL_CONNECTED}".encode()).hexdigest()[:12]
+
+response_cache = ResponseCache(
+    RESPONSE_CACHE_PATH,
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_VARIANTS,
+    RESPONSE_CACHE_DISK_ENTRIES
+) if RESPONSE_CACHE else None
+
+def normalize_speech(text: str) -> str:
+    """Compare STT results ignoring case, punctuation and spacing"""
+    return " ".join(re.sub(r"[^a-z0-9' ]", " ", text.lower()).split())
+
+
+class Speculation:
+    """A patient reply being generated against a partial agent utterance"""
+
+    __slots__ = ("key", "request", "task", "started")
+
+    def __init__(self, key: str, request: dict):
+        self.key = key
+        self.request = request
+        self.started = False
+        self.task: Optional[asyncio.Task] = None
+
+    async def run(self):
+        # Debounce: partials arrive every word; only a pause reaches Claude
+        await asyncio.sleep(SPECULATION_DELAY)
+        self.started = True
+        return await create_message(self.request)
+
+
+def retrieve_exception(task: asyncio.Task):
+    """Mark a speculation's failure as seen - a discarded task is never awaited"""
+    if not task.cancelled():
+        task.exception()
+
+
+def with_pending(history: List[dict], pending_agent: Optional[str]) -> List[dict]:
+    """history plus agent speech that hasn't been added yet, merged like add_message would"""
+    if not pending_agent:
+        return history
+    if history[-1]["role"] == "user":
+        return history[:-1] + [{"role": "user", "content": f"{history[-1]['content']}\n{pending_agent}"}]
+    return history + [{"role": "user", "content": pending_agent}]
+
+
+SUMMARY_PROMPT = """You are summarizing a phone call you are making as a patient to a medical office. Write 2-4 plain sentences covering everything that matters for the rest of the call: what you asked for, every personal detail you gave (name, date of birth, symptoms), what the office offered or asked, and what has been agreed. Include the earlier summary's details. Output only the summary."""
 
 
 class ConversationManager:
@@ -39,163 +315,532 @@ class ConversationManager:
     def __init__(self, call_sid: str, scenario: str):
         self.call_sid = call_sid
         self.scenario = scenario
-        self.messages: List[Dict] = []
+        self.messages: List[Message] = []
         self.turn_count = 0
         self.start_time = datetime.now()
+        self.last_active = time.time()
         self.issues = []
+        self.llm_usage: List[dict] = []
+        # Rolling summary of llm_messages()[:summarized]; always an even index,
+        # so the verbatim tail still opens with a user turn
+        self.summary = ""
+        self.summarized = 0
+        # Turns answered with a canned reply because Claude was unavailable
+        self.fallback_turns: List[int] = []
+        # Per-request span timings (ms), see metrics.SpanTimer
+        self.timings: List[dict] = []
         
     def add_message(self, speaker: str, text: str):
-        self.messages.append({
-            "speaker": speaker,
-            "text": text,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-    def generate_patient_response(self) -> str:
-        """Use Claude to generate next patient message"""
-        client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
-        
-        # Build context from conversation
-        history = "\n".join([
-            f"{msg['speaker']}: {msg['text']}" for msg in self.messages
-        ])
+        self.messages.append(Message(speaker, text))
+        self.last_active = self.messages[-1].timestamp
+
+    def llm_messages(self) -> List[dict]:
+        """Role-alternating history for Claude, built from the transcript when needed"""
+        history = [{"role": "user", "content": CALL_CONNECTED}]
+        for m in self.messages:
+            if not m.text:
+                continue
+            role = ROLES.get(m.speaker, "user")
+            if history[-1]["role"] == role:
+                # Roles must alternate - fold back-to-back lines into one turn
+                history[-1]["content"] = f"{history[-1]['content']}\n{m.text}"
+            else:
+                history.append({"role": role, "content": m.text})
+        return history
+
+    def to_state(self) -> dict:
+        """Compact form for shared state backends"""
+        return {
+            "sid": self.call_sid,
+            "sc": self.scenario,
+            "m": [[m.speaker, m.text, m.timestamp] for m in self.messages],
+            "t": self.turn_count,
+            "st": self.start_time.timestamp(),
+            "la": self.last_active,
+            "i": self.issues,
+            "u": self.llm_usage,
+            "sm": self.summary,
+            "sn": self.summarized,
+            "fb": self.fallback_turns,
+            "tm": self.timings
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "ConversationManager":
+        conv = cls(state["sid"], state["sc"])
+        for speaker, text, ts in state["m"]:
+            conv.messages.append(Message(speaker, text, ts))
+        conv.turn_count = state["t"]
+        conv.start_time = datetime.fromtimestamp(state["st"])
+        conv.last_active = state["la"]
+        conv.issues = state["i"]
+        conv.llm_usage = state["u"]
+        conv.summary = state.get("sm", "")
+        conv.summarized = state.get("sn", 0)
+        conv.fallback_turns = state.get("fb", [])
+        conv.timings = state.get("tm", [])
+        return conv
         
-        # Shorter, faster prompt for lower latency
-        prompt = f"""You are a patient calling about: {self.scenario}
+    def persona(self) -> str:
+        return PATIENT_PERSONA.format(scenario=self.scenario).strip()
 
-Conversation:
-{history}
+    def estimate_tokens(self, history: List[dict], start: int) -> int:
+        """Approximate prompt size when sending history[start:]"""
+        chars = len(self.persona()) + len(self.summary)
+        chars += sum(len(m["content"]) for m in history[start:])
+        return chars // CHARS_PER_TOKEN
 
-Reply naturally as the patient (1-2 sentences). If done, say "Thanks, goodbye."
+    def context_start(self, history: List[dict]) -> int:
+        """First history entry sent verbatim - after the summary, trimmed to the budget"""
+        start = self.summarized
+        tokens = self.estimate_tokens(history, start)
+        # Summary still pending: drop the oldest turns (a user/assistant pair at
+        # a time) rather than let the prompt, and the turn latency, keep growing
+        while tokens > CONTEXT_TOKEN_BUDGET and len(history) - start > CONTEXT_KEEP_TURNS + 1:
+            tokens -= (len(history[start]["content"]) +
+                       len(history[start + 1]["content"])) // CHARS_PER_TOKEN
+            start += 2
+        return start
 
-Response:"""
+    def compaction_point(self) -> Optional[int]:
+        """How far the summary should extend, or None while under budget"""
+        history = self.llm_messages()
+        if self.estimate_tokens(history, self.summarized) <= CONTEXT_TOKEN_BUDGET:
+            return None
+        upto = len(history) - CONTEXT_KEEP_TURNS
+        upto -= upto % 2
+        return upto if upto > self.summarized else None
 
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=100,  # Reduced for speed
-            messages=[{"role": "user", "content": prompt}]
-        )
+    async def summarize(self, upto: int) -> str:
+        """Fold llm_messages()[summarized:upto] into the running summary"""
+        lines = []
+        if self.summary:
+            lines.append(f"Earlier summary: {self.summary}")
+        for m in self.llm_messages()[self.summarized:upto]:
+            who = "You" if m["role"] == "assistant" else "Office"
+            lines.append(f"{who}: {m['content']}")
+        message = await create_message({
+            "model": LLM_MODEL,
+            "max_tokens": 200,
+            "system": SUMMARY_PROMPT,
+            "messages": [{"role": "user", "content": "\n".join(lines)}]
+        })
+        return message.content[0].text.strip()
+
+    def apply_summary(self, summary: str, upto: int):
+        if upto > self.summarized:
+            self.summary = summary
+            self.summarized = upto
+
+    def build_request(self, pending_agent: Optional[str] = None) -> dict:
+        """Claude request shared by the Gather and streaming modes
+
+        pending_agent: agent speech not yet in the history (speculative replies)
+        """
+        # No cache_control: the persona is far below the model's 1024-token minimum
+        # cacheable prefix, and CONTEXT_TOKEN_BUDGET keeps the history near it
+        system = self.persona()
+        if self.summary:
+            system += f"\n\nSummary of the call so far: {self.summary}"
+        history = self.llm_messages()
+        return {
+            "model": LLM_MODEL,
+            "max_tokens": 100,  # Reduced for speed
+            "system": system,
+            "messages": with_pending(history[self.context_start(history):], pending_agent)
+        }
+
+    def record_usage(self, usage):
+        """Per-turn token counts, saved with the transcript"""
+        self.llm_usage.append({
+            "turn": self.turn_count,
+            "input_tokens": usage.input_tokens,
+            "output_tokens": usage.output_tokens
+        })
+
+    def cache_key(self, pending_agent: Optional[str] = None) -> Optional[str]:
+        """Response cache key for the conversation so far (None = don't cache)"""
+        if response_cache is None or self.summarized:
+            # A summarized history is no longer a shared prefix
+            return None
+        turns = [f"{m['role']}:{normalize_speech(m['content'])}"
+                 for m in with_pending(self.llm_messages(), pending_agent)]
+        return prefix_key(PROMPT_VERSION, self.scenario, turns)
+
+    def speculate(self, partial: str):
+        """Start the reply to a partial agent utterance; a newer partial replaces it"""
+        key = normalize_speech(partial)
+        current = speculations.get(self.call_sid)
+        if current is not None and current.key == key:
+            return
+        self.cancel_speculation()
+        cache_key = self.cache_key(partial)
+        if cache_key and response_cache.ready(cache_key):
+            # The final turn will be served from cache - nothing to overlap
+            return
+        spec = Speculation(key, self.build_request(pending_agent=partial))
+        spec.task = asyncio.create_task(spec.run())
+        spec.task.add_done_callback(retrieve_exception)
+        speculations[self.call_sid] = spec
+
+    def cancel_speculation(self):
+        spec = speculations.pop(self.call_sid, None)
+        if spec is not None and not spec.task.done():
+            spec.task.cancel()
+
+    async def take_speculation(self, agent_text: str):
+        """The speculative Claude message if it was made for exactly this final text"""
+        spec = speculations.pop(self.call_sid, None)
+        if spec is None:
+            return None
+        if spec.key != normalize_speech(agent_text):
+            spec.task.cancel()
+            speculation_stats["discarded"] += 1
+            return None
+        if not spec.started:
+            # Still debouncing - cheaper to send a fresh request right now
+            spec.task.cancel()
+            return None
+        try:
+            message = await spec.task
+        except (asyncio.CancelledError, LLMUnavailable) as e:
+            print(f"Speculative reply failed for {self.call_sid}: {e!r}")
+            return None
+        speculation_stats["used"] += 1
+        return message
+
+    async def generate_patient_response(self, agent_text: Optional[str] = None) -> str:
+        """Use Claude to generate next patient message
+
+        agent_text: the final agent utterance, to pick up a matching speculative reply
+        """
+        with span("llm"):
+            return await self._generate_patient_response(agent_text)
+
+    async def _generate_patient_response(self, agent_text: Optional[str]) -> str:
+        key = self.cache_key()
+        cached = response_cache.get(key) if key else None
+        if cached:
+            self.cancel_speculation()
+            self.turn_count += 1
+            return cached
+        
+        message = await self.take_speculation(agent_text) if agent_text else None
+        if message is None:
+            try:
+                message = await create_message(self.build_request())
+            except LLMUnavailable as e:
+                return self.fallback_reply(e)
         
         response = message.content[0].text.strip()
         self.turn_count += 1
+        self.record_usage(message.usage)
+        if key and response:
+            response_cache.add(key, response)
         return response
+
+    def fallback_reply(self, error: Exception) -> str:
+        """Canned patient line for a turn Claude couldn't answer in time"""
+        self.turn_count += 1
+        self.fallback_turns.append(self.turn_count)
+        llm_guard.stats["fallbacks"] += 1
+        print(f"Fallback reply for {self.call_sid}: {error}")
+        return FALLBACK_REPLIES[self.turn_count % len(FALLBACK_REPLIES)]
+
+    async def stream_patient_response(self) -> AsyncIterator[str]:
+        """Yield the next patient message token by token (streaming mode)"""
+        request = self.build_request()
+        tokens = request_tokens(request)
+        deadline = time.monotonic() + TURN_BUDGET
+        attempt = 0
+        usage = None
+        output_tokens = 0
+        streamed = False
+        try:
+            while True:
+                try:
+                    await llm_guard.admit(tokens, deadline)
+                except LLMUnavailable as e:
+                    yield self.fallback_reply(e)
+                    return
+                llm_guard.stats["requests"] += 1
+                try:
+                    async with get_llm_client().messages.stream(**request) as stream:
+                        async for event in stream:
+                            if event.type == "message_start":
+                                usage = event.message.usage
+                            elif event.type == "content_block_delta" and event.delta.type == "text_delta":
+                                streamed = True
+                                yield event.delta.text
+                            elif event.type == "message_delta":
+                                # Final output count arrives here, not in message_start
+                                output_tokens = event.usage.output_tokens
+                except anthropic.APIError as e:
+                    llm_guard.record_failure(e)
+                    # Once the patient has started talking a retry would repeat them
+                    delay = None if streamed else llm_guard.backoff(attempt, e, deadline)
+                    if delay is None:
+                        if not streamed:
+                            yield self.fallback_reply(e)
+                            return
+                        break
+                    llm_guard.stats["retries"] += 1
+                    attempt += 1
+                    await asyncio.sleep(delay)
+                    continue
+                llm_guard.record_success()
+                break
+        except (asyncio.CancelledError, GeneratorExit):
+            # Interrupted mid-reply - what was already said is a turn, and it was billed
+            if streamed:
+                self.end_streamed_turn(usage, output_tokens)
+            raise
+        self.end_streamed_turn(usage, output_tokens)
+
+    def end_streamed_turn(self, usage, output_tokens: int):
+        self.turn_count += 1
+        if usage is not None:
+            usage.output_tokens = max(usage.output_tokens, output_tokens)
+            self.record_usage(usage)
     
     def check_for_issues(self, agent_text: str):
-        """Quick heuristic checks for common problems"""
-        
-        if len(agent_text) > 400:
-            self.issues.append("Response too verbose")
-            
-        uncertainty_words = ["i don't know", "not sure", "i can't", "unable to"]
-        if any(phrase in agent_text.lower() for phrase in uncertainty_words):
-            self.issues.append("Agent expressed uncertainty")
-            
-        # Check for hallucinations in first response
-        if self.turn_count == 1:
-            specific_details = ["2pm", "3pm", "monday", "tuesday", "dr.", "doctor"]
-            if any(detail in agent_text.lower() for detail in specific_details):
-                self.issues.append("May be hallucinating specific details")
+        """Quick heuristic checks for common problems (live rules in detection_rules.json)"""
+        with span("issue_checks"):
+            self._check_for_issues(agent_text)
+
+    def _check_for_issues(self, agent_text: str):
+        engine = default_engine()
+        fired = engine.check_message(
+            agent_text, "Agent", "live",
+            first=self.turn_count == 1,  # first agent reply
+            scenario_hits=engine.scenario_hits(self.scenario)
+        )
+        self.issues.extend(rule.issue for rule in fired)
         
     def should_end_conversation(self, text: str) -> bool:
         """Check if conversation should end"""
         goodbye_phrases = ["goodbye", "bye", "thank you for calling"]
-        return (self.turn_count >= 8 or 
+        return (self.turn_count >= MAX_TURNS or 
                 any(phrase in text.lower() for phrase in goodbye_phrases))
         
-    def save_transcript(self):
-        filename = f"{transcripts_dir}/call_{self.call_sid}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        
-        data = {
+    def save_transcript(self, status: str = "completed"):
+        """Hand the transcript to the background sink - no disk I/O here"""
+        transcript_sink.submit(self.to_transcript(status))
+
+    def to_transcript(self, status: str = "completed") -> dict:
+        return {
             "call_sid": self.call_sid,
             "scenario": self.scenario,
             "start_time": self.start_time.isoformat(),
             "end_time": datetime.now().isoformat(),
             "duration": (datetime.now() - self.start_time).total_seconds(),
             "turns": self.turn_count,
-            "messages": self.messages,
-            "issues": self.issues
+            "status": status,
+            "messages": [m.to_dict() for m in self.messages],
+            "issues": self.issues,
+            "llm_usage": self.llm_usage,
+            "fallback_turns": self.fallback_turns,
+            "timings": [dict(t) for t in self.timings]
         }
-        
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
-        
-        print(f"Saved transcript: {filename}")
-
-
-# Test scenarios
-SCENARIOS = [
-    # Orthopedics-specific scenarios (priority)
-    "Schedule an appointment for knee pain that started after running",
-    "Request a follow-up appointment after recent knee surgery",
-    "Ask about treatment options for shoulder pain",
-    "Schedule an appointment for back pain that's been ongoing for weeks",
-    "Request an MRI or X-ray appointment for hip pain",
-    "Ask if they treat sports injuries and torn ACL",
-    "Reschedule a post-surgery follow-up appointment",
-    "Ask about physical therapy referrals for ankle sprain",
-    "Schedule a consultation for arthritis in hands",
-    "Ask about office hours and if they accept workers' compensation",
-    # General medical office scenarios
-    "Cancel an upcoming appointment",
-    "Ask about office location and parking",
-    "Request medical records from previous visit",
-    "Ask if they accept Medicare or specific insurance",
-    "Schedule an urgent same-day appointment for injury"
-]
+
+
+# Store active conversations
+conversations = create_store(STATE_BACKEND, STATE_DB_PATH, ConversationManager.from_state)
+
+
+async def compact_context(conv: ConversationManager):
+    """Summarize older turns while the agent is talking, off the turn's critical path"""
+    upto = conv.compaction_point()
+    if upto is None or conv.call_sid in summarizing:
+        return
+    summarizing.add(conv.call_sid)
+    try:
+        summary = await conv.summarize(upto)
+    except Exception as e:
+        # Not fatal - context_start() keeps the prompt within budget meanwhile
+        print(f"Summary failed for {conv.call_sid}: {e}")
+        return
+    finally:
+        summarizing.discard(conv.call_sid)
+    
+    conv.apply_summary(summary, upto)
+    # With a shared backend the stored copy may have moved on a turn - apply
+    # the summary to whatever is current instead of overwriting it
+    latest = conversations.get(conv.call_sid)
+    if latest is not None and latest is not conv:
+        latest.apply_summary(summary, upto)
+        conversations.put(latest, create=False)
+
+
+def schedule_compaction(conv: ConversationManager):
+    if conv.compaction_point() is None:
+        return
+    task = asyncio.create_task(compact_context(conv))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
+async def generate_opening(scenario: str) -> str:
+    """A fresh first patient line for the opening pool (errors propagate - no canned lines)"""
+    message = await create_message(ConversationManager("opening", scenario).build_request())
+    return message.content[0].text.strip()
+
+
+# Openings depend only on the scenario - a persona or model change invalidates them
+opening_pool = OpeningPool(OPENING_POOL_PATH, OPENING_POOL_SIZE, generate_opening, version=PROMPT_VERSION)
+
+
+def admit_call(call_sid: str) -> bool:
+    """Whether a new call fits under MAX_LIVE_CALLS; only idle calls are evicted to make room"""
+    if len(conversations) >= MAX_LIVE_CALLS:
+        reap_conversations()
+    if len(conversations) >= MAX_LIVE_CALLS:
+        print(f"Rejected call {call_sid}: {MAX_LIVE_CALLS} calls live")
+        return False
+    return True
+
+
+def reject_call() -> Response:
+    """TwiML that turns a call away with a busy signal"""
+    response = VoiceResponse()
+    response.reject(reason="busy")
+    return Response(content=str(response), media_type="application/xml")
+
+
+def pick_scenario(call_sid: str) -> str:
+    """Pick scenario based on call"""
+    return SCENARIOS[hash(call_sid) % len(SCENARIOS)]
+
+
+class SentenceChunker:
+    """Buffers streamed LLM tokens and releases sentence-sized chunks for TTS"""
+
+    ENDINGS = ".!?"
+
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, token: str) -> List[str]:
+        self.buffer += token
+        chunks = []
+        start = 0
+        for i, ch in enumerate(self.buffer):
+            # Only cut once the next character proves the sentence is over,
+            # so "Dr." or "3.5" mid-token doesn't split early
+            if ch in self.ENDINGS and i + 1 < len(self.buffer) and self.buffer[i + 1].isspace():
+                chunk = self.buffer[start:i + 1].strip()
+                if chunk:
+                    chunks.append(chunk)
+                start = i + 1
+        self.buffer = self.buffer[start:]
+        return chunks
+
+    def flush(self) -> str:
+        tail, self.buffer = self.buffer.strip(), ""
+        return tail
+
+
+def track_turn(conv: ConversationManager):
+    """Save the current webhook's span timings with this call"""
+    timer = current_timer.get()
+    if timer is not None and timer.call is None:
+        timer.call = conv
+        conv.timings.append(timer.record)
+
+
+def timed(handler):
+    """Time a webhook: spans go to /metrics and, via track_turn, into the transcript"""
+    @functools.wraps(handler)
+    async def wrapper(request: Request):
+        timer = SpanTimer(request.url.path)
+        token = current_timer.set(timer)
+        try:
+            return await handler(request)
+        finally:
+            current_timer.reset(token)
+            timer.finish()
+            if timer.call is not None:
+                timer.record["turn"] = timer.call.turn_count
+                # Persist the finished record; no-op once the call has ended
+                conversations.put(timer.call, create=False)
+    return wrapper
+
+
+def speech_gather() -> Gather:
+    """Gather for the agent's next utterance, streaming partial results when speculating"""
+    options = {}
+    if SPECULATIVE_REPLIES:
+        options["partial_result_callback"] = f'{PUBLIC_URL}/partial-speech'
+        options["partial_result_callback_method"] = 'POST'
+    return Gather(
+        input='speech',
+        action=f'{PUBLIC_URL}/handle-speech',
+        method='POST',
+        speech_timeout='auto',
+        language='en-US',
+        **options
+    )
+
 
 @app.post("/voice")
+@timed
 async def initial_call(request: Request):
     """Handle initial call connection"""
-    form_data = await request.form()
+    with span("form_parse"):
+        form_data = await request.form()
     call_sid = form_data.get("CallSid")
-    
-    # Pick scenario based on call
-    scenario_idx = hash(call_sid) % len(SCENARIOS)
-    scenario = SCENARIOS[scenario_idx]
+    if not admit_call(call_sid):
+        return reject_call()
     
     # Initialize conversation
+    scenario = pick_scenario(call_sid)
     conv = ConversationManager(call_sid, scenario)
-    conversations[call_sid] = conv
+    track_turn(conv)
     
-    # Generate first patient message
-    first_msg = conv.generate_patient_response()
+    # First patient message: a pre-generated line, or Claude if the pool ran dry
+    with span("opening"):
+        first_msg = opening_pool.take(scenario)
+    if first_msg:
+        conv.turn_count += 1
+    else:
+        first_msg = await conv.generate_patient_response()
     conv.add_message("Patient", first_msg)
+    with span("state_write"):
+        conversations.put(conv)
     
     print(f"\nCall started: {call_sid}")
     print(f"Scenario: {scenario}")
     print(f"Patient: {first_msg}")
     
     # Build response with Twilio TTS
-    response = VoiceResponse()
-    gather = Gather(
-        input='speech',
-        action=f'{PUBLIC_URL}/handle-speech',
-        method='POST',
-        speech_timeout='auto',
-        language='en-US'
-    )
-    
-    # Use Twilio's neural voice for better quality
-    gather.say(first_msg, voice='Polly.Joanna')
-    response.append(gather)
-    
-    # If no response, retry once
-    response.say("I didn't hear you. Let me repeat that.", voice='Polly.Joanna')
-    response.redirect(f'{PUBLIC_URL}/handle-speech')
-    
-    return Response(content=str(response), media_type="application/xml")
+    with span("twiml_render"):
+        response = VoiceResponse()
+        gather = speech_gather()
+        
+        # Use Twilio's neural voice for better quality
+        gather.say(first_msg, voice='Polly.Joanna')
+        response.append(gather)
+        
+        # If no response, retry once
+        response.say("I didn't hear you. Let me repeat that.", voice='Polly.Joanna')
+        response.redirect(f'{PUBLIC_URL}/handle-speech')
+        
+        return Response(content=str(response), media_type="application/xml")
 
 
 @app.post("/handle-speech")
+@timed
 async def handle_speech(request: Request):
     """Process agent's speech and continue conversation"""
-    form_data = await request.form()
+    with span("form_parse"):
+        form_data = await request.form()
     call_sid = form_data.get("CallSid")
     agent_speech = form_data.get("SpeechResult", "")
     
     print(f"Agent: {agent_speech}")
     
-    conv = conversations.get(call_sid)
+    with span("state_lookup"):
+        conv = conversations.get(call_sid)
     if not conv:
         # Call ended or not found
         response = VoiceResponse()
@@ -203,78 +848,336 @@ async def handle_speech(request: Request):
         return Response(content=str(response), media_type="application/xml")
     
     # Record agent response
+    track_turn(conv)
     conv.add_message("Agent", agent_speech)
     conv.check_for_issues(agent_speech)
     
     # Check if we should end
     if conv.should_end_conversation(agent_speech) or not agent_speech:
-        conv.save_transcript()
+        finish_call(conv)
         response = VoiceResponse()
         response.say("Thank you, goodbye.", voice='Polly.Joanna')
         response.hangup()
         return Response(content=str(response), media_type="application/xml")
     
-    # Generate next patient response
-    next_msg = conv.generate_patient_response()
+    # Generate next patient response (often already started from partial results)
+    task = asyncio.create_task(next_patient_message(conv, agent_speech))
+    return await reply_or_filler(conv, task, attempt=0)
+
+
+async def next_patient_message(conv: ConversationManager, agent_speech: str) -> str:
+    """Generate and record the patient's reply - runs on even if the turn deadline passes"""
+    next_msg = await conv.generate_patient_response(agent_speech)
     conv.add_message("Patient", next_msg)
+    with span("state_write"):
+        conversations.put(conv, create=False)
+    schedule_compaction(conv)
     print(f"Patient: {next_msg}")
+    return next_msg
+
+
+async def reply_or_filler(conv: ConversationManager, task: asyncio.Task, attempt: int) -> Response:
+    """Serve the reply if it lands within TURN_DEADLINE, else filler audio and a /pickup redirect"""
+    try:
+        next_msg = await asyncio.wait_for(asyncio.shield(task), TURN_DEADLINE)
+    except asyncio.TimeoutError:
+        pending_replies[conv.call_sid] = (conv, task)
+        return filler(attempt)
     
+    pending_replies.pop(conv.call_sid, None)
+    return patient_reply(conv, next_msg)
+
+
+def filler(attempt: int) -> Response:
+    """Hold the line while a reply is still generating, then come back to /pickup"""
+    with span("twiml_render"):
+        response = VoiceResponse()
+        response.say(FILLERS[attempt % len(FILLERS)], voice='Polly.Joanna')
+        response.redirect(f'{PUBLIC_URL}/pickup?attempt={attempt + 1}', method='POST')
+        return Response(content=str(response), media_type="application/xml")
+
+
+def patient_reply(conv: ConversationManager, next_msg: str) -> Response:
+    """TwiML that speaks the patient's reply and listens for the agent"""
     # Check if patient is ending call
-    if conv.should_end_conversation(next_msg):
-        conv.save_transcript()
+    ending = conv.should_end_conversation(next_msg)
+    if ending:
+        finish_call(conv)
+    
+    with span("twiml_render"):
         response = VoiceResponse()
-        response.say(next_msg, voice='Polly.Joanna')
+        if ending:
+            response.say(next_msg, voice='Polly.Joanna')
+            response.hangup()
+            return Response(content=str(response), media_type="application/xml")
+        
+        # Continue conversation
+        gather = speech_gather()
+        gather.say(next_msg, voice='Polly.Joanna')
+        response.append(gather)
+        
+        # Fallback
+        response.say("Sorry, I didn't catch that. Goodbye.", voice='Polly.Joanna')
         response.hangup()
+        
         return Response(content=str(response), media_type="application/xml")
+
+
+@app.post("/pickup")
+@timed
+async def pickup(request: Request):
+    """Twilio comes back here after filler audio to collect a late reply"""
+    with span("form_parse"):
+        form_data = await request.form()
+    call_sid = form_data.get("CallSid")
+    attempt = int(request.query_params.get("attempt", "1"))
     
-    # Continue conversation
-    response = VoiceResponse()
-    gather = Gather(
-        input='speech',
-        action=f'{PUBLIC_URL}/handle-speech',
-        method='POST',
-        speech_timeout='auto',
-        language='en-US'
-    )
+    pending = pending_replies.get(call_sid)
+    if pending is not None:
+        conv, task = pending
+        track_turn(conv)
+        if attempt <= MAX_PICKUP_ATTEMPTS:
+            return await reply_or_filler(conv, task, attempt)
+        task.cancel()
+        pending_replies.pop(call_sid, None)
     
-    gather.say(next_msg, voice='Polly.Joanna')
-    response.append(gather)
+    with span("state_lookup"):
+        conv = conversations.get(call_sid)
+    if conv and pending is None:
+        track_turn(conv)
+        if conv.messages and conv.messages[-1].speaker == "Patient":
+            # Another worker generated the reply and stored it
+            return patient_reply(conv, conv.messages[-1].text)
+        if attempt <= MAX_PICKUP_ATTEMPTS:
+            # Another worker is still generating - keep holding
+            return filler(attempt)
     
-    # Fallback
-    response.say("Sorry, I didn't catch that. Goodbye.", voice='Polly.Joanna')
+    # Out of patience - hang up but keep the transcript
+    response = VoiceResponse()
+    if conv:
+        print(f"Reply never arrived for {call_sid}, hanging up")
+        finish_call(conv, status="timeout")
+        response.say("Sorry, I have to go. Goodbye.", voice='Polly.Joanna')
     response.hangup()
-    
     return Response(content=str(response), media_type="application/xml")
 
 
+@app.post("/partial-speech")
+@timed
+async def partial_speech(request: Request):
+    """Interim STT result - start the patient's reply while the agent is still talking"""
+    with span("form_parse"):
+        form_data = await request.form()
+    call_sid = form_data.get("CallSid")
+    partial = form_data.get("UnstableSpeechResult") or form_data.get("StableSpeechResult", "")
+    
+    with span("state_lookup"):
+        conv = conversations.get(call_sid)
+    # A reply to a goodbye is never needed - the final turn just hangs up
+    if conv and len(partial) >= SPECULATION_MIN_CHARS and not conv.should_end_conversation(partial):
+        conv.speculate(partial)
+    
+    return Response(content="OK")
+
+
 @app.post("/status")
+@timed
 async def call_status(request: Request):
     """Track call completion"""
-    form_data = await request.form()
+    with span("form_parse"):
+        form_data = await request.form()
     call_sid = form_data.get("CallSid")
     status = form_data.get("CallStatus")
     
     print(f"Call {call_sid}: {status}")
     
     # Clean up when call ends
-    if status in ["completed", "failed", "busy", "no-answer"]:
-        if call_sid in conversations:
-            conv = conversations[call_sid]
-            if conv.messages:
-                conv.save_transcript()
-            del conversations[call_sid]
+    if status in ["completed", "failed", "busy", "no-answer", "canceled"]:
+        publish_completion(call_sid, status)
+        with span("state_lookup"):
+            conv = conversations.get(call_sid)
+        if conv:
+            finish_call(conv)
     
     return Response(content="OK")
 
 
+@app.post("/voice-stream")
+async def initial_stream_call(request: Request):
+    """Connect the call to the streaming websocket (CONVERSATION_MODE=stream)"""
+    form_data = await request.form()
+    if not admit_call(form_data.get("CallSid")):
+        return reject_call()
+    ws_url = PUBLIC_URL.replace("https://", "wss://").replace("http://", "ws://")
+    response = VoiceResponse()
+    connect = Connect()
+    # Twilio does STT/TTS; text flows both ways over the websocket
+    connect.add_child(
+        'ConversationRelay',
+        url=f'{ws_url}/media-stream',
+        voice='Polly.Joanna',
+        language='en-US',
+        partial_prompts='true'
+    )
+    response.append(connect)
+    return Response(content=str(response), media_type="application/xml")
+
+
+async def stream_patient_turn(websocket: WebSocket, conv: ConversationManager) -> str:
+    """Stream the next patient reply to TTS sentence by sentence"""
+    chunker = SentenceChunker()
+    parts = []
+    start = time.perf_counter()
+    tokens = conv.stream_patient_response()
+    try:
+        with span("llm"):
+            async for token in tokens:
+                if not parts:
+                    mark("first_token", start)
+                parts.append(token)
+                for sentence in chunker.feed(token):
+                    await websocket.send_json({"type": "text", "token": sentence, "last": False})
+            await websocket.send_json({"type": "text", "token": chunker.flush(), "last": True})
+    except asyncio.CancelledError:
+        # Interrupted - close the stream so the turn and its usage are counted,
+        # and keep whatever the patient already said
+        await tokens.aclose()
+        if parts:
+            conv.add_message("Patient", "".join(parts).strip())
+        raise
+    
+    text = "".join(parts).strip()
+    conv.add_message("Patient", text)
+    with span("state_write"):
+        conversations.put(conv, create=False)
+    schedule_compaction(conv)
+    print(f"Patient: {text}")
+    return text
+
+
+async def end_stream_call(websocket: WebSocket, conv: ConversationManager):
+    finish_call(conv)
+    await websocket.send_json({"type": "end"})
+
+
+@app.websocket("/media-stream")
+async def media_stream(websocket: WebSocket):
+    """Streaming conversation mode - same ConversationManager, no per-turn HTTP round-trip"""
+    await websocket.accept()
+    conv: Optional[ConversationManager] = None
+    turn_task: Optional[asyncio.Task] = None
+    ended = False
+    
+    async def end_call():
+        nonlocal ended
+        ended = True
+        await end_stream_call(websocket, conv)
+    
+    async def stop_turn():
+        # Wait for the cancelled turn to record its partial reply before anything follows it
+        if turn_task is None:
+            return
+        turn_task.cancel()
+        await asyncio.wait([turn_task])
+    
+    async def patient_turn():
+        # Each turn runs in its own task, so the timer stays local to it
+        timer = SpanTimer("/media-stream")
+        current_timer.set(timer)
+        track_turn(conv)
+        try:
+            next_msg = await stream_patient_turn(websocket, conv)
+        finally:
+            timer.finish()
+            timer.record["turn"] = conv.turn_count
+        if conv.should_end_conversation(next_msg):
+            await end_call()
+    
+    try:
+        while True:
+            event = await websocket.receive_json()
+            kind = event.get("type")
+            if ended:
+                # The call is over - ignore whatever arrives until Twilio hangs up
+                continue
+            
+            if kind == "setup":
+                call_sid = event.get("callSid")
+                # Calls were admitted at /voice-stream, but the cap may have filled since
+                if not admit_call(call_sid):
+                    await websocket.send_json({"type": "end"})
+                    break
+                conv = ConversationManager(call_sid, pick_scenario(call_sid))
+                conversations.put(conv)
+                print(f"\nStream call started: {call_sid}")
+                print(f"Scenario: {conv.scenario}")
+                turn_task = asyncio.create_task(patient_turn())
+            
+            elif kind == "prompt" and conv is not None:
+                # Partial STT results arrive with last=false; act on the final one
+                if not event.get("last", True):
+                    continue
+                agent_speech = event.get("voicePrompt", "")
+                print(f"Agent: {agent_speech}")
+                await stop_turn()
+                
+                conv.add_message("Agent", agent_speech)
+                conv.check_for_issues(agent_speech)
+                conversations.put(conv, create=False)
+                if conv.should_end_conversation(agent_speech) or not agent_speech:
+                    await end_call()
+                    continue
+                turn_task = asyncio.create_task(patient_turn())
+            
+            elif kind == "interrupt" and turn_task and not turn_task.done():
+                # Agent talked over the patient - stop generating
+                turn_task.cancel()
+    
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await stop_turn()
+        if conv and not ended:
+            finish_call(conv)
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Span histograms plus live counters, Prometheus text format"""
+    samples = [
+        ("voicebot_active_calls", "gauge", "Calls in live state", len(conversations)),
+        ("voicebot_pending_replies", "gauge", "Replies past the turn deadline", len(pending_replies)),
+        ("voicebot_speculation_used_total", "counter", "Speculative replies used", speculation_stats["used"]),
+        ("voicebot_speculation_discarded_total", "counter", "Speculative replies discarded", speculation_stats["discarded"]),
+        ("voicebot_llm_circuit_open", "gauge", "1 while the LLM circuit breaker is not closed",
+         int(llm_guard.breaker.state != "closed")),
+    ]
+    for name, value in llm_guard.stats.items():
+        samples.append((f"voicebot_llm_{name}_total", "counter", f"LLM guard {name.replace('_', ' ')}", value))
+    if response_cache is not None:
+        for name in ("hits", "misses"):
+            samples.append((f"voicebot_response_cache_{name}_total", "counter",
+                            f"Response cache {name}", response_cache.stats[name]))
+    return PlainTextResponse(render_prometheus(samples), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 async def health():
     return {
         "status": "running",
-        "active_calls": len(conversations)
+        "active_calls": len(conversations),
+        "mode": CONVERSATION_MODE,
+        "speculation": speculation_stats,
+        "llm": {**llm_guard.stats, "circuit": llm_guard.breaker.state},
+        "response_cache": response_cache.summary() if response_cache else None
     }
 
 
+def voice_webhook() -> str:
+    """Webhook path for the configured conversation mode"""
+    return "/voice-stream" if CONVERSATION_MODE == "stream" else "/voice"
+
+
 def make_call():
     """Initiate a call to the test number"""
     client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
@@ -285,7 +1188,7 @@ def make_call():
         call = client.calls.create(
             to=TARGET_NUMBER,
             from_=TWILIO_PHONE_NUMBER,
-            url=f'{PUBLIC_URL}/voice',
+            url=f'{PUBLIC_URL}{voice_webhook()}',
             status_callback=f'{PUBLIC_URL}/status',
             status_callback_event=['completed'],
             method='POST'
@@ -301,4 +1204,17 @@ def make_call():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    
+    if WEB_WORKERS > 1 and STATE_BACKEND == "memory":
+        # Workers can't see each other's dicts - share state through SQLite
+        print("WEB_WORKERS > 1 needs a shared state backend, using STATE_BACKEND=sqlite")
+        os.environ["STATE_BACKEND"] = "sqlite"
+    
+    uvicorn.run(
+        "voice_bot:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=WEB_WORKERS,
+        loop="uvloop",
+        http="httptools"
+    )